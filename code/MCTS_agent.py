@@ -1,38 +1,41 @@
 import random
-import copy
 import math
+import multiprocessing
 import time
-from typing import List, Tuple, Optional
+import weakref
+from typing import List, Tuple, Optional, Dict
 from board import Board
-from rules import get_valid_moves, get_valid_arrows
+from rules import get_valid_moves, get_valid_arrows, count_valid_moves, iter_actions, has_any_legal_move
+from evaluation import evaluate
+from telemetry import SearchStats, phase_timer
 
 class MCTSNode:
-    def __init__(self, board: Board, agent_id: int, parent=None):
-        self.board = board
+    # Nodes no longer own a board: the agent replays the path from the root
+    # on one shared board with apply_action / undo.
+    def __init__(self, board: Board, agent_id: int, parent=None, action=None, rng=None):
         self.agent_id = agent_id
+        self.mover = 3 - agent_id   # Played `action`; value counts this player's wins
         self.parent = parent
+        self.action = action    # Action that led from the parent to this node
+        self.hash = board.zobrist   # Identifies the position when the tree is reused
         self.children = []
         self.visits = 0
         self.value = 0
-        self.untried_actions = self.get_all_actions()
-
-    def get_all_actions(self) -> List[Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]]:
-        positions = self.board.agent_1_pos if self.agent_id == 1 else self.board.agent_2_pos
-        actions = []
-        for from_pos in positions:
-            for to_pos in get_valid_moves(self.board, from_pos):
-                for arrow_pos in get_valid_arrows(self.board, to_pos):
-                    actions.append((from_pos, to_pos, arrow_pos))
-        return actions
-
-    def expand(self):
-        action = self.untried_actions.pop()
-        board_copy = copy.deepcopy(self.board)
-        board_copy.move(action[0], action[1], self.agent_id)
-        board_copy.arrow_place(action[1], action[2], self.agent_id)
-        board_copy.update_temp_blocks()
+        # Terminal status is decided once, stopping at the first legal move
+        self.terminal = not has_any_legal_move(board, agent_id)
+        # Untried actions are drawn lazily from a staged generator. One action is
+        # kept peeked so that is_fully_expanded() needs no generation work.
+        self.untried_actions = None if self.terminal else iter_actions(board, agent_id, rng)
+        self.next_action = None if self.terminal else next(self.untried_actions, None)
+        self.collapsed = False
+
+    def expand(self, board: Board, rng=None):
+        # `board` must be at this node's position; it is left at the child's
+        action = self.next_action
+        self.next_action = next(self.untried_actions, None)
+        board.apply_action(action[0], action[1], action[2], self.agent_id)
         next_player = 3 - self.agent_id
-        child_node = MCTSNode(board_copy, next_player, parent=self)
+        child_node = MCTSNode(board, next_player, parent=self, action=action, rng=rng)
         self.children.append((child_node, action))
         return child_node
 
@@ -58,81 +61,552 @@ class MCTSNode:
         return best_node
 
     def backpropagate(self, result: int):
-        self.visits += 1
-        if self.agent_id == result:
-            self.value += 1
-        elif result == 0:
-            self.value += 0.5
-        if self.parent:
-            parent: MCTSNode = self.parent
-            parent.backpropagate(result)
+        # Each node is scored for the player who chose it, so that best_child
+        # picks the child that is best for the player to move at the parent
+        node = self
+        while node is not None:
+            node.visits += 1
+            if node.mover == result:
+                node.value += 1
+            elif result == 0:
+                node.value += 0.5
+            node = node.parent
+
+    def full_children(self) -> List[Tuple["MCTSNode", tuple]]:
+        # Children one whole turn (move + arrow) below this node
+        return self.children
+
+    def collapse(self):
+        # Drops the subtree below this node. Its own visits and value already sum up
+        # the subtree's results; its actions are generated again if the search returns.
+        self.children = []
+        self.untried_actions = None
+        self.next_action = None
+        self.collapsed = True
+
+    def reopen(self, board: Board, rng=None):
+        # `board` must be at this node's position
+        self.untried_actions = iter_actions(board, self.agent_id, rng)
+        self.next_action = next(self.untried_actions, None)
+        self.collapsed = False
+
+    def choose(self) -> "MCTSNode":
+        return self.best_child(c_param=0)
 
     def is_fully_expanded(self):
-        return len(self.untried_actions) == 0
+        return self.next_action is None
 
     def is_terminal_node(self):
-        return not self.get_all_actions()
+        return self.terminal
+
+
+def ranked_moves(board: Board, agent_id: int) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    # (from, to) by mobility gained. The mover still stands on from_pos, which blocks
+    # it like the temp block would, so a destination with no reach has no arrow either.
+    pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+    scored = []
+    for from_pos in pos_list:
+        before = count_valid_moves(board, from_pos)
+        for to_pos in get_valid_moves(board, from_pos):
+            after = count_valid_moves(board, to_pos)
+            if after:
+                scored.append((after - before, from_pos, to_pos))
+    scored.sort(key=lambda m: -m[0])
+    return [(from_pos, to_pos) for _, from_pos, to_pos in scored]
+
+def ranked_arrows(board: Board, agent_id: int, to_pos: Tuple[int, int]) -> List[Tuple[int, int]]:
+    # Arrows close to the opponent's amazons take away their room
+    opp_pos = board.agent_2_pos if agent_id == 1 else board.agent_1_pos
+    arrows = get_valid_arrows(board, to_pos)
+    arrows.sort(key=lambda a: min(max(abs(a[0] - ox), abs(a[1] - oy)) for ox, oy in opp_pos))
+    return arrows
+
+
+class StagedNode:
+    # Two-stage tree: a turn is split into a QueenNode, where the player picks
+    # (from, to), and an ArrowNode, where the same player picks the arrow. Children
+    # are opened in order of a cheap prior, one more each time the visit count
+    # allows it (progressive widening: at most c * visits^alpha children).
+    # With RAVE, `amaf` holds all-moves-as-first statistics ([visits, wins] for the
+    # player to move) of this node's edge keys, gathered from every later turn.
+    def __init__(self, agent_id: int, mover: int, parent):
+        self.agent_id = agent_id    # Player to move
+        self.mover = mover          # Player who chose this node
+        self.parent = parent
+        self.children = []
+        self.visits = 0
+        self.value = 0
+        self.candidates = None      # Untried edges, best prior first
+        self.terminal = False
+        self.amaf: Dict = {}
+
+    def can_widen(self, board: Board, c: float, alpha: float) -> bool:
+        if self.candidates is None:
+            self.candidates = self.prior_order(board)
+        return bool(self.candidates) and len(self.children) < math.ceil(c * (self.visits + 1) ** alpha)
+
+    def best_child(self, c_param: float = 1.41, rave_k: float = 0.0) -> "StagedNode":
+        log_visits = math.log(max(self.visits, 1))
+
+        def score(entry) -> float:
+            child, key = entry
+            q = child.value / child.visits
+            stats = self.amaf.get(key) if rave_k else None
+            if stats:
+                # The AMAF estimate counts for less as the child's own visits grow
+                beta = math.sqrt(rave_k / (3 * child.visits + rave_k))
+                q = (1 - beta) * q + beta * stats[1] / stats[0]
+            return q + c_param * math.sqrt(2 * log_visits / child.visits)
+
+        return max(self.children, key=score)[0]
+
+    def next_candidate(self) -> int:
+        # Index of the next edge to open: an untried edge that has been winning as a
+        # later move elsewhere in the tree goes first, otherwise the best prior
+        best_index, best_mean = 0, 0.5
+        for index, key in enumerate(self.candidates):
+            stats = self.amaf.get(key)
+            if stats and stats[1] / stats[0] > best_mean:
+                best_index, best_mean = index, stats[1] / stats[0]
+        return best_index
+
+    def collapse(self):
+        # Drops the subtree below this node; the candidates are ranked again if needed
+        self.children = []
+        self.candidates = None
+
+    def most_visited(self) -> "StagedNode":
+        return max((child for child, _ in self.children), key=lambda child: (child.visits, child.value))
+
+    backpropagate = MCTSNode.backpropagate
+
+
+class QueenNode(StagedNode):
+    def __init__(self, board: Board, agent_id: int, parent=None, action=None):
+        super().__init__(agent_id, 3 - agent_id, parent)
+        self.action = action        # Whole action that led here from the grandparent
+        self.hash = board.zobrist
+        self.terminal = not has_any_legal_move(board, agent_id)
+        # AMAF of (from, to) lives in self.amaf; arrows are kept here and shared by
+        # all ArrowNode children, whatever move they follow
+        self.amaf_arrow: Dict = {}
+
+    def prior_order(self, board: Board) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        return ranked_moves(board, self.agent_id)
+
+    def expand(self, board: Board) -> "QueenNode":
+        # Opens the next (from, to) together with its best arrow, so that every leaf
+        # is a whole position; `board` is left there
+        move = self.candidates.pop(self.next_candidate())
+        arrow_node = ArrowNode(self.agent_id, self, move)
+        self.children.append((arrow_node, move))
+        arrow_node.candidates = arrow_node.prior_order(board)
+        return arrow_node.expand(board)
+
+    def full_children(self) -> List[Tuple["QueenNode", tuple]]:
+        return [(child, child.action) for arrow_node, _ in self.children for child, _ in arrow_node.children]
+
+    def choose(self) -> "QueenNode":
+        return self.most_visited().most_visited()
+
+
+class ArrowNode(StagedNode):
+    def __init__(self, agent_id: int, parent: QueenNode, move: Tuple[Tuple[int, int], Tuple[int, int]]):
+        super().__init__(agent_id, agent_id, parent)
+        self.move = move
+        self.amaf = parent.amaf_arrow
+
+    def prior_order(self, board: Board) -> List[Tuple[int, int]]:
+        return ranked_arrows(board, self.agent_id, self.move[1])
+
+    def expand(self, board: Board) -> QueenNode:
+        # `board` must be at the parent QueenNode's position; it is left at the child's
+        arrow = self.candidates.pop(self.next_candidate())
+        action = (self.move[0], self.move[1], arrow)
+        board.apply_action(*action, self.agent_id)
+        child = QueenNode(board, 3 - self.agent_id, parent=self, action=action)
+        self.children.append((child, arrow))
+        return child
+
+
+def _root_search(task) -> Tuple[int, Dict]:
+    # Worker side of root parallelism: one independent, seeded search from the root
+    board, agent_id, seed, options = task
+    agent = MCTSAgent(agent_id, seed=seed, reuse_tree=False, **options)
+    root = agent.search(board)
+    return agent.iterations, {action: (child.visits, child.value) for child, action in root.full_children()}
+
+
+# Rough memory of one node with its action generator, measured on 10x10 with
+# benchmark.bench_node_pool; used to turn max_bytes into a node budget
+NODE_BYTES = 3 * 1024
+
+
+def subtree_size(root) -> int:
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for child, _ in node.children)
+    return count
 
 
 class MCTSAgent:
-    def __init__(self, agent_id: int, time_limit: float = 2.0):
+    def __init__(self, agent_id: int, time_limit: float = 2.0, workers: int = 1, seed: Optional[int] = None,
+                 reuse_tree: bool = True, two_stage: bool = False, widen_c: float = 1.0, widen_alpha: float = 0.5,
+                 max_nodes: Optional[int] = None, max_bytes: Optional[int] = None, max_iterations: Optional[int] = None,
+                 rave: bool = False, rave_k: float = 300.0, playout_depth: int = 0, playout_epsilon: float = 1.0):
         self.agent_id = agent_id
         self.time_limit = time_limit
+        self.iterations = 0     # Iterations run by the last get_action
+        self.max_iterations = max_iterations    # Optional cap on top of time_limit
+        # workers > 1 runs that many independent searches from the root in a process
+        # pool and merges their root statistics (root parallelism)
+        self.workers = workers
+        self.seed = seed
+        # Shuffled expansion order only when seeded, so each root-parallel search differs
+        self.rng = random.Random(seed) if seed is not None else None
+        self._pool = None
+        # Tree reuse: after each move the root is the position after our action and
+        # _board (the shared search board) stands on it, waiting for the opponent's reply
+        self.reuse_tree = reuse_tree
+        self._root: Optional[MCTSNode] = None
+        self._board: Optional[Board] = None
+        self.reuse_stats = {"turns": 0, "hits": 0, "carried_visits": 0, "last_carried_visits": 0,
+                            "ponder_iterations": 0}
+        # two_stage searches QueenNode / ArrowNode trees with progressive widening
+        # instead of one edge per whole action
+        # RAVE blends AMAF statistics of (from, to) and arrow squares into selection
+        # (weight sqrt(k / (3n + k)) for a child with n visits). Its keys are the
+        # two-stage tree's edges, so it implies two_stage. playout_depth turns of
+        # random (with probability playout_epsilon, else greedy) play are added
+        # before the static evaluation, which also feeds more moves to AMAF.
+        self.rave = rave
+        self.rave_k = rave_k
+        self.playout_depth = playout_depth
+        self.playout_epsilon = playout_epsilon
+        self.two_stage = two_stage or rave
+        self.widen_c = widen_c
+        self.widen_alpha = widen_alpha
+        # Tree size budget. max_bytes is turned into a node count with NODE_BYTES.
+        # When it is reached the least-visited subtrees are collapsed into their
+        # roots; if nothing can be collapsed the search goes on without expanding.
+        if max_bytes is not None:
+            by_bytes = max(1, max_bytes // NODE_BYTES)
+            max_nodes = by_bytes if max_nodes is None else min(max_nodes, by_bytes)
+        self.max_nodes = max_nodes
+        self.node_count = 0
+        self.memory_stats = {"peak_nodes": 0, "evictions": 0, "collapsed": 0, "freed": 0}
+        # Per-move telemetry: evaluations, deepest path and phase times
+        self.telemetry = SearchStats()
+        self.search_stats: Dict[str, float] = {}
 
     def get_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
-        root = MCTSNode(copy.deepcopy(board), self.agent_id)
-        start = time.time()
+        self.telemetry = SearchStats()
+        try:
+            return self.choose_action(board)
+        finally:
+            self.search_stats = {**self.telemetry.as_dict(), "iterations": self.iterations}
+
+    def choose_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+        # Pool workers are daemonic and cannot start their own pool (e.g. under runner.py)
+        if self.workers > 1 and not multiprocessing.current_process().daemon:
+            return self.parallel_action(board)
+
+        root = self.search(board)
+        self.telemetry.maximum("nodes", self.node_count)
+        if root.children:
+            best = root.choose()
+            if self.reuse_tree:
+                self.promote(best)
+            return best.action
+
+        self._root = None
+        return self.fallback_action(board)
+
+    def promote(self, node: MCTSNode):
+        # Make `node` (a child of the current root) the new root and move _board onto it.
+        # The rest of the old tree becomes unreachable and is freed.
+        self._board.apply_action(*node.action, node.mover)
+        self._board.history.clear()
+        node.parent.children = []
+        node.parent = None
+        self._root = node
+        self.node_count = subtree_size(node)
+        self._evictable = True
+
+    def adopt(self, child: MCTSNode):
+        self.reuse_stats["hits"] += 1
+        self.reuse_stats["carried_visits"] += child.visits
+        self.reuse_stats["last_carried_visits"] = child.visits
+        self.promote(child)
+
+    def observe(self, action: tuple, agent_id: int):
+        # Game.run hook: `agent_id` just played `action`. On the opponent's move the
+        # root moves onto the matching subtree and the rest of the tree is dropped.
+        if agent_id == self.agent_id or self._root is None or self._root.agent_id == self.agent_id:
+            return
+        self.reuse_stats["last_carried_visits"] = 0
+        for child, child_action in self._root.full_children():
+            if child_action == action:
+                self.adopt(child)
+                return
+        self._root = None
+
+    def ponder_step(self, seconds: float) -> bool:
+        # Searches the kept tree (the opponent to move) for `seconds` while the opponent
+        # thinks. False when there is nothing to ponder.
+        root = self._root
+        if root is None or root.agent_id == self.agent_id or root.terminal:
+            return False
+        self.reuse_stats["ponder_iterations"] += self.grow(root, seconds)
+        return True
+
+    def prepare_root(self, board: Board) -> MCTSNode:
+        # Keep the subtree of the opponent's actual reply if we searched it last turn
+        self.reuse_stats["turns"] += 1
+        self._evictable = True
+        root = self._root
+        if root is not None and root.agent_id == self.agent_id and root.hash == board.zobrist:
+            # observe() already moved the root onto the reply
+            return root
+        self.reuse_stats["last_carried_visits"] = 0
+        if root is not None:
+            for child, _ in root.full_children():
+                if child.hash == board.zobrist and child.agent_id == self.agent_id:
+                    self.adopt(child)
+                    return child
+        self.node_count = 1
+        self._evictable = True
+        with phase_timer(self.telemetry, "copy"):
+            self._board = board.clone()
+        if self.two_stage:
+            self._root = QueenNode(self._board, self.agent_id)
+        else:
+            self._root = MCTSNode(self._board, self.agent_id, rng=self.rng)
+        return self._root
+
+    def search(self, board: Board) -> MCTSNode:
+        root = self.prepare_root(board)
+        self.iterations = self.grow(root, self.time_limit, self.max_iterations)
+        return root
 
-        while time.time() - start < self.time_limit:
+    def grow(self, root, seconds: float, max_iterations: Optional[int] = None) -> int:
+        # Runs search iterations from `root`, with self._board standing on its position,
+        # for `seconds` (or max_iterations). Returns the number of iterations.
+        if self.two_stage:
+            return self.grow_staged(root, seconds, max_iterations)
+        board = self._board
+        deadline = time.time() + seconds
+        iterations = 0
+
+        while time.time() < deadline and (max_iterations is None or iterations < max_iterations):
+            iterations += 1
             node = root
-            while not node.is_terminal_node() and node.is_fully_expanded():
+            applied = 0
+            while not node.is_terminal_node():
+                if node.collapsed:
+                    node.reopen(board, self.rng)
+                if not node.is_fully_expanded():
+                    if self.has_room(root, node, 1):
+                        with phase_timer(self.telemetry, "expand"):
+                            node = node.expand(board, self.rng)
+                        self.node_count += 1
+                        applied += 1
+                    break
                 node = node.best_child()
-            if not node.is_terminal_node() and node.untried_actions:
-                node = node.expand()
-            result = self.simulate(node.board)
+                board.apply_action(node.action[0], node.action[1], node.action[2], node.parent.agent_id)
+                applied += 1
+            self.telemetry.maximum("depth", applied)
+            result = self.simulate(board)
             node.backpropagate(result)
+            for _ in range(applied):
+                board.undo()
 
-        if root.children:
-            best_child = root.best_child(c_param=0)
-            for child, action in root.children:
-                if child == best_child:
-                    return action
+        return iterations
 
-        return self.fallback_action(board)
+    def grow_staged(self, root: QueenNode, seconds: float, max_iterations: Optional[int] = None) -> int:
+        board = self._board
+        deadline = time.time() + seconds
+        iterations = 0
 
-    def simulate(self, board: Board) -> int:
-        my_pos = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
-        opp_pos = board.agent_2_pos if self.agent_id == 1 else board.agent_1_pos
+        while time.time() < deadline and (max_iterations is None or iterations < max_iterations):
+            iterations += 1
+            node = root
+            applied = 0
+            queens = [root]     # QueenNodes on the path, with the whole actions played after them
+            played = []
+            while not node.terminal:
+                # A QueenNode opens an ArrowNode together with its first child
+                new_nodes = 2 if isinstance(node, QueenNode) else 1
+                if node.can_widen(board, self.widen_c, self.widen_alpha) and self.has_room(root, node, new_nodes):
+                    with phase_timer(self.telemetry, "expand"):
+                        node = node.expand(board)
+                    self.node_count += new_nodes
+                    applied += 1
+                    queens.append(node)
+                    played.append((node.mover, node.action))
+                    break
+                if not node.children:
+                    break
+                node = node.best_child(rave_k=self.rave_k if self.rave else 0.0)
+                # The board only changes once a whole turn (move + arrow) is chosen
+                if isinstance(node, QueenNode):
+                    board.apply_action(*node.action, node.mover)
+                    applied += 1
+                    queens.append(node)
+                    played.append((node.mover, node.action))
+            self.telemetry.maximum("depth", applied)
+            # A player with no legal move has lost
+            if node.terminal:
+                result = node.mover
+            else:
+                result = None
+                if self.playout_depth and isinstance(node, QueenNode):
+                    before = len(played)
+                    result = self.playout(board, node.agent_id, played)
+                    applied += len(played) - before
+                if result is None:
+                    result = self.simulate(board)
+            node.backpropagate(result)
+            if self.rave:
+                self.update_amaf(queens, played, result)
+            for _ in range(applied):
+                board.undo()
+
+        return iterations
+
+    def playout(self, board: Board, agent_id: int, played: list) -> Optional[int]:
+        # Plays up to playout_depth turns on `board`, appending them to `played`.
+        # Returns the winner if a player runs out of moves, else None.
+        rng = self.rng or random
+        for _ in range(self.playout_depth):
+            if rng.random() < self.playout_epsilon:
+                action = next(iter_actions(board, agent_id, rng), None)
+            else:
+                moves = ranked_moves(board, agent_id)
+                action = (*moves[0], ranked_arrows(board, agent_id, moves[0][1])[0]) if moves else None
+            if action is None:
+                return 3 - agent_id
+            board.apply_action(*action, agent_id)
+            played.append((agent_id, action))
+            agent_id = 3 - agent_id
+        return None
 
-        my_mob = sum(len(get_valid_moves(board, pos)) for pos in my_pos)
-        opp_mob = sum(len(get_valid_moves(board, pos)) for pos in opp_pos)
+    def update_amaf(self, queens: List[QueenNode], played: list, result: int):
+        # queens[i] is the position before played[i]. Every QueenNode gets the first
+        # occurrence of each (from, to) and arrow its player used from there on.
+        for i, node in enumerate(queens):
+            win = 1.0 if result == node.agent_id else 0.5 if result == 0 else 0.0
+            moves, arrows = set(), set()
+            for player, (from_pos, to_pos, arrow_pos) in played[i:]:
+                if player != node.agent_id:
+                    continue
+                if (from_pos, to_pos) not in moves:
+                    moves.add((from_pos, to_pos))
+                    stats = node.amaf.setdefault((from_pos, to_pos), [0, 0.0])
+                    stats[0] += 1
+                    stats[1] += win
+                if arrow_pos not in arrows:
+                    arrows.add(arrow_pos)
+                    stats = node.amaf_arrow.setdefault(arrow_pos, [0, 0.0])
+                    stats[0] += 1
+                    stats[1] += win
 
-        my_terr = self.territory_est(board, my_pos)
-        opp_terr = self.territory_est(board, opp_pos)
+    def has_room(self, root, node, new_nodes: int) -> bool:
+        # Whether `node` may add new_nodes children, evicting first if the budget is used up
+        if self.max_nodes is None:
+            return True
+        if self.node_count + new_nodes > self.max_nodes and self._evictable:
+            self.evict(root, node)
+        self.memory_stats["peak_nodes"] = max(self.memory_stats["peak_nodes"], self.node_count)
+        return self.node_count + new_nodes <= self.max_nodes
 
-        score = (my_mob - opp_mob) + 0.5 * (my_terr - opp_terr)
+    def evict(self, root, keep):
+        # Collapse the least-visited subtrees until the tree is at 3/4 of the budget, so
+        # that evictions stay rare. `keep` with its ancestors is the path being searched
+        # and is left alone, as are the two-stage root's ArrowNodes: they hold the arrow.
+        nodes = [root]
+        for node in nodes:
+            nodes.extend(child for child, _ in node.children)
+        size = {}
+        for node in reversed(nodes):
+            size[node] = 1 + sum(size[child] for child, _ in node.children)
+        depth = {root: 0}
+        for node in nodes[1:]:
+            depth[node] = depth[node.parent] + 1
+        path = set()
+        while keep is not None:
+            path.add(keep)
+            keep = keep.parent
+        min_depth = 2 if self.two_stage else 1
+        candidates = [node for node in nodes if node.children and depth[node] >= min_depth and node not in path]
+        # Deeper first on equal visits, so a subtree is never collapsed after its ancestor
+        candidates.sort(key=lambda node: (node.visits, -depth[node]))
+        self.memory_stats["evictions"] += 1
+        target = self.max_nodes * 3 // 4
+        freed_total = 0
+        for node in candidates:
+            if self.node_count <= target:
+                break
+            freed = size[node] - 1
+            node.collapse()
+            ancestor = node.parent
+            while ancestor is not None:
+                size[ancestor] -= freed
+                ancestor = ancestor.parent
+            self.node_count -= freed
+            freed_total += freed
+            self.memory_stats["collapsed"] += 1
+        self.memory_stats["freed"] += freed_total
+        # Only expansions add candidates, and none can happen until something is freed
+        if not freed_total:
+            self._evictable = False
+
+    def parallel_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+            # Also terminated when the agent is collected, if close() is never called
+            self._pool_finalizer = weakref.finalize(self, self._pool.terminate)
+        base_seed = self.rng.getrandbits(32) if self.rng else random.getrandbits(32)
+        # Every worker builds its own tree, so there is nothing to reuse here
+        options = {"time_limit": self.time_limit, "max_iterations": self.max_iterations,
+                   "two_stage": self.two_stage, "widen_c": self.widen_c, "widen_alpha": self.widen_alpha,
+                   "max_nodes": self.max_nodes, "rave": self.rave, "rave_k": self.rave_k,
+                   "playout_depth": self.playout_depth, "playout_epsilon": self.playout_epsilon}
+        tasks = [(board, self.agent_id, base_seed + i, options) for i in range(self.workers)]
+
+        merged: Dict[tuple, List[float]] = {}
+        self.iterations = 0
+        for iterations, stats in self._pool.map(_root_search, tasks):
+            self.iterations += iterations
+            for action, (visits, value) in stats.items():
+                total = merged.setdefault(action, [0, 0.0])
+                total[0] += visits
+                total[1] += value
+
+        if not merged:
+            return self.fallback_action(board)
+        # The most visited action over all searches; summed values break ties
+        return max(merged, key=lambda action: (merged[action][0], merged[action][1]))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool_finalizer()
+            self._pool = None
+
+    def simulate(self, board: Board) -> int:
+        self.telemetry.count("evals")
+        with phase_timer(self.telemetry, "eval"):
+            features = evaluate(board, self.agent_id)
+        score = features["mobility"] + 0.5 * features["territory"]
         if score > 0:
             return self.agent_id
         elif score < 0:
             return 3 - self.agent_id
         return 0
 
-    def territory_est(self, board: Board, pos: List[Tuple[int, int]]) -> int:
-        visited = set()
-        frontier = list(pos)
-        count = 0
-        while frontier:
-            x, y = frontier.pop()
-            if (x, y) in visited:
-                continue
-            visited.add((x, y))
-            count += 1
-            for dx, dy in board.DIRECTIONS:
-                nx, ny = x + dx, y + dy
-                if board.bound_check(nx, ny) and not board.block_stat_check(nx, ny) and (nx, ny) not in visited:
-                    frontier.append((nx, ny))
-        return count
-
     def fallback_action(self, board: Board):
         pos = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
         legal = []
@@ -1,10 +1,54 @@
 from random_agent import RandomAgent
 from heuristic_agent import HeuristicAgent
 from MCTS_agent import MCTSAgent
+from mcts_pool import PooledMCTSAgent
 from iterative_agent import IterativeAgent
+from opening_book import BookAgent, open_book
+from endgame import EndgameAgent
+import json
+from typing import Dict, Tuple
+
+AGENT_TYPES = ("random", "heuristic", "mcts", "mcts_pool", "iterative")
+
+def parse_value(text: str):
+    # Option values from the command line or a protocol: JSON when it parses (numbers,
+    # true/false, null), the raw string otherwise
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def parse_agent_spec(spec: str) -> Tuple[str, Dict]:
+    # "mcts:rave=true,time_limit=0.5" -> ("mcts", {"rave": True, "time_limit": 0.5});
+    # a plain type name has no options
+    agent_type, _, options = spec.partition(":")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        kwargs[key] = parse_value(value)
+    return agent_type, kwargs
 
 def retrieve_agent(agent_type: str, agent_id: int, **kwargs):
     agent_type = agent_type.lower()
+
+    if kwargs.get("ponder"):
+        # Runs in its own process and keeps searching on the opponent's time
+        from ponder import PonderingAgent
+        options = {k: v for k, v in kwargs.items() if k != "ponder"}
+        return PonderingAgent(agent_type, agent_id, **options)
+    if kwargs.get("book"):
+        # Opening book file: book positions are answered without searching
+        options = {k: v for k, v in kwargs.items() if k != "book"}
+        return BookAgent(retrieve_agent(agent_type, agent_id, **options), open_book(kwargs["book"]))
+    if kwargs.get("endgame"):
+        # Separated territories are filled by the endgame solver
+        options = {k: v for k, v in kwargs.items() if k != "endgame"}
+        return EndgameAgent(retrieve_agent(agent_type, agent_id, **options))
+    if kwargs.get("params"):
+        # JSON file of options (e.g. weights written by tuning.py); explicit kwargs win
+        with open(kwargs["params"]) as f:
+            options = {**json.load(f), **{k: v for k, v in kwargs.items() if k != "params"}}
+        return retrieve_agent(agent_type, agent_id, **options)
     
     if agent_type == "random":
         return RandomAgent(agent_id)
@@ -15,20 +59,38 @@ def retrieve_agent(agent_type: str, agent_id: int, **kwargs):
             time_limit=kwargs.get("time_limit", 2.0),
             max_depth=kwargs.get("max_depth", 2),
             weight_mobility=kwargs.get("weight_mobility", 0.4),
-            weight_territory=kwargs.get("weight_territory", 0.4)
+            weight_territory=kwargs.get("weight_territory", 0.4),
+            weight_centrality=kwargs.get("weight_centrality", 0.2),
+            tt_size=kwargs.get("tt_size", 1 << 18)
         )
 
     elif agent_type == "mcts":
         return MCTSAgent(
             agent_id,
             time_limit=kwargs.get("time_limit", 2.0),
+            workers=kwargs.get("workers", 1),
+            seed=kwargs.get("seed"),
+            reuse_tree=kwargs.get("reuse_tree", True),
+            two_stage=kwargs.get("two_stage", False),
+            max_nodes=kwargs.get("max_nodes"),
+            max_bytes=kwargs.get("max_bytes"),
+            rave=kwargs.get("rave", False),
+            playout_depth=kwargs.get("playout_depth", 0),
+        )
+
+    elif agent_type == "mcts_pool":
+        return PooledMCTSAgent(
+            agent_id,
+            time_limit=kwargs.get("time_limit", 2.0),
+            seed=kwargs.get("seed"),
         )
 
     elif agent_type == "iterative":
         return IterativeAgent(
             agent_id,
             time_limit=kwargs.get("time_limit", 2.0),
-            max_depth=kwargs.get("max_depth", 4)
+            max_depth=kwargs.get("max_depth", 4),
+            tt_size=kwargs.get("tt_size", 1 << 18)
         )
     
     else:
@@ -0,0 +1,475 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+from board import Board
+from bitboard import BitBoard
+from game import Game
+from rules import get_valid_moves, get_valid_arrows, count_valid_moves
+
+def random_position(size: int, plies: int, seed: int, board_cls=Board) -> Board:
+    # Reproducible mid-game position: symmetric start from Game, then random legal plies
+    random.seed(seed)
+    board = Game(None, None, size, board_cls=board_cls).board
+    rng = random.Random(seed)
+    for ply in range(plies):
+        agent_id = 1 if ply % 2 == 0 else 2
+        actions = all_actions(board, agent_id)
+        if not actions:
+            break
+        # Sorted so that every backend reaches the same position
+        from_pos, to_pos, arrow_pos = rng.choice(sorted(actions))
+        board.move(from_pos, to_pos, agent_id)
+        board.arrow_place(to_pos, arrow_pos, agent_id)
+        board.update_temp_blocks()
+    return board
+
+def all_actions(board: Board, agent_id: int) -> List[Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]]:
+    pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+    actions = []
+    for from_pos in pos_list:
+        for to_pos in get_valid_moves(board, from_pos):
+            for arrow_pos in get_valid_arrows(board, to_pos):
+                actions.append((from_pos, to_pos, arrow_pos))
+    return actions
+
+def _time_per_call(fn, min_time: float = 0.2) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+def bench_movegen(sizes=(10, 15, 20), plies: int = 10, seed: int = 0):
+    print(f"{'size':>4} {'backend':>9} {'actions':>8} {'gen ms':>9} {'mob us':>9} {'speedup':>8}")
+    for size in sizes:
+        base = None
+        for board_cls in (Board, BitBoard):
+            board = random_position(size, plies, seed, board_cls)
+            pieces = board.agent_1_pos + board.agent_2_pos
+            n_actions = len(all_actions(board, 1))
+            gen = _time_per_call(lambda: all_actions(board, 1))
+            mob = _time_per_call(lambda: sum(count_valid_moves(board, pos) for pos in pieces))
+            base = base or gen
+            print(f"{size:>4} {board_cls.__name__:>9} {n_actions:>8} {gen * 1e3:>9.3f} {mob * 1e6:>9.1f} {base / gen:>7.2f}x")
+
+def bench_make_unmake(sizes=(10, 15), plies: int = 10, seed: int = 0):
+    # Cost of stepping into a child position: clone + move vs apply_action + undo
+    print(f"{'size':>4} {'clone us':>9} {'apply+undo us':>14} {'speedup':>8}")
+    for size in sizes:
+        board = random_position(size, plies, seed)
+        actions = all_actions(board, 1)[:200]
+
+        def by_clone():
+            for from_pos, to_pos, arrow_pos in actions:
+                child = board.clone()
+                child.move(from_pos, to_pos, 1)
+                child.arrow_place(to_pos, arrow_pos, 1)
+                child.update_temp_blocks()
+
+        def in_place():
+            for from_pos, to_pos, arrow_pos in actions:
+                board.apply_action(from_pos, to_pos, arrow_pos, 1)
+                board.undo()
+
+        clone_t = _time_per_call(by_clone) / len(actions)
+        undo_t = _time_per_call(in_place) / len(actions)
+        print(f"{size:>4} {clone_t * 1e6:>9.2f} {undo_t * 1e6:>14.2f} {clone_t / undo_t:>7.2f}x")
+
+def bench_deep_lines(sizes=(10, 15), depth: int = 12, lines: int = 50, plies: int = 10, seed: int = 0):
+    # Walks random lines `depth` plies deep with apply_action and back with undo, as a
+    # deep search does; past the first 5 plies every position has 5 live temp blocks.
+    # Also times clone and the temp-block hash on such a position.
+    print(f"{'size':>4} {'apply+undo us':>14} {'clone us':>9} {'lifetimes us':>13}")
+    for size in sizes:
+        board = random_position(size, plies, seed)
+        rng = random.Random(seed)
+        paths = []
+        for _ in range(lines):
+            path, agent_id = [], 1
+            for _ in range(depth):
+                actions = all_actions(board, agent_id)
+                if not actions:
+                    break
+                action = rng.choice(actions)
+                board.apply_action(*action, agent_id)
+                path.append((action, agent_id))
+                agent_id = 3 - agent_id
+            for _ in path:
+                board.undo()
+            paths.append(path)
+
+        def walk():
+            for path in paths:
+                for action, agent_id in path:
+                    board.apply_action(*action, agent_id)
+                for _ in path:
+                    board.undo()
+
+        steps = sum(len(path) for path in paths)
+        walk_t = _time_per_call(walk) / steps
+        for action, agent_id in paths[0]:
+            board.apply_action(*action, agent_id)
+        clone_t = _time_per_call(board.clone)
+        lifetime_t = _time_per_call(board.lifetime_masks)
+        print(f"{size:>4} {walk_t * 1e6:>14.2f} {clone_t * 1e6:>9.2f} {lifetime_t * 1e6:>13.2f}")
+
+def bench_mcts(sizes=(10, 15), time_limit: float = 1.0, plies: int = 4, seed: int = 0):
+    from MCTS_agent import MCTSAgent
+    print(f"{'size':>4} {'iterations/s':>13}")
+    for size in sizes:
+        board = random_position(size, plies, seed)
+        agent = MCTSAgent(1, time_limit=time_limit)
+        agent.get_action(board)
+        print(f"{size:>4} {agent.iterations / time_limit:>13.1f}")
+
+def bench_root_parallel(size: int = 10, workers=(1, 2, 4), time_limit: float = 1.0, games: int = 10, seed: int = 0):
+    # Playout throughput of root-parallel MCTS, then its score against the single-process agent
+    from MCTS_agent import MCTSAgent
+    board = random_position(size, 4, seed)
+    print(f"{'workers':>7} {'playouts/s':>11} {'win rate':>9}")
+    for n in workers:
+        agent = MCTSAgent(1, time_limit=time_limit, workers=n, seed=seed)
+        agent.get_action(board)
+        rate = agent.iterations / time_limit
+        agent.close()
+        wins = 0
+        for game_index in range(games if n > 1 else 0):
+            random.seed(seed + game_index)
+            parallel_id = 1 + game_index % 2
+            agents = {parallel_id: MCTSAgent(parallel_id, time_limit=time_limit, workers=n, seed=game_index),
+                      3 - parallel_id: MCTSAgent(3 - parallel_id, time_limit=time_limit)}
+            winner = Game(agents[1], agents[2], size).run(verbose=False, return_winner=True)
+            agents[parallel_id].close()
+            wins += winner == parallel_id
+        win_rate = f"{wins / games:.2f}" if n > 1 else "-"
+        print(f"{n:>7} {rate:>11.1f} {win_rate:>9}")
+
+def bench_tree_reuse(size: int = 8, time_limit: float = 0.5, games: int = 4, seed: int = 0):
+    # How often the opponent's reply was already in the tree, and the visits it brought along
+    from MCTS_agent import MCTSAgent
+    turns = hits = carried = 0
+    for game_index in range(games):
+        random.seed(seed + game_index)
+        agents = [MCTSAgent(agent_id, time_limit=time_limit, seed=seed + game_index) for agent_id in (1, 2)]
+        Game(agents[0], agents[1], size).run(verbose=False, return_winner=True)
+        for agent in agents:
+            turns += agent.reuse_stats["turns"]
+            hits += agent.reuse_stats["hits"]
+            carried += agent.reuse_stats["carried_visits"]
+    print(f"{'turns':>6} {'hits':>6} {'hit %':>6} {'visits/hit':>11}")
+    print(f"{turns:>6} {hits:>6} {100.0 * hits / turns:>6.1f} {carried / hits if hits else 0.0:>11.1f}")
+
+def bench_two_stage(size: int = 8, time_limits=(0.25, 0.5), games: int = 6, seed: int = 0):
+    # Two-stage MCTS with progressive widening against the flat agent at the same time
+    # per move (sides alternate), plus how concentrated the root visits are
+    from MCTS_agent import MCTSAgent
+    board = random_position(size, 4, seed)
+    print(f"{'time s':>6} {'mode':>6} {'iter/s':>8} {'best share':>11} {'win rate':>9}")
+    for time_limit in time_limits:
+        for two_stage in (False, True):
+            agent = MCTSAgent(1, time_limit=time_limit, two_stage=two_stage, reuse_tree=False)
+            root = agent.search(board)
+            share = root.choose().visits / root.visits
+            wins = 0
+            for game_index in range(games if two_stage else 0):
+                random.seed(seed + game_index)
+                staged_id = 1 + game_index % 2
+                agents = {staged_id: MCTSAgent(staged_id, time_limit=time_limit, two_stage=True),
+                          3 - staged_id: MCTSAgent(3 - staged_id, time_limit=time_limit)}
+                wins += Game(agents[1], agents[2], size).run(verbose=False, return_winner=True) == staged_id
+            win_rate = f"{wins / games:.2f}" if two_stage else "-"
+            mode = "staged" if two_stage else "flat"
+            print(f"{time_limit:>6} {mode:>6} {agent.iterations / time_limit:>8.1f} {share:>11.3f} {win_rate:>9}")
+
+def bench_node_pool(sizes=(8, 10), time_limit: float = 1.0, plies: int = 4, seed: int = 0):
+    # MCTSAgent (one object per node) vs PooledMCTSAgent (flat arrays): iterations/s with
+    # the real evaluation and with a constant playout (tree overhead only), and memory per
+    # node: memory traced over one search (the pool's arrays included, at their grown
+    # capacity) over the nodes the search visited. "slots" is the pool's allocated node
+    # count, which children allocated on first try keep equal to the visited nodes.
+    import tracemalloc
+    from MCTS_agent import MCTSAgent
+    from mcts_pool import PooledMCTSAgent
+
+    def count_nodes(node) -> int:
+        return 1 + sum(count_nodes(child) for child, _ in node.children)
+
+    print(f"{'size':>4} {'agent':>7} {'iter/s':>8} {'tree iter/s':>12} {'nodes':>8} {'slots':>8} {'bytes/node':>11}")
+    for size in sizes:
+        board = random_position(size, plies, seed)
+        for name, make in (("objects", lambda: MCTSAgent(1, time_limit=time_limit, reuse_tree=False)),
+                           ("pool", lambda: PooledMCTSAgent(1, time_limit=time_limit))):
+            agent = make()
+            agent.search(board)
+            rate = agent.iterations / time_limit
+            agent.simulate = lambda board: 0
+            agent.search(board)
+            tree_rate = agent.iterations / time_limit
+            if name == "pool":
+                agent.pool = None   # Allocated again under tracing
+            tracemalloc.start()
+            tree = agent.search(board)
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            if name == "pool":
+                nodes, slots = int((tree.visits[:tree.count] > 0).sum()), tree.count
+            else:
+                nodes = slots = count_nodes(tree)
+            del tree
+            print(f"{size:>4} {name:>7} {rate:>8.1f} {tree_rate:>12.1f} {nodes:>8} {slots:>8} {traced / nodes:>11.1f}")
+
+def bench_node_budget(size: int = 6, budgets=(None, 2000, 300), time_limit: float = 2.0, plies: int = 10,
+                      games: int = 4, seed: int = 2):
+    # Peak traced memory of one long search under each node budget (iterations/s are
+    # slowed down by tracemalloc), and the score of the bounded agent against the
+    # unbounded one at 0.5 s per move
+    import tracemalloc
+    from MCTS_agent import MCTSAgent
+    board = random_position(size, plies, seed)
+    print(f"{'budget':>7} {'iter/s':>8} {'peak nodes':>11} {'peak KB':>8} {'evictions':>10} {'win rate':>9}")
+    for budget in budgets:
+        agent = MCTSAgent(1, time_limit=time_limit, max_nodes=budget, reuse_tree=False)
+        tracemalloc.start()
+        root = agent.search(board)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        peak_nodes = agent.memory_stats["peak_nodes"] if budget else agent.node_count
+        wins = 0
+        for game_index in range(games if budget else 0):
+            random.seed(seed + game_index)
+            bounded_id = 1 + game_index % 2
+            agents = {bounded_id: MCTSAgent(bounded_id, time_limit=0.5, max_nodes=budget),
+                      3 - bounded_id: MCTSAgent(3 - bounded_id, time_limit=0.5)}
+            wins += Game(agents[1], agents[2], size).run(verbose=False, return_winner=True) == bounded_id
+        win_rate = f"{wins / games:.2f}" if budget else "-"
+        print(f"{str(budget):>7} {agent.iterations / time_limit:>8.1f} {peak_nodes:>11} {peak / 1024:>8.0f} "
+              f"{agent.memory_stats['evictions']:>10} {win_rate:>9}")
+
+def bench_rave(size: int = 8, iterations: int = 300, fractions=(0.25, 0.5, 1.0), playout_depth: int = 0,
+               games: int = 4, seed: int = 0):
+    # Iterations RAVE needs to match the two-stage agent without it: a RAVE agent with a
+    # fraction of the baseline's iterations per move plays it, sides alternating
+    from MCTS_agent import MCTSAgent
+    print(f"{'baseline it':>11} {'rave it':>8} {'playout':>8} {'win rate':>9}")
+    for fraction in fractions:
+        budget = max(1, int(iterations * fraction))
+        wins = 0
+        for game_index in range(games):
+            random.seed(seed + game_index)
+            rave_id = 1 + game_index % 2
+            agents = {rave_id: MCTSAgent(rave_id, time_limit=60.0, max_iterations=budget, rave=True,
+                                         playout_depth=playout_depth),
+                      3 - rave_id: MCTSAgent(3 - rave_id, time_limit=60.0, max_iterations=iterations, two_stage=True)}
+            wins += Game(agents[1], agents[2], size).run(verbose=False, return_winner=True) == rave_id
+        print(f"{iterations:>11} {budget:>8} {playout_depth:>8} {wins / games:>9.2f}")
+
+def bench_pondering(size: int = 8, agent_type: str = "mcts", time_limit: float = 0.5, games: int = 4, seed: int = 0):
+    # A pondering agent against the same agent without pondering, both in their own
+    # process, at the same time_limit. Pondering only adds strength when the two
+    # processes have a core each; on one core it takes time from the opponent.
+    from ponder import PonderingAgent
+    wins = 0
+    carried = {True: [], False: []}
+    for game_index in range(games):
+        random.seed(seed + game_index)
+        ponder_id = 1 + game_index % 2
+        agents = {ponder_id: PonderingAgent(agent_type, ponder_id, time_limit=time_limit),
+                  3 - ponder_id: PonderingAgent(agent_type, 3 - ponder_id, ponder=False, time_limit=time_limit)}
+        try:
+            wins += Game(agents[1], agents[2], size).run(verbose=False, return_winner=True) == ponder_id
+            for agent_id, agent in agents.items():
+                stats = agent.stats().get("reuse_stats")
+                if stats and stats["turns"]:
+                    carried[agent_id == ponder_id].append(stats["carried_visits"] / stats["turns"])
+        finally:
+            for agent in agents.values():
+                agent.close()
+    print(f"{'agent':>9} {'cpus':>5} {'win rate':>9} {'visits kept/turn':>17} {'without':>8}")
+    mean = lambda values: sum(values) / len(values) if values else 0.0
+    print(f"{agent_type:>9} {multiprocessing.cpu_count():>5} {wins / games:>9.2f} "
+          f"{mean(carried[True]):>17.1f} {mean(carried[False]):>8.1f}")
+
+def bench_move_ordering(sizes=(8, 10), max_depth: int = 3, time_limit: float = 1.0, plies: int = 10, seed: int = 1):
+    # Cutoff statistics of HeuristicAgent's alpha-beta and whether the full depth finished in time
+    from heuristic_agent import HeuristicAgent
+    print(f"{'size':>4} {'nodes':>8} {'cutoffs':>8} {'first %':>8} {'completed':>10} {'time s':>7}")
+    for size in sizes:
+        board = random_position(size, plies, seed)
+        agent = HeuristicAgent(1, max_depth=max_depth, time_limit=time_limit)
+        start = time.perf_counter()
+        agent.get_action(board)
+        elapsed = time.perf_counter() - start
+        stats = agent.stats
+        first = 100.0 * stats["first_move_cutoffs"] / stats["cutoffs"] if stats["cutoffs"] else 0.0
+        print(f"{size:>4} {stats['nodes']:>8} {stats['cutoffs']:>8} {first:>8.1f} {str(stats['completed']):>10} {elapsed:>7.2f}")
+
+# Fixed suite positions: (name, size, plies, seed, perft depth). All but the starts
+# have temp blocks on the board.
+SUITE_POSITIONS = [
+    ("10x10-start", 10, 0, 0, 2),
+    ("10x10-ply10", 10, 10, 0, 2),
+    ("10x10-ply30", 10, 30, 0, 2),
+    ("15x15-start", 15, 0, 0, 1),
+    ("15x15-ply12", 15, 12, 0, 1),
+    ("15x15-ply40", 15, 40, 0, 2),
+]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+def bench_leaf_eval(sizes=(8, 10, 15), plies: int = 10, seed: int = 0):
+    # Mobility difference at every child of a position: recounted from scratch vs read from
+    # Board's incrementally maintained counters, which make apply_action + undo dearer
+    print(f"{'size':>4} {'scratch us':>11} {'tracked us':>11} {'speedup':>8} {'upkeep us':>10} {'bitboard us':>12}")
+    for size in sizes:
+        board = random_position(size, plies, seed)
+        bits = BitBoard.from_board(board)
+        actions = all_actions(board, 1)[:200]
+
+        def leaves(board, evaluate):
+            def run():
+                for action in actions:
+                    board.apply_action(*action, 1)
+                    evaluate(board)
+                    board.undo()
+            return lambda: _time_per_call(run) / len(actions)
+
+        def scratch(board):
+            return (sum(len(get_valid_moves(board, pos)) for pos in board.agent_1_pos)
+                    - sum(len(get_valid_moves(board, pos)) for pos in board.agent_2_pos))
+
+        def tracked(board):
+            return board.total_mobility(1) - board.total_mobility(2)
+
+        scratch_t = leaves(board, scratch)()
+        bare_t = leaves(board, lambda b: None)()
+        board.total_mobility(1)     # Starts the tracking
+        tracked_t = leaves(board, tracked)()
+        upkeep_t = leaves(board, lambda b: None)() - bare_t
+        bits_t = leaves(bits, tracked)()
+        print(f"{size:>4} {scratch_t * 1e6:>11.2f} {tracked_t * 1e6:>11.2f} {scratch_t / tracked_t:>7.2f}x "
+              f"{upkeep_t * 1e6:>10.2f} {bits_t * 1e6:>12.2f}")
+
+def perft(board: Board, agent_id: int, depth: int) -> int:
+    # Number of action sequences of `depth` turns, through get_valid_moves / get_valid_arrows
+    total = 0
+    pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+    for from_pos in list(pos_list):
+        for to_pos in get_valid_moves(board, from_pos):
+            arrows = get_valid_arrows(board, to_pos)
+            if depth == 1:
+                total += len(arrows)
+                continue
+            for arrow_pos in arrows:
+                board.apply_action(from_pos, to_pos, arrow_pos, agent_id)
+                total += perft(board, 3 - agent_id, depth - 1)
+                board.undo()
+    return total
+
+def position_digest(board: Board) -> str:
+    # Guards against a suite position silently changing (e.g. a new start generator)
+    state = (board.grid, board.agent_1_pos, board.agent_2_pos, sorted(board.temp_blocks.items()))
+    return hashlib.sha1(repr(state).encode()).hexdigest()[:12]
+
+def suite_perft() -> Dict[str, Dict]:
+    results = {}
+    for name, size, plies, seed, depth in SUITE_POSITIONS:
+        counts = {}
+        for board_cls in (Board, BitBoard):
+            board = random_position(size, plies, seed, board_cls)
+            agent_id = 1 if plies % 2 == 0 else 2
+            start = time.perf_counter()
+            counts[board_cls.__name__] = [perft(board, agent_id, d) for d in range(1, depth + 1)]
+            counts[board_cls.__name__ + "_s"] = round(time.perf_counter() - start, 3)
+        if counts["Board"] != counts["BitBoard"]:
+            raise AssertionError(f"{name}: backends disagree: {counts['Board']} vs {counts['BitBoard']}")
+        results[name] = {"digest": position_digest(board), "temp_blocks": len(board.temp_blocks),
+                         "counts": counts["Board"], "board_s": counts["Board_s"], "bitboard_s": counts["BitBoard_s"]}
+    return results
+
+def suite_throughput(time_limit: float = 1.0) -> Dict[str, float]:
+    # Higher is better for every entry
+    from heuristic_agent import HeuristicAgent
+    from iterative_agent import IterativeAgent
+    from MCTS_agent import MCTSAgent
+    results = {}
+    for name, size, plies, seed in (("10x10", 10, 10, 0), ("15x15", 15, 12, 0)):
+        for board_cls in (Board, BitBoard):
+            board = random_position(size, plies, seed, board_cls)
+            actions = len(all_actions(board, 1))
+            results[f"{name}/movegen_actions_per_s/{board_cls.__name__}"] = actions / _time_per_call(lambda: all_actions(board, 1))
+        board = random_position(size, plies, seed)
+        agent = HeuristicAgent(1, max_depth=2, time_limit=time_limit)
+        start = time.perf_counter()
+        agent.get_action(board)
+        results[f"{name}/heuristic_nodes_per_s"] = agent.stats["nodes"] / (time.perf_counter() - start)
+        # Depth reached per second as a rate with a fixed amount of work: the completed
+        # depth under time_limit jumps between whole numbers from run to run
+        agent = IterativeAgent(1, time_limit=600.0, max_depth=2)
+        start = time.perf_counter()
+        agent.get_action(board)
+        results[f"{name}/iterative_depth2_per_s"] = 1 / (time.perf_counter() - start)
+        agent = MCTSAgent(1, time_limit=time_limit, reuse_tree=False)
+        agent.get_action(board)
+        results[f"{name}/mcts_iterations_per_s"] = agent.iterations / time_limit
+    return results
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    # Perft counts must match exactly; throughput may not drop by more than `tolerance`
+    problems = []
+    for name, entry in baseline.get("perft", {}).items():
+        current = results["perft"].get(name)
+        if current is None:
+            problems.append(f"perft {name}: missing")
+        elif current["digest"] != entry["digest"]:
+            problems.append(f"perft {name}: position changed ({current['digest']} != {entry['digest']})")
+        elif current["counts"] != entry["counts"]:
+            problems.append(f"perft {name}: {current['counts']} != {entry['counts']}")
+    for name, value in baseline.get("throughput", {}).items():
+        current = results["throughput"].get(name)
+        if current is not None and current < value * (1 - tolerance):
+            problems.append(f"throughput {name}: {current:.1f} < {value:.1f} (-{100 * (1 - current / value):.0f}%)")
+    return problems
+
+def run_suite(baseline_path: str = BASELINE_PATH, update: bool = False, tolerance: float = 0.3,
+              time_limit: float = 1.0) -> List[str]:
+    results = {"perft": suite_perft(), "throughput": suite_throughput(time_limit)}
+    print(f"{'position':>12} {'temp':>5} {'perft counts':>24} {'Board s':>8} {'BitBoard s':>11}")
+    for name, entry in results["perft"].items():
+        print(f"{name:>12} {entry['temp_blocks']:>5} {str(entry['counts']):>24} {entry['board_s']:>8.3f} {entry['bitboard_s']:>11.3f}")
+    for name, value in results["throughput"].items():
+        print(f"{name:<45} {value:>14.2f}")
+
+    if update or not os.path.exists(baseline_path):
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {baseline_path}")
+        return []
+    with open(baseline_path) as f:
+        problems = compare_to_baseline(results, json.load(f), tolerance)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if not problems:
+        print("No regressions against the baseline")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks; --suite runs perft and throughput against a baseline.")
+    parser.add_argument("--suite", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+    if args.suite or args.update_baseline:
+        problems = run_suite(args.baseline, update=args.update_baseline, tolerance=args.tolerance)
+        sys.exit(1 if problems else 0)
+    bench_movegen()
+    bench_make_unmake()
+    bench_mcts()
@@ -0,0 +1,126 @@
+from typing import List, Tuple, Dict
+from board import Board, tile_stat
+
+# Ray tables are shared by every BitBoard of the same size.
+# rays[d][sq] is the mask of all squares strictly beyond `sq` in direction d,
+# _POSITIVE[d] tells whether the square index grows along direction d.
+_TABLES: Dict[int, Tuple[List[List[int]], List[Tuple[int, int]]]] = {}
+_POSITIVE = [dx > 0 or (dx == 0 and dy > 0) for dx, dy in Board.DIRECTIONS]
+
+
+def ray_tables(size: int) -> Tuple[List[List[int]], List[Tuple[int, int]]]:
+    if size not in _TABLES:
+        rays = [[0] * (size * size) for _ in Board.DIRECTIONS]
+        for d, (dx, dy) in enumerate(Board.DIRECTIONS):
+            for x in range(size):
+                for y in range(size):
+                    mask = 0
+                    nx, ny = x + dx, y + dy
+                    while 0 <= nx < size and 0 <= ny < size:
+                        mask |= 1 << (nx * size + ny)
+                        nx += dx
+                        ny += dy
+                    rays[d][x * size + y] = mask
+        squares = [(i // size, i % size) for i in range(size * size)]
+        _TABLES[size] = (rays, squares)
+    return _TABLES[size]
+
+
+class BitBoard(Board):
+    # Same rules and API as Board, but occupancy, arrows and temp blocks are also
+    # kept as integer bitmasks (bit index = x * size + y) so that sliding move
+    # generation becomes a handful of mask operations per direction.
+    def __init__(self, size: int = 10):
+        super().__init__(size)
+        self.rays, self.squares = ray_tables(size)
+        # masks[stat] holds the squares currently in that tile state (EMPTY unused)
+        self.masks = [0, 0, 0, 0]
+        self.blocked = 0
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state["rays"], state["squares"]
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.rays, self.squares = ray_tables(self.size)
+
+    def _set_tile(self, x: int, y: int, stat: int):
+        bit = 1 << (x * self.size + y)
+        old = self.grid[x][y]
+        if old != tile_stat.EMPTY:
+            self.masks[old] &= ~bit
+        if stat == tile_stat.EMPTY:
+            self.blocked &= ~bit
+        else:
+            self.masks[stat] |= bit
+            self.blocked |= bit
+        self.grid[x][y] = stat
+
+    def block_stat_check(self, x: int, y: int) -> bool:
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            return True
+        return (self.blocked >> (x * self.size + y)) & 1 == 1
+
+    def move_mask(self, sq: int) -> int:
+        # Union over the 8 directions of the squares reachable before the first blocker
+        blocked = self.blocked
+        rays = self.rays
+        result = 0
+        for d in range(8):
+            ray = rays[d][sq]
+            hits = ray & blocked
+            if hits:
+                if _POSITIVE[d]:
+                    first = (hits & -hits).bit_length() - 1
+                else:
+                    first = hits.bit_length() - 1
+                # Drop the blocker itself and everything behind it
+                ray ^= rays[d][first] | (1 << first)
+            result |= ray
+        return result
+
+    def moves_from(self, pos: Tuple[int, int]) -> List[Tuple[int, int]]:
+        mask = self.move_mask(pos[0] * self.size + pos[1])
+        squares = self.squares
+        moves = []
+        while mask:
+            low = mask & -mask
+            moves.append(squares[low.bit_length() - 1])
+            mask ^= low
+        return moves
+
+    def mobility(self, pos: Tuple[int, int]) -> int:
+        return self.move_mask(pos[0] * self.size + pos[1]).bit_count()
+
+    def amazon_mobility(self, pos: Tuple[int, int]) -> int:
+        # A popcount is cheaper here than keeping Board's incremental counters up to date
+        return self.mobility(pos)
+
+    def valid_path(self, fx: int, fy: int, tx: int, ty: int) -> bool:
+        if not (0 <= tx < self.size and 0 <= ty < self.size):
+            return False
+        return (self.move_mask(fx * self.size + fy) >> (tx * self.size + ty)) & 1 == 1
+
+    @classmethod
+    def from_board(cls, board: Board) -> "BitBoard":
+        # BitBoard copy of any board, e.g. for a search that wants fast move counts
+        new_board = cls(board.size)
+        for x in range(board.size):
+            for y in range(board.size):
+                if board.grid[x][y] != tile_stat.EMPTY:
+                    new_board._set_tile(x, y, board.grid[x][y])
+        new_board.agent_1_pos = board.agent_1_pos[:]
+        new_board.agent_2_pos = board.agent_2_pos[:]
+        new_board.ply = board.ply
+        new_board.expiry = [bucket[:] for bucket in board.expiry]
+        new_board.zobrist = board.zobrist
+        new_board.temp_hash = board.temp_hash
+        return new_board
+
+    def clone(self) -> "BitBoard":
+        new_board = super().clone()
+        new_board.masks = self.masks[:]
+        new_board.blocked = self.blocked
+        return new_board
@@ -1,4 +1,5 @@
 from typing import List, Dict, Tuple, Optional
+import random
 
 class tile_stat:
     EMPTY=0
@@ -6,6 +7,42 @@ class tile_stat:
     TEMP_BLOCK=2
     BLOCK=3
 
+MASK64 = (1 << 64) - 1
+TEMP_ROTATION = 7
+
+def rotate_left(h: int, bits: int) -> int:
+    bits %= 64
+    return ((h << bits) | (h >> (64 - bits))) & MASK64
+
+class ZobristKeys:
+    # Random 64-bit keys per square for each piece kind, plus one key per
+    # temp-block countdown value (1..5). Seeded by size so hashes are reproducible.
+    # The countdown keys of a square are one key rotated by TEMP_ROTATION bits per
+    # turn left, so a turn passing (every countdown minus one) rotates the combined
+    # temp-block hash back instead of touching every block.
+    MAX_COUNTDOWN = 5
+
+    def __init__(self, size: int):
+        rng = random.Random(size)
+        squares = size * size
+        self.amazon = [None] + [[rng.getrandbits(64) for _ in range(squares)] for _ in (1, 2)]
+        self.arrow = [rng.getrandbits(64) for _ in range(squares)]
+        self.temp = []
+        for _ in range(squares):
+            key = rng.getrandbits(64)
+            self.temp.append([0] + [rotate_left(key, TEMP_ROTATION * count) for count in range(1, self.MAX_COUNTDOWN + 1)])
+        self.side = [None, rng.getrandbits(64), rng.getrandbits(64)]
+
+_ZOBRIST: Dict[int, ZobristKeys] = {}
+
+# Index of the opposite of each of Board.DIRECTIONS
+_OPPOSITE = [1, 0, 3, 2, 7, 6, 5, 4]
+
+def zobrist_keys(size: int) -> ZobristKeys:
+    if size not in _ZOBRIST:
+        _ZOBRIST[size] = ZobristKeys(size)
+    return _ZOBRIST[size]
+
 class Board:
     # Direction config
     DIRECTIONS=[
@@ -24,9 +61,64 @@ class Board:
         # Configure the grid with empty tiles
         # Grid structure: self.grid[row][col]
         self.grid = [[tile_stat.EMPTY for _ in range(size)] for _ in range(size)]
-        self.temp_blocks: Dict[Tuple[int, int], int]={}
+        # Temp blocks by expiry: a block made at ply p is released by the update_temp_blocks
+        # call that reaches ply p + 5. Live blocks expire within the next 5 plies, so a ring
+        # of 5 buckets indexed by ply % 5 holds them all (see the temp_blocks view).
+        self.ply = 0
+        self.expiry: List[List[Tuple[int, int]]] = [[] for _ in range(ZobristKeys.MAX_COUNTDOWN)]
         self.agent_1_pos=[]
         self.agent_2_pos=[]
+        # Undo records pushed by apply_action and popped by undo
+        self.history: List[tuple] = []
+        # Incremental Zobrist hash of amazons, arrows and temp-block countdowns;
+        # temp_hash is the temp-block part of it
+        self.keys = zobrist_keys(size)
+        self.zobrist = 0
+        self.temp_hash = 0
+        # Queen-move mobility of the amazon on each occupied square. None until the first
+        # total_mobility / amazon_mobility call, then kept up to date by _set_tile.
+        self.mobility_at: Optional[Dict[Tuple[int, int], int]] = None
+
+    def __getstate__(self):
+        # Zobrist keys are shared per size: rebuilt on unpickling rather than sent along
+        state = self.__dict__.copy()
+        del state["keys"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.keys = zobrist_keys(self.size)
+
+    @property
+    def temp_blocks(self) -> Dict[Tuple[int, int], int]:
+        # {pos: turns left}, built from the expiry buckets
+        blocks = {}
+        for slot, bucket in enumerate(self.expiry):
+            count = (slot - self.ply - 1) % ZobristKeys.MAX_COUNTDOWN + 1
+            for pos in bucket:
+                blocks[pos] = count
+        return blocks
+
+    def expiring_in(self, turns: int) -> List[Tuple[int, int]]:
+        # Temp blocks with `turns` (1..5) turns left
+        return self.expiry[(self.ply + turns) % ZobristKeys.MAX_COUNTDOWN]
+
+    def lifetime_masks(self) -> Tuple[int, ...]:
+        # Compact form of the temp blocks for hashing or storage: one bitmask of
+        # squares (bit x * size + y) per number of turns left, 1..5
+        masks = []
+        for turns in range(1, ZobristKeys.MAX_COUNTDOWN + 1):
+            mask = 0
+            for x, y in self.expiring_in(turns):
+                mask |= 1 << (x * self.size + y)
+            masks.append(mask)
+        return tuple(masks)
+
+    def _add_temp_block(self, pos: Tuple[int, int]):
+        self.expiry[self.ply % ZobristKeys.MAX_COUNTDOWN].append(pos)
+        key = self.keys.temp[pos[0] * self.size + pos[1]][ZobristKeys.MAX_COUNTDOWN]
+        self.temp_hash ^= key
+        self.zobrist ^= key
 
     def bound_check(self, x: int, y: int) -> bool:
         return 0 <= x < self.size and 0 <= y < self.size
@@ -39,10 +131,64 @@ class Board:
         # Check if the tile is empty.
         # If not, return True (blocked).
         return stat in (tile_stat.OCCUPIED, tile_stat.TEMP_BLOCK, tile_stat.BLOCK)
+
+    def _set_tile(self, x: int, y: int, stat: int):
+        # Every tile change goes through here so that subclasses (e.g. BitBoard)
+        # can keep their own derived state in sync with the grid.
+        if self.mobility_at is not None:
+            self._update_mobility(x, y, stat)
+        self.grid[x][y] = stat
+
+    def _update_mobility(self, x: int, y: int, stat: int):
+        # Called before (x, y) changes to `stat`. Walking out from (x, y) gives, per
+        # direction, the empty run length and the first non-empty square. An amazon at the
+        # end of a run sees (x, y) and the run on the far side, so when the square becomes
+        # blocked or free that amazon loses or gains 1 + the opposite run.
+        old = self.grid[x][y]
+        changed = (old == tile_stat.EMPTY) != (stat == tile_stat.EMPTY)
+        if old == tile_stat.OCCUPIED:
+            del self.mobility_at[(x, y)]
+        if not changed and stat != tile_stat.OCCUPIED:
+            return
+        grid = self.grid
+        runs = []
+        hits = []
+        for ray in square_rays(self.size)[x * self.size + y]:
+            n = 0
+            hit = None
+            for nx, ny in ray:
+                tile = grid[nx][ny]
+                if tile != tile_stat.EMPTY:
+                    if tile == tile_stat.OCCUPIED:
+                        hit = (nx, ny)
+                    break
+                n += 1
+            runs.append(n)
+            hits.append(hit)
+        if changed:
+            sign = -1 if old == tile_stat.EMPTY else 1
+            for d, hit in enumerate(hits):
+                if hit is not None:
+                    self.mobility_at[hit] += sign * (1 + runs[_OPPOSITE[d]])
+        if stat == tile_stat.OCCUPIED:
+            self.mobility_at[(x, y)] = sum(runs)
+
+    def amazon_mobility(self, pos: Tuple[int, int]) -> int:
+        # Number of queen moves of the amazon on pos, in O(1) once tracking has started
+        if self.mobility_at is None:
+            self.mobility_at = {}
+            for x, y in self.agent_1_pos + self.agent_2_pos:
+                self.mobility_at[(x, y)] = 0
+                self._update_mobility(x, y, tile_stat.OCCUPIED)
+        return self.mobility_at[pos]
+
+    def total_mobility(self, agent_id: int) -> int:
+        return sum(self.amazon_mobility(pos) for pos in (self.agent_1_pos if agent_id == 1 else self.agent_2_pos))
     
     def amazon_place(self, positions: List[Tuple[int, int]], agent_id: int):
         for x, y in positions:
-            self.grid[x][y] = tile_stat.OCCUPIED    # Place an amazon on the grid
+            self._set_tile(x, y, tile_stat.OCCUPIED)    # Place an amazon on the grid
+            self.zobrist ^= self.keys.amazon[agent_id][x * self.size + y]
             if agent_id == 1:
                 self.agent_1_pos.append((x, y))
             else:
@@ -60,9 +206,12 @@ class Board:
         if not self.valid_path(fx, fy, tx, ty):
             raise ValueError("Invalid path from source to destination.")
 
-        self.grid[fx][fy] = tile_stat.TEMP_BLOCK
-        self.temp_blocks[(fx, fy)] = 5 # Temporary block for 5 turns
-        self.grid[tx][ty] = tile_stat.OCCUPIED
+        self._set_tile(fx, fy, tile_stat.TEMP_BLOCK)
+        self._add_temp_block((fx, fy))  # Temporary block for 5 turns
+        self._set_tile(tx, ty, tile_stat.OCCUPIED)
+        from_sq, to_sq = fx * self.size + fy, tx * self.size + ty
+        amazon_keys = self.keys.amazon[agent_id]
+        self.zobrist ^= amazon_keys[from_sq] ^ amazon_keys[to_sq]
 
         # Update the agent's position list
         pos_list = self.agent_1_pos if agent_id == 1 else self.agent_2_pos
@@ -80,7 +229,8 @@ class Board:
         if not self.valid_path(fx, fy, tx, ty):
             raise ValueError("Invalid path for arrow placement.")
         
-        self.grid[tx][ty] = tile_stat.BLOCK
+        self._set_tile(tx, ty, tile_stat.BLOCK)
+        self.zobrist ^= self.keys.arrow[tx * self.size + ty]
 
     def valid_path(self, fx: int, fy: int, tx: int, ty: int) -> bool:
         dx = tx - fx
@@ -100,21 +250,83 @@ class Board:
         return not self.block_stat_check(tx, ty)    # Ensure the target is not blocked
 
     def update_temp_blocks(self):
-        to_remove=[]    # Grids that need to be turned to empty
-        for (x,y) in self.temp_blocks:
-            self.temp_blocks[(x,y)] -= 1
-            if self.temp_blocks[(x,y)] <= 0:    # Countdown reached zero
-                to_remove.append((x,y))
-        for pos in to_remove:
-            self.grid[pos[0]][pos[1]] = tile_stat.EMPTY
-            del self.temp_blocks[pos]
+        # Advances the ply and releases the one bucket of blocks whose time is up
+        self.ply += 1
+        slot = self.ply % ZobristKeys.MAX_COUNTDOWN
+        expired = self.expiry[slot]
+        self.expiry[slot] = []
+        temp_hash = self.temp_hash
+        temp_keys = self.keys.temp
+        for x, y in expired:
+            temp_hash ^= temp_keys[x * self.size + y][1]
+            self._set_tile(x, y, tile_stat.EMPTY)
+        # Every remaining countdown drops by one
+        temp_hash = rotate_left(temp_hash, -TEMP_ROTATION)
+        self.zobrist ^= self.temp_hash ^ temp_hash
+        self.temp_hash = temp_hash
+        return expired
+
+    def apply_action(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], arrow_pos: Tuple[int, int], agent_id: int):
+        # Unchecked move + arrow (shot from to_pos) + turn advance, for search.
+        # Callers must pass a legal action; undo() reverts it exactly.
+        pos_list = self.agent_1_pos if agent_id == 1 else self.agent_2_pos
+        index = pos_list.index(from_pos)
+        zobrist, temp_hash = self.zobrist, self.temp_hash
+        del pos_list[index]
+        pos_list.append(to_pos)
+        self._set_tile(from_pos[0], from_pos[1], tile_stat.TEMP_BLOCK)
+        self._add_temp_block(from_pos)
+        self._set_tile(to_pos[0], to_pos[1], tile_stat.OCCUPIED)
+        self._set_tile(arrow_pos[0], arrow_pos[1], tile_stat.BLOCK)
+        from_sq = from_pos[0] * self.size + from_pos[1]
+        to_sq = to_pos[0] * self.size + to_pos[1]
+        amazon_keys = self.keys.amazon[agent_id]
+        self.zobrist ^= (amazon_keys[from_sq] ^ amazon_keys[to_sq]
+                         ^ self.keys.arrow[arrow_pos[0] * self.size + arrow_pos[1]])
+        expired = self.update_temp_blocks()
+        self.history.append((agent_id, from_pos, to_pos, arrow_pos, index, expired, zobrist, temp_hash))
+
+    def undo(self):
+        agent_id, from_pos, to_pos, arrow_pos, index, expired, self.zobrist, self.temp_hash = self.history.pop()
+        # Rewind the ply: the released bucket comes back, and from_pos leaves the
+        # bucket it was added to (last, as nothing else is added during a ply)
+        self.expiry[self.ply % ZobristKeys.MAX_COUNTDOWN] = expired
+        for pos in expired:
+            self._set_tile(pos[0], pos[1], tile_stat.TEMP_BLOCK)
+        self.ply -= 1
+        self.expiry[self.ply % ZobristKeys.MAX_COUNTDOWN].pop()
+        self._set_tile(arrow_pos[0], arrow_pos[1], tile_stat.EMPTY)
+        self._set_tile(to_pos[0], to_pos[1], tile_stat.EMPTY)
+        self._set_tile(from_pos[0], from_pos[1], tile_stat.OCCUPIED)
+        pos_list = self.agent_1_pos if agent_id == 1 else self.agent_2_pos
+        pos_list.pop()
+        pos_list.insert(index, from_pos)
+
+    def compute_zobrist(self) -> int:
+        # From-scratch hash; the incrementally maintained self.zobrist must equal this
+        h = 0
+        for agent_id, pos_list in ((1, self.agent_1_pos), (2, self.agent_2_pos)):
+            for x, y in pos_list:
+                h ^= self.keys.amazon[agent_id][x * self.size + y]
+        for x in range(self.size):
+            for y in range(self.size):
+                if self.grid[x][y] == tile_stat.BLOCK:
+                    h ^= self.keys.arrow[x * self.size + y]
+        for (x, y), count in self.temp_blocks.items():
+            h ^= self.keys.temp[x * self.size + y][count]
+        return h
 
     def clone(self) -> "Board":
-        new_board = Board(self.size)
+        new_board = self.__class__(self.size)
         new_board.grid = [row[:] for row in self.grid]
         new_board.agent_1_pos = self.agent_1_pos[:]
         new_board.agent_2_pos = self.agent_2_pos[:]
-        new_board.temp_blocks = dict(self.temp_blocks)
+        new_board.ply = self.ply
+        new_board.expiry = [bucket[:] for bucket in self.expiry]
+        new_board.zobrist = self.zobrist
+        new_board.temp_hash = self.temp_hash
+        if self.mobility_at is not None:
+            new_board.mobility_at = dict(self.mobility_at)
         return new_board
 
     
@@ -131,4 +343,17 @@ class Board:
             }
             for row in self.grid:
                 print(" ".join(symbols[cell] for cell in row))
-            print()
\ No newline at end of file
+            print()
+
+_RAYS: Dict[int, List[List[List[Tuple[int, int]]]]] = {}
+
+def square_rays(size: int) -> List[List[List[Tuple[int, int]]]]:
+    # square_rays(size)[x * size + y][d]: the squares beyond (x, y) in direction d, nearest first
+    if size not in _RAYS:
+        rays = []
+        for x in range(size):
+            for y in range(size):
+                rays.append([[(x + dx * k, y + dy * k) for k in range(1, size)
+                              if 0 <= x + dx * k < size and 0 <= y + dy * k < size] for dx, dy in Board.DIRECTIONS])
+        _RAYS[size] = rays
+    return _RAYS[size]
@@ -0,0 +1,216 @@
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from board import Board, tile_stat
+
+Action = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+Square = Tuple[int, int]
+
+# Endgame of separated territories. Arrows are permanent, so the squares that are not
+# arrows split into king-connected regions that no queen move or arrow can leave
+# (temp blocks count as part of a region: they open up again). Once every region holds
+# amazons of one side only, the players fill their own regions and the side that
+# runs out of moves first loses. Each move shoots one arrow into the mover's regions,
+# so a region with k free squares lasts at most k moves.
+#
+# Small regions are solved exactly: the longest filling sequence with the real
+# temp-block timing (playable, so a lower bound) and, when needed, with vacated squares
+# free at once (it only adds options, so an upper bound). Larger regions get a greedy
+# filling sequence as the lower bound and their free squares as the upper bound.
+# Results are cached by region shape, translated to the origin.
+
+EXACT_SQUARES = 8       # Largest region (free squares) solved exactly
+CACHE_SIZE = 1 << 16
+
+_CACHE: Dict[tuple, list] = {}     # shape -> [lower, relaxed upper or None, move]
+
+def partition(board: Board) -> Optional[List[Tuple[int, List[Square]]]]:
+    # (owner, squares) for every region holding amazons, or None while a region
+    # holds amazons of both sides
+    owners = {pos: 1 for pos in board.agent_1_pos}
+    owners.update((pos, 2) for pos in board.agent_2_pos)
+    seen = set()
+    regions = []
+    for start, owner in owners.items():
+        if start in seen:
+            continue
+        seen.add(start)
+        squares = [start]
+        i = 0
+        while i < len(squares):
+            x, y = squares[i]
+            i += 1
+            for dx, dy in board.DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) in seen or not board.bound_check(nx, ny) or board.grid[nx][ny] == tile_stat.BLOCK:
+                    continue
+                if owners.get((nx, ny), owner) != owner:
+                    return None
+                seen.add((nx, ny))
+                squares.append((nx, ny))
+        regions.append((owner, squares))
+    return regions
+
+def _slide(free: FrozenSet[Square], start: Square, blocked) -> List[Square]:
+    targets = []
+    for dx, dy in Board.DIRECTIONS:
+        x, y = start[0] + dx, start[1] + dy
+        while (x, y) in free and (x, y) not in blocked:
+            targets.append((x, y))
+            x += dx
+            y += dy
+    return targets
+
+def _successors(cells: FrozenSet[Square], state: tuple, timed: bool):
+    # state: (amazons, arrows, temps); temps are (square, own turns still blocked)
+    amazons, arrows, temps = state
+    blocked = set(amazons) | arrows | {sq for sq, _ in temps}
+    for from_pos in amazons:
+        for to_pos in _slide(cells, from_pos, blocked):
+            # The vacated square is blocked for the arrow, the new one is occupied
+            for arrow_pos in _slide(cells, to_pos, blocked | {to_pos}):
+                moved = tuple(sorted(to_pos if a == from_pos else a for a in amazons))
+                if timed:
+                    # A vacated square stays blocked for the mover's next two turns
+                    left = tuple(sorted([(sq, n - 1) for sq, n in temps if n > 1] + [(from_pos, 2)]))
+                else:
+                    left = ()
+                yield (from_pos, to_pos, arrow_pos), (moved, arrows | {arrow_pos}, left)
+
+def _longest(cells: FrozenSet[Square], state: tuple, timed: bool, memo: Dict) -> Tuple[int, Optional[Action]]:
+    if state in memo:
+        return memo[state]
+    # No sequence is longer than the number of squares left for arrows
+    bound = len(cells) - len(state[0]) - len(state[1])
+    best, best_move = 0, None
+    for move, child in _successors(cells, state, timed):
+        value = 1 + _longest(cells, child, timed, memo)[0]
+        if value > best:
+            best, best_move = value, move
+            if best == bound:
+                break
+    memo[state] = (best, best_move)
+    return best, best_move
+
+def _greedy(cells: FrozenSet[Square], state: tuple) -> Tuple[int, Optional[Action]]:
+    # One playable filling sequence: move to the square with the most free neighbours,
+    # shoot into the square with the fewest (dead ends first)
+    def free_neighbours(sq, blocked):
+        return sum((sq[0] + dx, sq[1] + dy) in cells and (sq[0] + dx, sq[1] + dy) not in blocked
+                   for dx, dy in Board.DIRECTIONS)
+    length, first = 0, None
+    while True:
+        amazons, arrows, temps = state
+        blocked = set(amazons) | arrows | {sq for sq, _ in temps}
+        choice = None
+        for from_pos in amazons:
+            for to_pos in _slide(cells, from_pos, blocked):
+                score = free_neighbours(to_pos, blocked)
+                if choice is None or score > choice[0]:
+                    choice = (score, from_pos, to_pos)
+        if choice is None:
+            return length, first
+        _, from_pos, to_pos = choice
+        shot = blocked | {to_pos}
+        arrow_pos = min(_slide(cells, to_pos, shot), key=lambda sq: free_neighbours(sq, shot | {sq}), default=None)
+        if arrow_pos is None:
+            # Cornered after the move: try the successors in order instead
+            move, state = next(_successors(cells, state, True), (None, None))
+            if move is None:
+                return length, first
+        else:
+            move = (from_pos, to_pos, arrow_pos)
+            state = next(child for action, child in _successors(cells, state, True) if action == move)
+        length += 1
+        first = first or move
+
+def solve_region(board: Board, squares: List[Square], owner: int, to_move: int,
+                 alone: bool = False) -> Tuple[int, int, Optional[Action]]:
+    # (lower, upper, first move of the lower-bound sequence) for the moves `owner` can
+    # still make in this region, `to_move` being the side whose turn it is. When the
+    # owner has no other region (`alone`), all its moves are made here in a row, which
+    # is what the timed solve assumes, so a small region's count is exact. Otherwise
+    # moves elsewhere give temp blocks time to expire and only the upper bound holds.
+    ox = min(x for x, _ in squares)
+    oy = min(y for _, y in squares)
+    cells = frozenset((x - ox, y - oy) for x, y in squares)
+    amazons = tuple(sorted((x - ox, y - oy) for x, y in (board.agent_1_pos if owner == 1 else board.agent_2_pos)
+                           if (x - ox, y - oy) in cells))
+    # Temp-block countdowns drop once per ply; convert them to turns of the owner
+    delay = 0 if owner == to_move else 1
+    temps = tuple(sorted(((x - ox, y - oy), (count - delay + 1) // 2) for (x, y), count in board.temp_blocks.items()
+                         if (x - ox, y - oy) in cells and count - delay > 0))
+    key = (cells, amazons, temps)
+    free = len(cells) - len(amazons)
+    entry = _CACHE.get(key)
+    if entry is None:
+        if len(_CACHE) >= CACHE_SIZE:
+            _CACHE.clear()
+        state = (amazons, frozenset(), temps)
+        low, move = _longest(cells, state, True, {}) if free <= EXACT_SQUARES else _greedy(cells, state)
+        entry = _CACHE[key] = [low, low if low == free else None, move]
+    exact = alone and free <= EXACT_SQUARES
+    if not exact and entry[1] is None:
+        entry[1] = _longest(cells, (amazons, frozenset(), ()), False, {})[0] if free <= EXACT_SQUARES else free
+    low, high, move = entry
+    if exact:
+        high = low
+    if move is not None:
+        move = tuple((x + ox, y + oy) for x, y in move)
+    return low, high, move
+
+def solve_endgame(board: Board, agent_id: int) -> Optional[Dict]:
+    # None until the regions have separated. Otherwise, with agent_id to move:
+    # bounds {side: (lower, upper)} on the moves each side has left, the winner once
+    # the bounds decide it (the mover wins iff it has more moves than the opponent),
+    # a move for agent_id and whether agent_id's count is exact.
+    regions = partition(board)
+    if regions is None:
+        return None
+    owned = {1: 0, 2: 0}
+    for owner, _ in regions:
+        owned[owner] += 1
+    bounds = {1: [0, 0], 2: [0, 0]}
+    move = None
+    for owner, squares in regions:
+        low, high, first = solve_region(board, squares, owner, agent_id, alone=owned[owner] == 1)
+        bounds[owner][0] += low
+        bounds[owner][1] += high
+        if owner == agent_id and move is None and low > 0:
+            move = first
+    opponent = 3 - agent_id
+    winner = None
+    if bounds[agent_id][0] > bounds[opponent][1]:
+        winner = agent_id
+    elif bounds[agent_id][1] <= bounds[opponent][0]:
+        winner = opponent
+    return {"bounds": {side: tuple(b) for side, b in bounds.items()}, "winner": winner, "move": move,
+            "exact": bounds[agent_id][0] == bounds[agent_id][1]}
+
+class EndgameAgent:
+    # Plays the solver's move at once when the territories have separated and either
+    # the result is known or the agent's own regions are solved exactly; searches with
+    # `agent` otherwise
+    def __init__(self, agent):
+        self.agent = agent
+        self.agent_id = agent.agent_id
+        self.search_stats: Dict[str, float] = {}
+
+    def get_action(self, board: Board) -> Action:
+        start = time.perf_counter()
+        result = solve_endgame(board, self.agent_id)
+        if result and result["move"] and (result["exact"] or result["winner"]):
+            self.search_stats = {"endgame": 1, "time_total": time.perf_counter() - start}
+            return result["move"]
+        action = self.agent.get_action(board)
+        self.search_stats = {**getattr(self.agent, "search_stats", {}), "endgame": 0}
+        return action
+
+    def observe(self, action: tuple, agent_id: int):
+        observe = getattr(self.agent, "observe", None)
+        if observe:
+            observe(action, agent_id)
+
+    def close(self):
+        close = getattr(self.agent, "close", None)
+        if close:
+            close()
@@ -0,0 +1,159 @@
+import numpy as np
+from typing import Dict, List, Tuple
+from board import Board, tile_stat
+
+# Vectorized queen/king distance maps, Voronoi territory and mobility.
+# Boards are flattened with a one-square blocked frame around them, so a shift by
+# k squares in a direction is a shift of the flat array by a fixed offset and can
+# never wrap from one row into the next without crossing the frame. The 8
+# directions are kept on their own axis and shifted together.
+
+UNREACHABLE = 255
+
+class _Geometry:
+    def __init__(self, size: int):
+        self.size = size
+        width = size + 2
+        self.length = width * width
+        # Padded index of every board square, in x * size + y order
+        self.interior = np.array([(x + 1) * width + (y + 1) for x in range(size) for y in range(size)])
+        offsets = np.array([dx * width + dy for dx, dy in Board.DIRECTIONS])
+
+        # Doubling steps for Kogge-Stone style sliding fills: 1, 2, 4, ... up to the board width.
+        # Each step is the flat offset of k squares in every direction.
+        self.queen_shifts = []
+        k = 1
+        while k < size:
+            self.queen_shifts.append([int(offset) * k for offset in offsets])
+            k *= 2
+        self.king_shift = [int(offset) for offset in offsets]
+
+_GEOMETRY: Dict[int, _Geometry] = {}
+
+def geometry(size: int) -> _Geometry:
+    if size not in _GEOMETRY:
+        _GEOMETRY[size] = _Geometry(size)
+    return _GEOMETRY[size]
+
+def _shift(a: np.ndarray, shifts: List[int]) -> np.ndarray:
+    # a: (..., 8, L). Direction plane d is shifted by shifts[d] flat squares; squares
+    # shifted in from outside the array read as False, like the frame.
+    out = np.zeros(a.shape, dtype=bool)
+    for d, s in enumerate(shifts):
+        if s > 0:
+            out[..., d, s:] = a[..., d, :-s]
+        else:
+            out[..., d, :s] = a[..., d, -s:]
+    return out
+
+def queen_reach(seeds: np.ndarray, empty: np.ndarray, geo: _Geometry) -> np.ndarray:
+    # Empty squares one queen move away from any seed. seeds: (..., L), empty broadcasts to it.
+    shape = seeds.shape[:-1] + (8, seeds.shape[-1])
+    gen = np.broadcast_to(seeds[..., None, :], shape)
+    pro = np.broadcast_to(empty[..., None, :], shape)
+    last = len(geo.queen_shifts) - 1
+    for i, table in enumerate(geo.queen_shifts):
+        gen = gen | (pro & _shift(gen, table))
+        if i < last:
+            pro = pro & _shift(pro, table)
+    return gen.any(axis=-2) & empty & ~seeds
+
+def king_reach(seeds: np.ndarray, empty: np.ndarray, geo: _Geometry) -> np.ndarray:
+    gen = np.broadcast_to(seeds[..., None, :], seeds.shape[:-1] + (8, seeds.shape[-1]))
+    return _shift(gen, geo.king_shift).any(axis=-2) & empty & ~seeds
+
+def distance_map(first: np.ndarray, empty: np.ndarray, geo: _Geometry, step) -> np.ndarray:
+    # BFS in whole layers: `first` holds the squares at distance 1, `step` expands a layer
+    dist = np.full(first.shape, UNREACHABLE, dtype=np.uint8)
+    visited = first.copy()
+    frontier = first
+    d = 1
+    while frontier.any():
+        dist[frontier] = d
+        frontier = step(frontier, empty, geo) & ~visited
+        visited |= frontier
+        d += 1
+    return dist
+
+def board_arrays(board: Board) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    # Empty mask (L,) and per-amazon seed masks (n_amazons, L), player 1's amazons first
+    geo = geometry(board.size)
+    empty = np.zeros(geo.length, dtype=bool)
+    empty[geo.interior] = np.array(board.grid).ravel() == tile_stat.EMPTY
+    amazons = board.agent_1_pos + board.agent_2_pos
+    seeds = np.zeros((len(amazons), geo.length), dtype=bool)
+    for i, (x, y) in enumerate(amazons):
+        seeds[i, geo.interior[x * board.size + y]] = True
+    return empty, seeds, [len(board.agent_1_pos), len(board.agent_2_pos)]
+
+def features_from_arrays(empty: np.ndarray, my_seeds: np.ndarray, opp_seeds: np.ndarray, geo: _Geometry) -> Dict[str, np.ndarray]:
+    # my_seeds / opp_seeds: (..., n_amazons, L). Returns differentials (mine - opponent's), shape (...)
+    seeds = np.stack([my_seeds, opp_seeds], axis=-3)           # (..., 2, A, L)
+    per_amazon = queen_reach(seeds, empty[..., None, None, :], geo)
+    mobility = per_amazon.sum(axis=-1).sum(axis=-1)             # (..., 2): summed per amazon, as before
+    # Queen distance 1 is the union of the per-amazon moves, then BFS both players together
+    empty_p = empty[..., None, :]
+    queen = distance_map(per_amazon.any(axis=-2), empty_p, geo, queen_reach)
+    king = distance_map(king_reach(seeds.any(axis=-2), empty_p, geo), empty_p, geo, king_reach)
+    # Voronoi ownership by queen distance, ties broken by king distance
+    mine_q, opp_q = queen[..., 0, :], queen[..., 1, :]
+    mine_k, opp_k = king[..., 0, :], king[..., 1, :]
+    tie = mine_q == opp_q
+    mine = (mine_q < opp_q) | (tie & (mine_k < opp_k))
+    theirs = (opp_q < mine_q) | (tie & (opp_k < mine_k))
+    return {
+        "mobility": mobility[..., 0] - mobility[..., 1],
+        "territory": mine.sum(axis=-1) - theirs.sum(axis=-1),
+    }
+
+def player_arrays(board: Board, agent_id: int, geo: _Geometry) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Empty mask plus agent_id's and the opponent's seed masks, the smaller side
+    # padded with empty rows so that both players stack together
+    empty, seeds, counts = board_arrays(board)
+    amazons = max(counts)
+    first = np.zeros((amazons, geo.length), dtype=bool)
+    second = np.zeros((amazons, geo.length), dtype=bool)
+    first[:counts[0]] = seeds[:counts[0]]
+    second[:counts[1]] = seeds[counts[0]:]
+    return (empty, first, second) if agent_id == 1 else (empty, second, first)
+
+def evaluate(board: Board, agent_id: int) -> Dict[str, float]:
+    # Mobility and territory differentials from agent_id's point of view, in one vectorized pass
+    geo = geometry(board.size)
+    empty, my_seeds, opp_seeds = player_arrays(board, agent_id, geo)
+    features = features_from_arrays(empty, my_seeds, opp_seeds, geo)
+    return {name: float(value) for name, value in features.items()}
+
+def evaluate_actions(board: Board, agent_id: int, actions: List[tuple], chunk: int = 256) -> Dict[str, np.ndarray]:
+    # Features of every successor position (board after agent_id plays each action),
+    # from agent_id's point of view. Successors are stacked as (n_children, L) empty
+    # masks (the padded form of (n_children, size, size)) and scored in chunks.
+    geo = geometry(board.size)
+    empty, my_seeds, opp_seeds = player_arrays(board, agent_id, geo)
+    my_pos = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+    amazon_index = {pos: i for i, pos in enumerate(my_pos)}
+    square = lambda pos: geo.interior[pos[0] * board.size + pos[1]]
+    mover = np.array([amazon_index[a[0]] for a in actions], dtype=np.intp)
+    from_sq = np.array([square(a[0]) for a in actions], dtype=np.intp)
+    to_sq = np.array([square(a[1]) for a in actions], dtype=np.intp)
+    arrow_sq = np.array([square(a[2]) for a in actions], dtype=np.intp)
+    # Temp blocks on their last turn are released by the mover's own update
+    expiring = [square(pos) for pos in board.expiring_in(1)]
+
+    results = {"mobility": [], "territory": []}
+    for start in range(0, len(actions), chunk):
+        span = slice(start, start + chunk)
+        rows = np.arange(len(mover[span]))
+        child_empty = np.repeat(empty[None, :], len(rows), axis=0)
+        child_empty[:, expiring] = True
+        # from_pos stays blocked: the amazon leaves a temp block behind
+        child_empty[rows, to_sq[span]] = False
+        child_empty[rows, arrow_sq[span]] = False
+        child_mine = np.repeat(my_seeds[None], len(rows), axis=0)
+        child_mine[rows, mover[span], from_sq[span]] = False
+        child_mine[rows, mover[span], to_sq[span]] = True
+        child_opp = np.broadcast_to(opp_seeds, child_mine.shape)
+        features = features_from_arrays(child_empty, child_mine, child_opp, geo)
+        for name in results:
+            results[name].append(features[name])
+    return {name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in results.items()}
@@ -1,13 +1,25 @@
 from board import Board
-from typing import Tuple
+from endgame import solve_endgame
+from typing import Dict, List, Optional, Tuple
 import random
+import time
 
 class Game:
-    def __init__(self, agent_1, agent_2, size: int = 10):
-        self.board = Board(size)
+    def __init__(self, agent_1, agent_2, size: int = 10, board_cls=Board, seed: Optional[int] = None):
+        # board_cls selects the backend, e.g. bitboard.BitBoard. A seed draws the start
+        # positions from a generator of its own, leaving `random` alone, and is kept for
+        # game records. Without one they come from `random`.
+        self.board = board_cls(size)
+        self.seed = seed
         self.agent_1 = agent_1
         self.agent_2 = agent_2
         self.current_turn = 1
+        self.plies = 0      # Completed turns
+        # One entry per ply: who moved, the wall time of get_action and the
+        # agent's search_stats for that move, when it has them
+        self.ply_stats: List[Dict] = []
+        self.resolved = False   # Ended early by the endgame solver
+        self.rng = random.Random(seed) if seed is not None else random
         self.init_positions()
     
     def init_positions(self):
@@ -34,7 +46,7 @@ class Game:
                         candidate.append((x, y, opponent_x, opponent_y))
             if not candidate:
                 raise ValueError("No more symmetric edge positions available.")
-            x, y, opponent_x, opponent_y = random.choice(candidate)
+            x, y, opponent_x, opponent_y = self.rng.choice(candidate)
             board.amazon_place([(x, y)], agent_id=1)
             board.amazon_place([(opponent_x, opponent_y)], agent_id=2)
             used.add((x, y))
@@ -42,22 +54,68 @@ class Game:
             placed_agent_1.append((x, y))
             placed_agent_2.append((opponent_x, opponent_y))
 
-    def run(self, verbose: bool = True, return_winner: bool = False) -> int:
+    def apply_move(self, action: tuple):
+        # Checked move + arrow for the player to move; raises ValueError if illegal.
+        # The caller advances current_turn and plies.
+        from_pos, to_pos, arrow_pos = action
+        self.board.move(from_pos, to_pos, self.current_turn)
+        # The arrow is shot by the amazon from its new square
+        self.board.arrow_place(to_pos, arrow_pos, self.current_turn)
+        self.board.update_temp_blocks()
+
+    def close(self):
+        # Releases what the agents hold outside the process (worker pools, ponder
+        # processes); called by whoever built them once the game is over
+        for agent in (self.agent_1, self.agent_2):
+            close = getattr(agent, "close", None)
+            if close:
+                close()
+
+    def run(self, verbose: bool = True, return_winner: bool = False, resolve_endgame: bool = False,
+            recorder=None) -> int:
+        # With resolve_endgame, the game stops as soon as the territories have separated
+        # and the endgame solver can tell the winner. A recorder (records.RecordWriter)
+        # gets the start position, every move as it is played and the result.
+        if recorder:
+            recorder.begin(self.board, self.seed)
         while True:
             if verbose:
                 print(f"Turn: Player {self.current_turn}")
                 self.board.display()
 
+            if resolve_endgame:
+                endgame = solve_endgame(self.board, self.current_turn)
+                if endgame and endgame["winner"]:
+                    self.resolved = True
+                    if recorder:
+                        recorder.end(endgame["winner"], resolved=True)
+                    if verbose:
+                        print(f"Territories separated with moves left {endgame['bounds']}. Player {endgame['winner']} wins!")
+                    return endgame["winner"] if return_winner else None
+
             agent = self.agent_1 if self.current_turn == 1 else self.agent_2
             try:
+                start = time.perf_counter()
                 from_pos, to_pos, arrow_pos = agent.get_action(self.board)
-                self.board.move(from_pos, to_pos, self.current_turn)
-                self.board.arrow_place(from_pos, arrow_pos, self.current_turn)
-                self.board.update_temp_blocks()
+                self.ply_stats.append({"ply": self.plies, "agent_id": self.current_turn,
+                                       "agent": type(agent).__name__, "time_move": time.perf_counter() - start,
+                                       **getattr(agent, "search_stats", {})})
+                self.apply_move((from_pos, to_pos, arrow_pos))
+                if recorder:
+                    recorder.move((from_pos, to_pos, arrow_pos))
             except ValueError:
                 winner = 3 - self.current_turn
+                if recorder:
+                    recorder.end(winner)
                 if verbose:
                     print(f"Player {self.current_turn} has no legal moves. Player {winner} wins!")
                 return winner if return_winner else None
 
+            # Let both agents know the move that was actually played (e.g. for pondering)
+            for observer in (self.agent_1, self.agent_2):
+                observe = getattr(observer, "observe", None)
+                if observe:
+                    observe((from_pos, to_pos, arrow_pos), self.current_turn)
+
+            self.plies += 1
             self.current_turn = 3 - self.current_turn
\ No newline at end of file
@@ -1,123 +1,243 @@
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Optional
+import numpy as np
 from board import Board
-from rules import get_valid_moves, get_valid_arrows
+from evaluation import evaluate, evaluate_actions
+from rules import iter_actions, get_valid_moves, get_valid_arrows
+from transposition import TranspositionTable, Action, EXACT, LOWER, position_key, bound_flag, is_legal
+from telemetry import SearchStats, phase_timer
 import time
 
 class HeuristicAgent:
     def __init__(self, agent_id: int, max_depth: int = 3, time_limit: float = 2.0,
-                 weight_mobility: float = 0.4, weight_territory: float = 0.4):
+                 weight_mobility: float = 0.4, weight_territory: float = 0.4, weight_centrality: float = 0.2,
+                 tt_size: int = 1 << 18):
         self.agent_id = agent_id
         self.max_depth = max_depth
         self.time_limit = time_limit
         self.weight_mobility = weight_mobility
         self.weight_territory = weight_territory
+        self.weight_centrality = weight_centrality
         self.start_time = None
+        # Kept across moves: positions from the previous search are often revisited
+        self.tt = TranspositionTable(tt_size)
+        # Move ordering: two killer moves per ply, history scores per (agent, from, to)
+        # and per (agent, arrow square), raised by depth^2 on every beta cutoff
+        self.killers: Dict[int, List[Action]] = {}
+        self.history_move: Dict[tuple, int] = {}
+        self.history_arrow: Dict[tuple, int] = {}
+        # Search counters of the last get_action; first_move_cutoffs / cutoffs
+        # is the share of cutoffs found on the first move tried
+        self.stats = {"nodes": 0, "cutoffs": 0, "first_move_cutoffs": 0, "completed": False}
+        # Per-move telemetry: the counters above plus evaluation calls and phase times
+        self.telemetry = SearchStats()
+        self.search_stats: Dict[str, float] = {}
 
     def get_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+        self.telemetry = SearchStats()
+        try:
+            return self.search(board)
+        finally:
+            self.search_stats = {**self.telemetry.as_dict(), "nodes": self.stats["nodes"],
+                                 "cutoffs": self.stats["cutoffs"], "depth": self.max_depth,
+                                 "completed": int(self.stats["completed"])}
+
+    def search(self, board: Board) -> Action:
         self.start_time = time.time()
-        pos_list = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
+        self.stats = {"nodes": 0, "cutoffs": 0, "first_move_cutoffs": 0, "completed": False}
+        self.killers = {}
+        # Old history still hints at good squares but should not dominate the new search
+        for table in (self.history_move, self.history_arrow):
+            for k in list(table):
+                table[k] //= 2
+                if not table[k]:
+                    del table[k]
+        # The whole search runs in place on one private board (apply_action / undo)
+        with phase_timer(self.telemetry, "copy"):
+            board = board.clone()
+        with phase_timer(self.telemetry, "movegen"):
+            actions = list(iter_actions(board, self.agent_id))
+        if not actions:
+            raise ValueError("No valid moves or arrows available.")
+
+        # All root successors are scored in one batched call. That is the whole
+        # decision at depth 1 and the root move ordering otherwise.
+        scores = self.batch_eval(board, actions)
+        order = np.argsort(-scores, kind="stable")
+        if self.max_depth <= 1:
+            self.stats["completed"] = True
+            return actions[order[0]]
+        actions = [actions[i] for i in order]
+
+        key = position_key(board, self.agent_id)
+        entry = self.tt.probe(key)
+        if entry and entry[4] in actions:
+            actions.remove(entry[4])
+            actions.insert(0, entry[4])
         best_score = float('-inf')
         best_action = None
+        timed_out = False
 
-        for from_pos in pos_list:
-            for to_pos in get_valid_moves(board, from_pos):
-                for arrow_pos in get_valid_arrows(board, to_pos):
-                    board_copy = board.clone()
-                    try:
-                        board_copy.move(from_pos, to_pos, self.agent_id)
-                        board_copy.arrow_place(to_pos, arrow_pos, self.agent_id)
-                        board_copy.update_temp_blocks()
-                    except:
-                        continue
-
-                    score = self.alpha_beta(board_copy, depth=self.max_depth - 1, alpha=float('-inf'), beta=float('inf'), maximizing=False)
-                    if score > best_score:
-                        best_score = score
-                        best_action = (from_pos, to_pos, arrow_pos)
-
-                    if time.time() - self.start_time > self.time_limit:
-                        break
-
-        if best_action:
-            return best_action
-        else:
-            raise ValueError("No valid moves or arrows available.")
+        for action in actions:
+            board.apply_action(*action, self.agent_id)
+            score = self.alpha_beta(board, depth=self.max_depth - 1, alpha=best_score, beta=float('inf'), maximizing=False)
+            board.undo()
+            if score > best_score or best_action is None:
+                best_score = score
+                best_action = action
+
+            if time.time() - self.start_time > self.time_limit:
+                timed_out = True
+                break
+
+        if not timed_out:
+            self.tt.store(key, self.max_depth, best_score, EXACT, best_action)
+        self.stats["completed"] = not timed_out
+        return best_action
 
     def alpha_beta(self, board: Board, depth: int, alpha: float, beta: float, maximizing: bool) -> float:
+        self.stats["nodes"] += 1
         if depth == 0 or time.time() - self.start_time > self.time_limit:
             return self.board_eval(board)
 
         current_agent_id = self.agent_id if maximizing else 3 - self.agent_id
-        pos_list = board.agent_1_pos if current_agent_id == 1 else board.agent_2_pos
+        ply = self.max_depth - depth
+        key = position_key(board, current_agent_id)
+        hash_move = None
+        # The bound flag is judged against the window the caller gave, not the one the
+        # table narrows below
+        alpha_orig, beta_orig = alpha, beta
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, entry_depth, entry_score, entry_flag, hash_move = entry
+            if entry_depth >= depth:
+                if entry_flag == EXACT:
+                    return entry_score
+                if entry_flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if beta <= alpha:
+                    return entry_score
+
+        if depth == 1:
+            # Frontier node: score the whole move list in one batched call
+            with phase_timer(self.telemetry, "movegen"):
+                actions = list(iter_actions(board, current_agent_id))
+            if not actions:
+                return float('-inf') if maximizing else float('inf')
+            # As between the children of inner nodes: past the deadline, no batch and no store
+            if time.time() - self.start_time > self.time_limit:
+                return self.board_eval(board)
+            scores = self.batch_eval(board, actions, current_agent_id)
+            self.stats["nodes"] += len(actions)
+            index = int(np.argmax(scores)) if maximizing else int(np.argmin(scores))
+            self.tt.store(key, depth, float(scores[index]), EXACT, actions[index])
+            return float(scores[index])
+        best_move = None
+        timed_out = False
+        actions = self.telemetry.timed("movegen", self.ordered_actions(board, current_agent_id, hash_move, ply))
 
         if maximizing:
-            max_eval = float('-inf')
-            for from_pos in pos_list:
-                for to_pos in get_valid_moves(board, from_pos):
-                    for arrow_pos in get_valid_arrows(board, to_pos):
-                        board_copy = board.clone()
-                        try:
-                            board_copy.move(from_pos, to_pos, current_agent_id)
-                            board_copy.arrow_place(to_pos, arrow_pos, current_agent_id)
-                            board_copy.update_temp_blocks()
-                        except:
-                            continue
-                        eval = self.alpha_beta(board_copy, depth - 1, alpha, beta, False)
-                        max_eval = max(max_eval, eval)
-                        alpha = max(alpha, eval)
-                        if beta <= alpha:
-                            return max_eval
-                        if time.time() - self.start_time > self.time_limit:
-                            return max_eval
-            return max_eval
+            best = float('-inf')
+            for index, action in enumerate(actions):
+                board.apply_action(*action, current_agent_id)
+                eval = self.alpha_beta(board, depth - 1, alpha, beta, False)
+                board.undo()
+                if eval > best or best_move is None:
+                    best = max(best, eval)
+                    best_move = action
+                alpha = max(alpha, eval)
+                # A partial result from a timed-out subtree must not reach the table
+                if time.time() - self.start_time > self.time_limit:
+                    timed_out = True
+                    break
+                if beta <= alpha:
+                    self.record_cutoff(action, current_agent_id, depth, ply, index)
+                    break
         else:
-            min_eval = float('inf')
-            for from_pos in pos_list:
-                for to_pos in get_valid_moves(board, from_pos):
-                    for arrow_pos in get_valid_arrows(board, to_pos):
-                        board_copy = board.clone()
-                        try:
-                            board_copy.move(from_pos, to_pos, current_agent_id)
-                            board_copy.arrow_place(to_pos, arrow_pos, current_agent_id)
-                            board_copy.update_temp_blocks()
-                        except:
-                            continue
-                        eval = self.alpha_beta(board_copy, depth - 1, alpha, beta, True)
-                        min_eval = min(min_eval, eval)
-                        beta = min(beta, eval)
-                        if beta <= alpha:
-                            return min_eval
-                        if time.time() - self.start_time > self.time_limit:
-                            return min_eval
-            return min_eval
+            best = float('inf')
+            for index, action in enumerate(actions):
+                board.apply_action(*action, current_agent_id)
+                eval = self.alpha_beta(board, depth - 1, alpha, beta, True)
+                board.undo()
+                if eval < best or best_move is None:
+                    best = min(best, eval)
+                    best_move = action
+                beta = min(beta, eval)
+                if time.time() - self.start_time > self.time_limit:
+                    timed_out = True
+                    break
+                if beta <= alpha:
+                    self.record_cutoff(action, current_agent_id, depth, ply, index)
+                    break
 
-    def board_eval(self, board: Board) -> float:
-        my_pos = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
-        opp_pos = board.agent_2_pos if self.agent_id == 1 else board.agent_1_pos
+        if not timed_out:
+            self.tt.store(key, depth, best, bound_flag(best, alpha_orig, beta_orig), best_move)
+        return best
+
+    def ordered_actions(self, board: Board, agent_id: int, hash_move: Optional[Action], ply: int):
+        # Staged: hash move, killers of this ply, then (from, to) by history and, for each,
+        # arrows by history and by closeness to the opponent's amazons (they take away
+        # the opponent's room). Lazily generated, so cutoffs skip most of the work.
+        tried = []
+        for action in [hash_move] + self.killers.get(ply, []):
+            if action is not None and action not in tried and is_legal(board, action, agent_id):
+                tried.append(action)
+                yield action
+
+        pos_list = list(board.agent_1_pos if agent_id == 1 else board.agent_2_pos)
+        opp_pos = board.agent_2_pos if agent_id == 1 else board.agent_1_pos
+        history_move, history_arrow = self.history_move, self.history_arrow
+        moves = [(from_pos, to_pos) for from_pos in pos_list for to_pos in get_valid_moves(board, from_pos)]
+        moves.sort(key=lambda m: -history_move.get((agent_id, m[0], m[1]), 0))
+        for from_pos, to_pos in moves:
+            arrows = get_valid_arrows(board, to_pos)
+            arrows.sort(key=lambda a: (-history_arrow.get((agent_id, a), 0),
+                                       min(max(abs(a[0] - ox), abs(a[1] - oy)) for ox, oy in opp_pos)))
+            for arrow_pos in arrows:
+                action = (from_pos, to_pos, arrow_pos)
+                if action not in tried:
+                    yield action
 
-        my_mob = sum(len(get_valid_moves(board, pos)) for pos in my_pos)
-        opp_mob = sum(len(get_valid_moves(board, pos)) for pos in opp_pos)
+    def record_cutoff(self, action: Action, agent_id: int, depth: int, ply: int, index: int):
+        self.stats["cutoffs"] += 1
+        if index == 0:
+            self.stats["first_move_cutoffs"] += 1
+        killers = self.killers.setdefault(ply, [])
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[2:]
+        from_pos, to_pos, arrow_pos = action
+        bonus = depth * depth
+        self.history_move[(agent_id, from_pos, to_pos)] = self.history_move.get((agent_id, from_pos, to_pos), 0) + bonus
+        self.history_arrow[(agent_id, arrow_pos)] = self.history_arrow.get((agent_id, arrow_pos), 0) + bonus
 
-        my_terr = self.territory_est(board, my_pos)
-        opp_terr = self.territory_est(board, opp_pos)
+    def batch_eval(self, board: Board, actions: List[Action], mover: Optional[int] = None) -> np.ndarray:
+        # board_eval of every successor of `board` after `mover` (default: us) plays each action
+        mover = mover or self.agent_id
+        self.telemetry.count("evals", len(actions))
+        with phase_timer(self.telemetry, "eval"):
+            features = evaluate_actions(board, mover, actions)
+        sign = 1 if mover == self.agent_id else -1
+        my_pos = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
+        center = board.size // 2
+        base = -sum(abs(x - center) + abs(y - center) for x, y in my_pos)
+        if mover == self.agent_id:
+            # Only the moved amazon changes its distance to the center
+            my_centrality = np.array([base + abs(fx - center) + abs(fy - center) - abs(tx - center) - abs(ty - center)
+                                      for (fx, fy), (tx, ty), _ in actions])
+        else:
+            my_centrality = base
+        return sign * (self.weight_mobility * features["mobility"] + self.weight_territory * features["territory"]) + self.weight_centrality * my_centrality
+
+    def board_eval(self, board: Board) -> float:
+        my_pos = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
+        # Mobility and Voronoi territory for both players in one vectorized pass
+        self.telemetry.count("evals")
+        with phase_timer(self.telemetry, "eval"):
+            features = evaluate(board, self.agent_id)
 
         center = board.size // 2
         my_centrality = -sum(abs(x - center) + abs(y - center) for x, y in my_pos)
 
-        return self.weight_mobility * (my_mob - opp_mob) + self.weight_territory * (my_terr - opp_terr) + 0.2 * my_centrality
-
-    def territory_est(self, board: Board, pos: List[Tuple[int, int]]) -> int:
-        visited = set()
-        frontier = list(pos)
-        count = 0
-        while frontier:
-            x, y = frontier.pop()
-            if (x, y) in visited:
-                continue
-            visited.add((x, y))
-            count += 1
-            for dx, dy in board.DIRECTIONS:
-                nx, ny = x + dx, y + dy
-                if board.bound_check(nx, ny) and not board.block_stat_check(nx, ny) and (nx, ny) not in visited:
-                    frontier.append((nx, ny))
-        return count
+        return self.weight_mobility * features["mobility"] + self.weight_territory * features["territory"] + self.weight_centrality * my_centrality
@@ -1,97 +1,196 @@
 import time
-import copy
 from board import Board
-from rules import get_valid_moves, get_valid_arrows
-from typing import Tuple, List
+from transposition import TranspositionTable, EXACT, LOWER, position_key, bound_flag, hash_move_first
+from typing import Tuple, List, Optional, Dict
+from telemetry import SearchStats, phase_timer
 
 class IterativeAgent:
-    def __init__(self, agent_id: int, time_limit: float = 2.0, max_depth: int = 5):
+    def __init__(self, agent_id: int, time_limit: float = 2.0, max_depth: int = 5, tt_size: int = 1 << 18):
         self.agent_id = agent_id
         self.time_limit = time_limit
         self.max_depth = max_depth
+        # Shared by all iterations and kept across moves
+        self.tt = TranspositionTable(tt_size)
+        self.completed_depth = 0    # Deepest iteration finished by the last get_action
+        # Per-move telemetry: nodes, cutoffs, evaluations and phase times
+        self.telemetry = SearchStats()
+        self.search_stats: Dict[str, float] = {}
+        # Pondering: after our move, search the position after the opponent's predicted
+        # reply (the table's best move for them) so that its entries are ready if it is played
+        self._ponder_board: Optional[Board] = None
+        self._ponder_depth = 1
+        self._predicted: Optional[tuple] = None
+        self.ponder_stats = {"predictions": 0, "hits": 0, "depth": 0}
 
     def get_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+        self.telemetry = SearchStats()
+        try:
+            return self.search(board)
+        finally:
+            self.search_stats = {**self.telemetry.as_dict(), "depth": self.completed_depth}
+
+    def search(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
         self.start_time = time.time()
+        self.completed_depth = 0
         best_action = None
+        # Searched in place with apply_action / undo instead of a deepcopy per node
+        with phase_timer(self.telemetry, "copy"):
+            board = board.clone()
 
         for depth in range(1, self.max_depth + 1):
             try:
                 action = self.search_at_depth(board, depth)
                 if time.time() - self.start_time < self.time_limit:
                     best_action = action
+                    self.completed_depth = depth
                 else:
                     break
             except TimeoutError:
                 break
 
         if best_action:
+            # A timed-out iteration can leave its moves on the board
+            while board.history:
+                board.undo()
+            board.apply_action(*best_action, self.agent_id)
+            board.history.clear()
+            self._ponder_board = board
+            self._ponder_depth = 1
+            self._predicted = None
             return best_action
         raise ValueError("No valid moves found within time limit")
 
+    def observe(self, action: tuple, agent_id: int):
+        # Game.run hook: counts whether the opponent played the predicted reply
+        if agent_id == self.agent_id or self._ponder_board is None:
+            return
+        if self._predicted is not None:
+            self.ponder_stats["predictions"] += 1
+            self.ponder_stats["hits"] += action == self._predicted
+        self._ponder_board = None
+
+    def ponder_step(self, seconds: float) -> bool:
+        # One slice of pondering: iterative deepening, from our side, on the position after
+        # the predicted reply. Only complete subtrees reach the table, so an interrupted
+        # depth is simply searched again in the next slice.
+        board = self._ponder_board
+        if board is None or self._ponder_depth > self.max_depth:
+            return False
+        opponent = 3 - self.agent_id
+        undo_to = len(board.history)
+        self.start_time, saved = time.time(), self.time_limit
+        self.time_limit = seconds
+        try:
+            if self._predicted is None:
+                # Predict the reply with a shallow search from the opponent's side
+                self.minimax(board, 2, False)
+                entry = self.tt.probe(position_key(board, opponent))
+                if entry is None or entry[4] is None:
+                    self._ponder_board = None
+                    return False
+                self._predicted = entry[4]
+            board.apply_action(*self._predicted, opponent)
+            self.search_at_depth(board, self._ponder_depth)
+            self.ponder_stats["depth"] = self._ponder_depth
+            self._ponder_depth += 1
+        except TimeoutError:
+            pass
+        finally:
+            self.time_limit = saved
+            # A timeout can leave moves of the interrupted search on the board
+            while len(board.history) > undo_to:
+                board.undo()
+        return True
+
     def search_at_depth(self, board: Board, depth: int):
-        pos_list = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
+        # The previous (shallower) iteration left its best root move in the table; try it first
+        key = position_key(board, self.agent_id)
+        entry = self.tt.probe(key)
         best_score = float('-inf')
         best_action = None
 
-        for from_pos in pos_list:
-            for to_pos in get_valid_moves(board, from_pos):
-                for arrow_pos in get_valid_arrows(board, to_pos):
-                    if time.time() - self.start_time > self.time_limit:
-                        raise TimeoutError
+        for action in self.telemetry.timed("movegen", hash_move_first(board, self.agent_id, entry[4] if entry else None)):
+            if time.time() - self.start_time > self.time_limit:
+                raise TimeoutError
 
-                    board_copy = copy.deepcopy(board)
-                    board_copy.move(from_pos, to_pos, self.agent_id)
-                    board_copy.arrow_place(from_pos, arrow_pos, self.agent_id)
-                    board_copy.update_temp_blocks()
-
-                    score = self.minimax(board_copy, depth - 1, False)
-                    if score > best_score:
-                        best_score = score
-                        best_action = (from_pos, to_pos, arrow_pos)
+            board.apply_action(*action, self.agent_id)
+            score = self.minimax(board, depth - 1, False, best_score, float('inf'))
+            board.undo()
+            if score > best_score or best_action is None:
+                best_score = score
+                best_action = action
 
+        if best_action:
+            self.tt.store(key, depth, best_score, EXACT, best_action)
         return best_action
 
-    def minimax(self, board: Board, depth: int, maximizing: bool) -> float:
-        if depth == 0 or time.time() - self.start_time > self.time_limit:
+    def minimax(self, board: Board, depth: int, maximizing: bool,
+                alpha: float = float('-inf'), beta: float = float('inf')) -> float:
+        self.telemetry.count("nodes")
+        if depth == 0:
             return self.board_eval(board)
+        # A static score in place of a deeper result would reach the table as a full-depth entry
+        if time.time() - self.start_time > self.time_limit:
+            raise TimeoutError
 
         current_agent_id = self.agent_id if maximizing else 3 - self.agent_id
-        pos_list = board.agent_1_pos if current_agent_id == 1 else board.agent_2_pos
+        key = position_key(board, current_agent_id)
+        hash_move = None
+        alpha_orig, beta_orig = alpha, beta     # Before any narrowing by the table
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, entry_depth, entry_score, entry_flag, hash_move = entry
+            if entry_depth >= depth:
+                if entry_flag == EXACT:
+                    return entry_score
+                if entry_flag == LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if beta <= alpha:
+                    return entry_score
+        best_move = None
 
+        # A timeout raises out of the whole iteration, so only complete subtrees are stored
         if maximizing:
             best = float('-inf')
-            for from_pos in pos_list:
-                for to_pos in get_valid_moves(board, from_pos):
-                    for arrow_pos in get_valid_arrows(board, to_pos):
-                        if time.time() - self.start_time > self.time_limit:
-                            raise TimeoutError
-                        board_copy = copy.deepcopy(board)
-                        board_copy.move(from_pos, to_pos, current_agent_id)
-                        board_copy.arrow_place(from_pos, arrow_pos, current_agent_id)
-                        board_copy.update_temp_blocks()
-                        score = self.minimax(board_copy, depth - 1, False)
-                        best = max(best, score)
-            return best
+            for action in self.telemetry.timed("movegen", hash_move_first(board, current_agent_id, hash_move)):
+                if time.time() - self.start_time > self.time_limit:
+                    raise TimeoutError
+                board.apply_action(*action, current_agent_id)
+                score = self.minimax(board, depth - 1, False, alpha, beta)
+                board.undo()
+                if score > best or best_move is None:
+                    best = max(best, score)
+                    best_move = action
+                alpha = max(alpha, score)
+                if beta <= alpha:
+                    self.telemetry.count("cutoffs")
+                    break
         else:
             best = float('inf')
-            for from_pos in pos_list:
-                for to_pos in get_valid_moves(board, from_pos):
-                    for arrow_pos in get_valid_arrows(board, to_pos):
-                        if time.time() - self.start_time > self.time_limit:
-                            raise TimeoutError
-                        board_copy = copy.deepcopy(board)
-                        board_copy.move(from_pos, to_pos, current_agent_id)
-                        board_copy.arrow_place(from_pos, arrow_pos, current_agent_id)
-                        board_copy.update_temp_blocks()
-                        score = self.minimax(board_copy, depth - 1, True)
-                        best = min(best, score)
-            return best
+            for action in self.telemetry.timed("movegen", hash_move_first(board, current_agent_id, hash_move)):
+                if time.time() - self.start_time > self.time_limit:
+                    raise TimeoutError
+                board.apply_action(*action, current_agent_id)
+                score = self.minimax(board, depth - 1, True, alpha, beta)
+                board.undo()
+                if score < best or best_move is None:
+                    best = min(best, score)
+                    best_move = action
+                beta = min(beta, score)
+                if beta <= alpha:
+                    self.telemetry.count("cutoffs")
+                    break
 
-    def board_eval(self, board: Board) -> float:
-        my_pos = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
-        opp_pos = board.agent_2_pos if self.agent_id == 1 else board.agent_1_pos
+        self.tt.store(key, depth, best, bound_flag(best, alpha_orig, beta_orig), best_move)
+        return best
 
-        my_mob = sum(len(get_valid_moves(board, pos)) for pos in my_pos)
-        opp_mob = sum(len(get_valid_moves(board, pos)) for pos in opp_pos)
+    def board_eval(self, board: Board) -> float:
+        self.telemetry.count("evals")
+        with phase_timer(self.telemetry, "eval"):
+            return self.mobility_difference(board)
 
-        return my_mob - opp_mob
+    def mobility_difference(self, board: Board) -> float:
+        # Read from the board's incrementally maintained per-amazon mobility
+        return board.total_mobility(self.agent_id) - board.total_mobility(3 - self.agent_id)
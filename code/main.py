@@ -21,8 +21,11 @@ def battle(agent1_type: str, agent2_type: str, games: int = 10, size: int = 10,
         agent_first = retrieve_agent(first_agent_type, 1, **agent_kwargs)
         agent_second = retrieve_agent(second_agent_type, 2, **agent_kwargs)
 
-        game = Game(agent_first, agent_second)
-        winner = game.run(verbose=False, return_winner=True)
+        game = Game(agent_first, agent_second, size)
+        try:
+            winner = game.run(verbose=False, return_winner=True)
+        finally:
+            game.close()
 
         if (winner == 1 and is_agent1_first) or (winner == 2 and not is_agent1_first):
             agent_1_wins += 1
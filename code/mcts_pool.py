@@ -0,0 +1,258 @@
+import math
+import random
+import time
+from typing import List, Tuple
+import numpy as np
+from board import Board
+from bitboard import BitBoard
+from rules import get_valid_moves, get_valid_arrows, count_valid_moves
+from MCTS_agent import MCTSAgent
+from telemetry import phase_timer
+
+Action = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+
+class NodePool:
+    # The whole search tree in flat arrays, one slot per node. A node learns how many
+    # legal actions it has on its first visit, but a child gets a slot only when it is
+    # first tried; until then the children hang off a first_child / next_sibling list.
+    # Untried actions come in a random order set by an offset and a stride coprime to
+    # the action count n: the k-th is action number (offset + k * stride) % n of the
+    # position (nth_action). No action list or generator is kept per node, only the
+    # action count of each amazon. Once all of a node's children exist, their indices are
+    # copied into one contiguous block of `edges`, and selection works on that slice.
+    # Nodes hold no board; the search replays actions from the root.
+    FIELDS = ("parent", "first_child", "next_sibling", "child_count", "tried", "offset", "stride", "counts_start",
+              "amazons", "edge_start", "visits", "value", "action", "mover")
+
+    def __init__(self, size: int, capacity: int = 1 << 10):
+        self.size = size
+        self.squares = size * size
+        self.count = 0
+        self.parent = np.zeros(capacity, dtype=np.int32)
+        self.first_child = np.zeros(capacity, dtype=np.int32)   # Last child added, -1 if none
+        self.next_sibling = np.zeros(capacity, dtype=np.int32)  # Child added before this one, -1 if none
+        self.child_count = np.zeros(capacity, dtype=np.int32)   # Legal actions, -1 until expanded
+        self.tried = np.zeros(capacity, dtype=np.int32)         # Children added so far
+        self.offset = np.zeros(capacity, dtype=np.int32)        # Order of the untried actions
+        self.stride = np.zeros(capacity, dtype=np.int32)
+        self.counts_start = np.zeros(capacity, dtype=np.int32)  # Actions per amazon in amazon_counts
+        self.amazons = np.zeros(capacity, dtype=np.int8)
+        self.edge_start = np.zeros(capacity, dtype=np.int32)    # Children in edges, -1 until all are tried
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value = np.zeros(capacity, dtype=np.float32)
+        self.action = np.zeros(capacity, dtype=np.uint32)       # encode() of the action into the node
+        self.mover = np.zeros(capacity, dtype=np.int8)          # Player who played that action
+        self.edges = np.zeros(capacity, dtype=np.int32)
+        self.edge_count = 0
+        self.amazon_counts = np.zeros(capacity, dtype=np.int32)
+        self.amazon_count_used = 0
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.FIELDS) + self.edges.nbytes + self.amazon_counts.nbytes
+
+    def capacity(self) -> int:
+        return len(self.parent)
+
+    @staticmethod
+    def _grown(array: np.ndarray, needed: int) -> np.ndarray:
+        capacity = len(array)
+        while capacity < needed:
+            capacity *= 2
+        new = np.zeros(capacity, dtype=array.dtype)
+        new[:len(array)] = array
+        return new
+
+    def _new_node(self, parent: int, mover: int) -> int:
+        node = self.count
+        if node == self.capacity():
+            for name in self.FIELDS:
+                setattr(self, name, self._grown(getattr(self, name), node + 1))
+        self.count = node + 1
+        self.parent[node] = parent
+        self.first_child[node] = -1
+        self.next_sibling[node] = -1
+        self.child_count[node] = -1
+        self.tried[node] = 0
+        self.edge_start[node] = -1
+        self.visits[node] = 0
+        self.value[node] = 0
+        self.mover[node] = mover
+        return node
+
+    def reset(self, mover: int) -> int:
+        # Empties the pool (keeping its arrays) and adds the root
+        self.count = 0
+        self.edge_count = 0
+        self.amazon_count_used = 0
+        return self._new_node(-1, mover)
+
+    def encode(self, action: Action) -> int:
+        (fx, fy), (tx, ty), (ax, ay) = action
+        return ((fx * self.size + fy) * self.squares + tx * self.size + ty) * self.squares + ax * self.size + ay
+
+    def decode(self, node: int) -> Action:
+        code = int(self.action[node])
+        code, arrow = divmod(code, self.squares)
+        from_sq, to_sq = divmod(code, self.squares)
+        return (divmod(from_sq, self.size), divmod(to_sq, self.size), divmod(arrow, self.size))
+
+    def expand(self, node: int, counts: List[int], rng):
+        # Records the action count of each of the mover's amazons (action_counts) and
+        # draws the order node's children will be tried in
+        used = self.amazon_count_used
+        if used + len(counts) > len(self.amazon_counts):
+            self.amazon_counts = self._grown(self.amazon_counts, used + len(counts))
+        self.amazon_counts[used:used + len(counts)] = counts
+        self.counts_start[node] = used
+        self.amazons[node] = len(counts)
+        self.amazon_count_used = used + len(counts)
+        n_actions = sum(counts)
+        self.child_count[node] = n_actions
+        if n_actions > 1:
+            stride = rng.randrange(1, n_actions)
+            while math.gcd(stride, n_actions) != 1:
+                stride = rng.randrange(1, n_actions)
+            self.offset[node] = rng.randrange(n_actions)
+            self.stride[node] = stride
+        else:
+            self.offset[node] = 0
+            self.stride[node] = 1
+
+    def next_untried(self, node: int) -> Tuple[int, List[int]]:
+        # (index, actions per amazon) of the next action to try from node, for nth_action
+        index = (int(self.offset[node]) + int(self.tried[node]) * int(self.stride[node])) % int(self.child_count[node])
+        start = int(self.counts_start[node])
+        return index, self.amazon_counts[start:start + int(self.amazons[node])].tolist()
+
+    def add_child(self, node: int, action: Action) -> int:
+        child = self._new_node(node, 3 - int(self.mover[node]))
+        self.action[child] = self.encode(action)
+        self.next_sibling[child] = self.first_child[node]
+        self.first_child[node] = child
+        self.tried[node] += 1
+        if self.tried[node] == self.child_count[node]:
+            # All children exist: lay their indices out in one block for select
+            n = int(self.child_count[node])
+            if self.edge_count + n > len(self.edges):
+                self.edges = self._grown(self.edges, self.edge_count + n)
+            self.edges[self.edge_count:self.edge_count + n] = self.children(node)
+            self.edge_start[node] = self.edge_count
+            self.edge_count += n
+        return child
+
+    def children(self, node: int) -> np.ndarray:
+        start = int(self.edge_start[node])
+        if start >= 0:
+            return self.edges[start:start + int(self.child_count[node])]
+        children = []
+        child = int(self.first_child[node])
+        while child >= 0:
+            children.append(child)
+            child = int(self.next_sibling[child])
+        return np.array(children, dtype=np.int32)
+
+    def select(self, node: int, c_param: float) -> int:
+        # UCB over all of a fully tried node's children at once
+        children = self.children(node)
+        visits = self.visits[children]
+        ucb = self.value[children] / visits + c_param * np.sqrt(2 * math.log(self.visits[node]) / visits)
+        return int(children[int(np.argmax(ucb))])
+
+    def backpropagate(self, path: List[int], result: int):
+        # Each node is scored for the player who chose it
+        path = np.array(path, dtype=np.int32)
+        self.visits[path] += 1
+        if result == 0:
+            self.value[path] += 0.5
+        else:
+            self.value[path[self.mover[path] == result]] += 1
+
+    def best_child(self, node: int) -> int:
+        # Highest mean value among visited children, as MCTSNode.best_child(c_param=0)
+        children = self.children(node)
+        return int(children[int(np.argmax(self.value[children] / self.visits[children]))])
+
+
+def action_counts(board: Board, agent_id: int) -> List[int]:
+    # Number of (from, to, arrow) actions of each amazon, in nth_action's order, without
+    # building them: arrows are shot from to_pos on the current board, where the mover
+    # still blocks from_pos
+    return [sum(count_valid_moves(board, to_pos) for to_pos in get_valid_moves(board, from_pos))
+            for from_pos in sorted(board.agent_1_pos if agent_id == 1 else board.agent_2_pos)]
+
+def nth_action(board: Board, agent_id: int, index: int, counts: List[int]) -> Action:
+    # Action number `index` of the player to move, in a fixed order (amazons sorted,
+    # destinations and arrows as the move generator lists them). Amazons are skipped
+    # whole by their action counts, destinations by their arrow counts.
+    for from_pos, count in zip(sorted(board.agent_1_pos if agent_id == 1 else board.agent_2_pos), counts):
+        if index >= count:
+            index -= count
+            continue
+        for to_pos in get_valid_moves(board, from_pos):
+            arrows = count_valid_moves(board, to_pos)
+            if index < arrows:
+                return from_pos, to_pos, get_valid_arrows(board, to_pos)[index]
+            index -= arrows
+        break
+    raise IndexError("Action index out of range")
+
+
+class PooledMCTSAgent(MCTSAgent):
+    # Same UCT search as MCTSAgent, on a NodePool: no per-node Python objects,
+    # iterative backpropagation and vectorized selection. No tree reuse or root parallelism.
+    def __init__(self, agent_id: int, time_limit: float = 2.0, seed=None, capacity: int = 1 << 10):
+        super().__init__(agent_id, time_limit=time_limit, seed=seed, reuse_tree=False)
+        self.capacity = capacity
+        self.pool = None
+
+    def choose_action(self, board: Board) -> Action:
+        pool = self.search(board)
+        if pool.tried[0] > 0:
+            return pool.decode(pool.best_child(0))
+        return self.fallback_action(board)
+
+    def search(self, board: Board) -> NodePool:
+        if self.pool is None or self.pool.size != board.size:
+            self.pool = NodePool(board.size, self.capacity)
+        pool = self.pool
+        root = pool.reset(3 - self.agent_id)
+        # Action counts and nth_action's skipping are popcounts on a BitBoard
+        with phase_timer(self.telemetry, "copy"):
+            board = BitBoard.from_board(board)
+        start = time.time()
+        self.iterations = 0
+
+        while time.time() - start < self.time_limit:
+            self.iterations += 1
+            node = root
+            path = [root]
+            result = None
+            while True:
+                if pool.child_count[node] < 0:
+                    # First visit past the leaf stage: count the children, none allocated yet
+                    pool.expand(node, action_counts(board, 3 - int(pool.mover[node])), self.rng or random)
+                n = pool.child_count[node]
+                if n == 0:
+                    # The player to move has no legal move and loses
+                    result = int(pool.mover[node])
+                    break
+                if pool.tried[node] < n:
+                    agent_id = 3 - int(pool.mover[node])
+                    node = pool.add_child(node, nth_action(board, agent_id, *pool.next_untried(node)))
+                    path.append(node)
+                    board.apply_action(*pool.decode(node), agent_id)
+                    break
+                node = pool.select(node, 1.41)
+                path.append(node)
+                board.apply_action(*pool.decode(node), int(pool.mover[node]))
+            self.telemetry.maximum("depth", len(path) - 1)
+            if result is None:
+                result = self.simulate(board)
+            pool.backpropagate(path, result)
+            for _ in range(len(path) - 1):
+                board.undo()
+
+        self.node_count = pool.count
+        self.telemetry.maximum("nodes", pool.count)
+
+        return pool
@@ -0,0 +1,252 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from board import Board, tile_stat
+from game import Game
+from iterative_agent import IterativeAgent
+from rules import has_any_legal_move
+from transposition import is_legal
+
+Action = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+
+# Opening book: best replies found offline by deep searches on early positions.
+# Positions are keyed by a canonical hash that folds the 8 rotations and reflections
+# of the square board, so one entry answers all symmetric copies of a position.
+# The file is a header and a key-sorted array of (key, action) records, opened with
+# np.memmap: processes that load the same book share its pages through the OS cache.
+
+# Keys depend on the Zobrist tables: bump the version whenever they change
+# (AMZBOOK1 books used the temp-block keys from before the rotated countdown keys)
+MAGIC = b"AMZBOOK2"
+HEADER = np.dtype([("magic", "S8"), ("size", "<u4"), ("count", "<u4")])
+RECORD = np.dtype([("key", "<u8"), ("action", "<u4")])
+
+# The 8 symmetries of the square, as maps of (x, y) given m = size - 1
+_TRANSFORMS = [
+    lambda x, y, m: (x, y),
+    lambda x, y, m: (y, m - x),
+    lambda x, y, m: (m - x, m - y),
+    lambda x, y, m: (m - y, x),
+    lambda x, y, m: (y, x),
+    lambda x, y, m: (x, m - y),
+    lambda x, y, m: (m - x, y),
+    lambda x, y, m: (m - y, m - x),
+]
+
+_SYMMETRIES: Dict[int, Tuple[List[List[int]], List[int]]] = {}
+
+def symmetries(size: int) -> Tuple[List[List[int]], List[int]]:
+    # (perms, inverse): perms[t][sq] is the square sq is sent to by transform t,
+    # inverse[t] the index of the transform that undoes t
+    if size not in _SYMMETRIES:
+        m = size - 1
+        perms = []
+        for transform in _TRANSFORMS:
+            perm = []
+            for sq in range(size * size):
+                x, y = transform(*divmod(sq, size), m)
+                perm.append(x * size + y)
+            perms.append(perm)
+        inverse = [next(u for u, back in enumerate(perms) if all(back[p] == sq for sq, p in enumerate(perm)))
+                   for perm in perms]
+        _SYMMETRIES[size] = (perms, inverse)
+    return _SYMMETRIES[size]
+
+def transform_action(action: Action, t: int, size: int) -> Action:
+    m = size - 1
+    return tuple(_TRANSFORMS[t](x, y, m) for x, y in action)
+
+def canonical_key(board: Board, agent_id: int) -> Tuple[int, int]:
+    # Smallest Zobrist hash (side to move included) over the symmetric images of the
+    # position, and the transform that produces it
+    size = board.size
+    keys = board.keys
+    perms, _ = symmetries(size)
+    amazons = [(keys.amazon[1], x * size + y) for x, y in board.agent_1_pos]
+    amazons += [(keys.amazon[2], x * size + y) for x, y in board.agent_2_pos]
+    arrows = [x * size + y for x in range(size) for y in range(size) if board.grid[x][y] == tile_stat.BLOCK]
+    temps = [(x * size + y, count) for (x, y), count in board.temp_blocks.items()]
+    best = None
+    for t, perm in enumerate(perms):
+        h = keys.side[agent_id]
+        for piece_keys, sq in amazons:
+            h ^= piece_keys[perm[sq]]
+        for sq in arrows:
+            h ^= keys.arrow[perm[sq]]
+        for sq, count in temps:
+            h ^= keys.temp[perm[sq]][count]
+        if best is None or h < best[0]:
+            best = (h, t)
+    return best
+
+def encode_action(action: Action, size: int) -> int:
+    squares = size * size
+    (fx, fy), (tx, ty), (ax, ay) = action
+    return ((fx * size + fy) * squares + tx * size + ty) * squares + ax * size + ay
+
+def decode_action(code: int, size: int) -> Action:
+    squares = size * size
+    code, arrow = divmod(code, squares)
+    from_sq, to_sq = divmod(code, squares)
+    return (divmod(from_sq, size), divmod(to_sq, size), divmod(arrow, size))
+
+def write_book(path: str, size: int, entries: Dict[int, int]):
+    # entries: canonical key -> encoded action in the canonical frame
+    header = np.array([(MAGIC, size, len(entries))], dtype=HEADER)
+    records = np.array(sorted(entries.items()), dtype=RECORD) if entries else np.zeros(0, dtype=RECORD)
+    with open(path, "wb") as f:
+        header.tofile(f)
+        records.tofile(f)
+
+class OpeningBook:
+    def __init__(self, path: str):
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) != 1 or not bytes(header[0]["magic"]).startswith(b"AMZBOOK"):
+            raise ValueError(f"Not an opening book: {path}")
+        if header[0]["magic"] != MAGIC:
+            raise ValueError(f"Opening book {path} is {bytes(header[0]['magic']).decode()}, expected "
+                             f"{MAGIC.decode()}: rebuild it with opening_book.py")
+        self.size = int(header[0]["size"])
+        count = int(header[0]["count"])
+        if count:
+            self.records = np.memmap(path, dtype=RECORD, mode="r", offset=HEADER.itemsize, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD)
+        self.keys = self.records["key"]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def lookup(self, board: Board, agent_id: int) -> Optional[Action]:
+        # Book move for agent_id in this position, mapped back from the canonical frame
+        if board.size != self.size or not len(self.records):
+            return None
+        key, t = canonical_key(board, agent_id)
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index == len(self.keys) or int(self.keys[index]) != key:
+            return None
+        _, inverse = symmetries(self.size)
+        action = transform_action(decode_action(int(self.records[index]["action"]), self.size), inverse[t], self.size)
+        # Guards against key collisions
+        return action if is_legal(board, action, agent_id) else None
+
+_BOOKS: Dict[str, OpeningBook] = {}
+
+def open_book(path: str) -> OpeningBook:
+    # One mapping per book file and process
+    path = os.path.abspath(path)
+    if path not in _BOOKS:
+        _BOOKS[path] = OpeningBook(path)
+    return _BOOKS[path]
+
+class BookAgent:
+    # Answers book positions at once and hands every other position to `agent`
+    def __init__(self, agent, book: OpeningBook):
+        self.agent = agent
+        self.agent_id = agent.agent_id
+        self.book = book
+        self.search_stats: Dict[str, float] = {}
+        self.book_stats = {"probes": 0, "hits": 0}
+
+    def get_action(self, board: Board) -> Action:
+        start = time.perf_counter()
+        self.book_stats["probes"] += 1
+        action = self.book.lookup(board, self.agent_id)
+        if action is not None:
+            self.book_stats["hits"] += 1
+            self.search_stats = {"book": 1, "time_total": time.perf_counter() - start}
+            return action
+        action = self.agent.get_action(board)
+        self.search_stats = {**getattr(self.agent, "search_stats", {}), "book": 0}
+        return action
+
+    def observe(self, action: tuple, agent_id: int):
+        observe = getattr(self.agent, "observe", None)
+        if observe:
+            observe(action, agent_id)
+
+    def close(self):
+        close = getattr(self.agent, "close", None)
+        if close:
+            close()
+
+
+def start_positions(size: int, count: int, seed: int = 0) -> List[Board]:
+    # Distinct (up to symmetry) boards from Game.sym_pos_gen, player 1 to move
+    state = random.getstate()
+    boards, seen = [], set()
+    try:
+        for i in range(count * 4):
+            if len(boards) == count:
+                break
+            random.seed(seed * 1000003 + i)
+            board = Game(None, None, size).board
+            key = canonical_key(board, 1)[0]
+            if key not in seen:
+                seen.add(key)
+                boards.append(board)
+    finally:
+        random.setstate(state)
+    return boards
+
+def _book_line(task: tuple) -> List[Tuple[int, int]]:
+    # Self-play from one start position: the searcher's move at each of the first
+    # `plies` turns, as (canonical key, canonical action) pairs
+    board, plies, time_limit, max_depth = task
+    agents = {agent_id: IterativeAgent(agent_id, time_limit=time_limit, max_depth=max_depth) for agent_id in (1, 2)}
+    entries = []
+    agent_id = 1
+    for _ in range(plies):
+        if not has_any_legal_move(board, agent_id):
+            break
+        try:
+            action = agents[agent_id].get_action(board)
+        except ValueError:
+            break
+        key, t = canonical_key(board, agent_id)
+        entries.append((key, encode_action(transform_action(action, t, board.size), board.size)))
+        board.apply_action(*action, agent_id)
+        agent_id = 3 - agent_id
+    return entries
+
+def build_book(path: str, size: int = 10, starts: int = 100, plies: int = 4, time_limit: float = 10.0,
+               max_depth: int = 4, seed: int = 0, workers: int = 1) -> int:
+    # Offline: deep IterativeAgent self-play on sampled start positions; every position
+    # on the lines is stored with the move played. Returns the number of entries.
+    tasks = [(board, plies, time_limit, max_depth) for board in start_positions(size, starts, seed)]
+    entries: Dict[int, int] = {}
+    if workers == 1:
+        lines = map(_book_line, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        lines = pool.imap(_book_line, tasks)
+    for line in lines:
+        for key, action in line:
+            # Lines are merged in start order, so the first search of a position wins
+            entries.setdefault(key, action)
+    if pool:
+        pool.close()
+        pool.join()
+    write_book(path, size, entries)
+    return len(entries)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book from deep self-play searches.")
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--starts", type=int, default=100, help="number of distinct start positions")
+    parser.add_argument("--plies", type=int, default=4, help="book depth in turns")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="search time per book move")
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", default=None, help="defaults to book_<size>.bin")
+    args = parser.parse_args()
+    out = args.out or f"book_{args.size}.bin"
+    count = build_book(out, size=args.size, starts=args.starts, plies=args.plies, time_limit=args.time_limit,
+                       max_depth=args.max_depth, seed=args.seed, workers=args.workers)
+    print(f"Wrote {count} positions to {out}")
@@ -0,0 +1,104 @@
+import multiprocessing
+import weakref
+from typing import Dict, Optional, Tuple
+from agent import retrieve_agent
+from board import Board
+
+# Pondering: the agent lives in its own process and, between its turns, keeps
+# searching (agent.ponder_step) while the opponent thinks. The search state stays
+# in that process, so nothing but boards and actions crosses the pipe.
+
+def _serve(conn, agent_type: str, agent_id: int, ponder: bool, slice_time: float, kwargs: Dict):
+    agent = retrieve_agent(agent_type, agent_id, **kwargs)
+    can_ponder = ponder and hasattr(agent, "ponder_step")
+    pondering = False
+    while True:
+        # Ponder in short slices, checking for a message between them
+        if pondering and not conn.poll():
+            pondering = agent.ponder_step(slice_time)
+            continue
+        message = conn.recv()
+        kind = message[0]
+        if kind == "act":
+            # As in server._worker: no legal move is a ValueError, anything else is
+            # sent back as an error for the parent to raise
+            try:
+                conn.send(("action", agent.get_action(message[1])))
+            except ValueError as error:
+                conn.send(("no_moves", str(error)))
+                continue
+            except Exception as error:
+                conn.send(("error", repr(error)))
+                continue
+            pondering = can_ponder
+        elif kind == "observe":
+            observe = getattr(agent, "observe", None)
+            if observe:
+                observe(message[1], message[2])
+            # After the opponent's move it is our turn: stop pondering
+            if message[2] != agent_id:
+                pondering = False
+        elif kind == "stats":
+            conn.send(("stats", {name: getattr(agent, name) for name in ("reuse_stats", "ponder_stats")
+                                 if hasattr(agent, name)}))
+        elif kind == "close":
+            break
+
+def _shutdown(conn, process):
+    try:
+        conn.send(("close",))
+    except OSError:
+        pass
+    process.join(timeout=1.0)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+
+class PonderingAgent:
+    # Same interface as the agent it wraps (get_action, observe). Game.run's observe
+    # hook tells the process when the opponent has moved. Pool workers are daemonic
+    # and cannot start a process, so there the agent runs in-process without pondering.
+    # The process is stopped by close() (Game.close) or, failing that, when the agent
+    # is collected.
+    def __init__(self, agent_type: str, agent_id: int, ponder: bool = True, slice_time: float = 0.05, **kwargs):
+        self.agent_id = agent_id
+        self._agent = None
+        self._process = None
+        if multiprocessing.current_process().daemon:
+            self._agent = retrieve_agent(agent_type, agent_id, **kwargs)
+            return
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, daemon=True,
+                                                args=(child_conn, agent_type, agent_id, ponder, slice_time, kwargs))
+        self._process.start()
+        self._finalizer = weakref.finalize(self, _shutdown, self._conn, self._process)
+
+    def get_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+        if self._agent is not None:
+            return self._agent.get_action(board)
+        self._conn.send(("act", board))
+        kind, payload = self._conn.recv()
+        if kind == "no_moves":
+            raise ValueError(payload)
+        if kind == "error":
+            raise RuntimeError(f"Pondering agent failed: {payload}")
+        return payload
+
+    def observe(self, action: tuple, agent_id: int):
+        if self._agent is not None:
+            observe = getattr(self._agent, "observe", None)
+            if observe:
+                observe(action, agent_id)
+            return
+        self._conn.send(("observe", action, agent_id))
+
+    def stats(self) -> Optional[Dict]:
+        if self._agent is not None:
+            return None
+        self._conn.send(("stats",))
+        return self._conn.recv()[1]
+
+    def close(self):
+        if self._process is not None:
+            self._finalizer()
+            self._process = None
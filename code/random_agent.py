@@ -9,7 +9,15 @@ class RandomAgent:
 
     def get_action(self, board: Board) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
         pos_list = board.agent_1_pos if self.agent_id == 1 else board.agent_2_pos
-        from_pos = random.choice(pos_list)
-        to_pos = random.choice(get_valid_moves(board, from_pos))
+        # Only amazons and destinations that still lead to a legal arrow can be picked
+        choices = {}
+        for from_pos in pos_list:
+            to_list = [to_pos for to_pos in get_valid_moves(board, from_pos) if get_valid_arrows(board, to_pos)]
+            if to_list:
+                choices[from_pos] = to_list
+        if not choices:
+            raise ValueError("No valid moves or arrows available.")
+        from_pos = random.choice(list(choices))
+        to_pos = random.choice(choices[from_pos])
         arrow_pos = random.choice(get_valid_arrows(board, to_pos))
         return (from_pos, to_pos, arrow_pos)
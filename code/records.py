@@ -0,0 +1,206 @@
+import argparse
+import os
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from board import Board
+from rules import has_any_legal_move
+from transposition import is_legal
+
+Action = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+
+# Game records: an archive file is a magic string followed by games, each a fixed-size
+# header and then one 3-byte record per ply (from, to and arrow squares as x * size + y,
+# so boards up to 16x16). Games are streamed: the header goes out with an "open" move
+# count that is patched once the game ends. A game left open by a crash is where the
+# loader stops, and reopening the archive for writing cuts it off first. Loading
+# memory-maps the file and gathers the moves of all games into one (plies, 3)
+# array, with a Python step per game and none per move.
+
+MAGIC = b"AMZREC01"
+AMAZONS = 4             # Per side, as placed by Game.sym_pos_gen
+MAX_SIZE = 16
+OPEN = 0xFFFFFFFF       # Move count of a game still being written
+
+HAS_SEED = 1
+RESOLVED = 2            # Ended by the endgame solver rather than by a side running out of moves
+
+GAME = np.dtype([("moves", "<u4"), ("size", "u1"), ("winner", "u1"), ("flags", "u1"), ("seed", "<u8"),
+                 ("start", "u1", (2, AMAZONS))])
+MOVE = np.dtype([("from", "u1"), ("to", "u1"), ("arrow", "u1")])
+
+def _complete_games(data: np.ndarray) -> Tuple[List[np.void], List[Tuple[int, int]], int]:
+    # Headers and move byte spans of the complete games at the start of an archive, and
+    # the offset where they end (an open or truncated game, or the end of the file)
+    headers, spans = [], []
+    offset = len(MAGIC)
+    while offset + GAME.itemsize <= len(data):
+        header = data[offset:offset + GAME.itemsize].view(GAME)[0]
+        count = int(header["moves"])
+        end = offset + GAME.itemsize + 3 * count
+        if count == OPEN or end > len(data):
+            break
+        headers.append(header)
+        spans.append((offset + GAME.itemsize, end))
+        offset = end
+    return headers, spans, offset
+
+class RecordWriter:
+    # Appends games to an archive, creating it if needed. Game.run(recorder=...) calls
+    # begin, move for every ply and end. A game left open at the end of an existing
+    # archive is cut off, as games appended after it could not be loaded.
+    def __init__(self, path: str):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            if self.file.read(len(MAGIC)) != MAGIC:
+                self.file.close()
+                raise ValueError(f"Not a game record archive: {path}")
+            data = np.memmap(path, dtype=np.uint8, mode="r")
+            end = _complete_games(data)[2]
+            del data
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file.write(MAGIC)
+        self.header = None      # Offset of the open game's header
+        self.size = 0
+        self.moves = 0
+
+    def begin(self, board: Board, seed: Optional[int] = None):
+        # Called before the first move, while the amazons are on their start squares
+        if board.size > MAX_SIZE:
+            raise ValueError(f"Boards larger than {MAX_SIZE}x{MAX_SIZE} cannot be recorded.")
+        if len(board.agent_1_pos) != AMAZONS or len(board.agent_2_pos) != AMAZONS:
+            raise ValueError(f"Records hold {AMAZONS} amazons per side.")
+        self.size = board.size
+        self.moves = 0
+        self.header = self.file.tell()
+        start = [[x * board.size + y for x, y in pos_list] for pos_list in (board.agent_1_pos, board.agent_2_pos)]
+        flags = HAS_SEED if seed is not None else 0
+        self.file.write(np.array([(OPEN, board.size, 0, flags, seed or 0, start)], dtype=GAME).tobytes())
+
+    def move(self, action: Action):
+        size = self.size
+        self.file.write(bytes(x * size + y for x, y in action))
+        self.moves += 1
+
+    def end(self, winner: int, resolved: bool = False):
+        end = self.file.tell()
+        self.file.seek(self.header)
+        header = np.frombuffer(self.file.read(GAME.itemsize), dtype=GAME).copy()
+        header["moves"] = self.moves
+        header["winner"] = winner
+        header["flags"] |= RESOLVED if resolved else 0
+        self.file.seek(self.header)
+        self.file.write(header.tobytes())
+        self.file.seek(end)
+        self.file.flush()
+        self.header = None
+
+    def close(self):
+        self.file.close()
+
+class GameArchive:
+    # Columns over all games (sizes, winners, flags, seeds, starts[game, side, amazon])
+    # and over all plies: moves[ply] = (from, to, arrow) squares, the plies of game i
+    # being moves[offsets[i]:offsets[i + 1]]
+    def __init__(self, headers: np.ndarray, moves: np.ndarray):
+        self.sizes = headers["size"].astype(np.int64)
+        self.winners = headers["winner"].astype(np.int8)
+        self.flags = headers["flags"]
+        self.seeds = headers["seed"]
+        self.starts = headers["start"]
+        self.plies = headers["moves"].astype(np.int64)
+        self.offsets = np.zeros(len(headers) + 1, dtype=np.int64)
+        np.cumsum(self.plies, out=self.offsets[1:])
+        self.moves = moves
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def game_index(self) -> np.ndarray:
+        # Game of every ply
+        return np.repeat(np.arange(len(self)), self.plies)
+
+    def ply_index(self) -> np.ndarray:
+        # Ply number of every ply within its game (even: player 1 moved)
+        return np.arange(len(self.moves)) - np.repeat(self.offsets[:-1], self.plies)
+
+    def game(self, i: int) -> Tuple[int, List[List[Tuple[int, int]]], List[Action]]:
+        # (size, start positions per side, actions) of one game
+        size = int(self.sizes[i])
+        start = [[divmod(int(sq), size) for sq in side] for side in self.starts[i]]
+        actions = [tuple(divmod(int(sq), size) for sq in move)
+                   for move in self.moves[self.offsets[i]:self.offsets[i + 1]].tolist()]
+        return size, start, actions
+
+def load_records(path: str) -> GameArchive:
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"Not a game record archive: {path}")
+    headers, spans, _ = _complete_games(data)
+    moves = np.empty((sum(end - start for start, end in spans) // 3, 3), dtype=np.uint8)
+    flat = moves.reshape(-1)
+    position = 0
+    for start, end in spans:
+        flat[position:position + end - start] = data[start:end]
+        position += end - start
+    return GameArchive(np.array(headers, dtype=GAME), moves)
+
+def replay(size: int, start: List[List[Tuple[int, int]]]) -> Board:
+    board = Board(size)
+    board.amazon_place(start[0], 1)
+    board.amazon_place(start[1], 2)
+    return board
+
+def validate_game(archive: GameArchive, i: int) -> Optional[Tuple[int, str]]:
+    # None if game i replays legally and its result matches the final position,
+    # else (ply, reason)
+    size, start, actions = archive.game(i)
+    squares = start[0] + start[1]
+    if len(set(squares)) != len(squares) or any(x >= size or y >= size for x, y in squares):
+        return 0, "bad start position"
+    board = replay(size, start)
+    agent_id = 1
+    for ply, action in enumerate(actions):
+        if not is_legal(board, action, agent_id):
+            return ply, f"illegal move {action} by player {agent_id}"
+        board.apply_action(*action, agent_id)
+        agent_id = 3 - agent_id
+    board.history.clear()
+    winner = int(archive.winners[i])
+    if archive.flags[i] & RESOLVED:
+        if winner not in (1, 2):
+            return len(actions), f"bad winner {winner}"
+    elif has_any_legal_move(board, agent_id):
+        return len(actions), f"player {agent_id} still has moves"
+    elif winner != 3 - agent_id:
+        return len(actions), f"winner {winner} recorded, player {3 - agent_id} won"
+    return None
+
+def validate(archive: GameArchive) -> List[Tuple[int, int, str]]:
+    # (game, ply, reason) for every game that fails validate_game
+    problems = []
+    for i in range(len(archive)):
+        problem = validate_game(archive, i)
+        if problem:
+            problems.append((i, *problem))
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load and validate a game record archive.")
+    parser.add_argument("path")
+    parser.add_argument("--no-validate", action="store_true")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    archive = load_records(args.path)
+    print(f"{len(archive)} games, {len(archive.moves)} plies loaded in {time.perf_counter() - start:.3f}s")
+    if len(archive):
+        print(f"Player 1 wins {np.mean(archive.winners == 1):.1%}, mean length {archive.plies.mean():.1f} plies")
+    if not args.no_validate:
+        start = time.perf_counter()
+        problems = validate(archive)
+        print(f"Validated in {time.perf_counter() - start:.3f}s: {len(problems)} bad games")
+        for game, ply, reason in problems[:20]:
+            print(f"  game {game}, ply {ply}: {reason}")
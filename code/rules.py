@@ -1,7 +1,10 @@
 from typing import List, Tuple
 from board import Board
+from bitboard import BitBoard
 
 def get_valid_moves(board: Board, from_pos: Tuple[int, int]) -> List[Tuple[int, int]]:
+        if isinstance(board, BitBoard):
+            return board.moves_from(from_pos)
         moves = []      # Append all valid moves to this list
         for dx, dy in board.DIRECTIONS:
             x,y= from_pos
@@ -14,4 +17,39 @@ def get_valid_moves(board: Board, from_pos: Tuple[int, int]) -> List[Tuple[int,
         return moves
 
 def get_valid_arrows(board: Board, arrow_from: Tuple[int, int]) -> List[Tuple[int, int]]:
-    return get_valid_moves(board, arrow_from)
\ No newline at end of file
+    return get_valid_moves(board, arrow_from)
+
+def count_valid_moves(board: Board, from_pos: Tuple[int, int]) -> int:
+    # Mobility of a single amazon; a popcount on the bitboard backend
+    if isinstance(board, BitBoard):
+        return board.mobility(from_pos)
+    return len(get_valid_moves(board, from_pos))
+
+def iter_actions(board: Board, agent_id: int, rng=None):
+    # Staged, lazy action source: amazon -> destination -> arrow.
+    # Each stage's list is built only when reached, so the board may be changed
+    # and restored between yields (as the in-place searches do).
+    # With an rng (random.Random) every stage is shuffled.
+    from_list = list(board.agent_1_pos if agent_id == 1 else board.agent_2_pos)
+    if rng:
+        rng.shuffle(from_list)
+    for from_pos in from_list:
+        to_list = get_valid_moves(board, from_pos)
+        if rng:
+            rng.shuffle(to_list)
+        for to_pos in to_list:
+            arrow_list = get_valid_arrows(board, to_pos)
+            if rng:
+                rng.shuffle(arrow_list)
+            for arrow_pos in arrow_list:
+                yield (from_pos, to_pos, arrow_pos)
+
+def has_any_legal_move(board: Board, agent_id: int) -> bool:
+    # Stops at the first legal (from, to, arrow). An arrow exists from to_pos as soon
+    # as one neighbour is free; the mover still blocks from_pos, as its temp block would.
+    for from_pos in (board.agent_1_pos if agent_id == 1 else board.agent_2_pos):
+        for tx, ty in get_valid_moves(board, from_pos):
+            for dx, dy in board.DIRECTIONS:
+                if not board.block_stat_check(tx + dx, ty + dy):
+                    return True
+    return False
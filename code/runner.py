@@ -0,0 +1,148 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, List, Optional
+from agent import retrieve_agent, parse_agent_spec
+from game import Game
+from telemetry import aggregate, export
+from tqdm import tqdm
+
+def game_seed(master_seed: int, index: int) -> int:
+    # Depends only on the master seed and the game index, never on the worker
+    # that plays it, so a run is reproducible whatever the pool size.
+    digest = hashlib.sha256(f"{master_seed}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+def play_game(task: tuple) -> Dict:
+    index, seed, agent1_type, agent2_type, size, resolve_endgame, agent_kwargs = task
+    # Sides, start positions and every agent's use of `random` follow from the game seed.
+    # Time-limited searches can still diverge between runs.
+    random.seed(seed)
+    is_agent1_first = random.random() < 0.5
+    if is_agent1_first:
+        first_agent_type, second_agent_type = agent1_type, agent2_type
+    else:
+        first_agent_type, second_agent_type = agent2_type, agent1_type
+
+    # Agent types may carry their own options ("mcts:rave=true"), on top of agent_kwargs
+    first_type, first_kwargs = parse_agent_spec(first_agent_type)
+    second_type, second_kwargs = parse_agent_spec(second_agent_type)
+    agent_first = retrieve_agent(first_type, 1, **{**agent_kwargs, **first_kwargs})
+    agent_second = retrieve_agent(second_type, 2, **{**agent_kwargs, **second_kwargs})
+
+    start = time.time()
+    game = Game(agent_first, agent_second, size)
+    try:
+        winner = game.run(verbose=False, return_winner=True, resolve_endgame=resolve_endgame)
+    finally:
+        game.close()
+    # Per-ply search stats, labelled with the agent type and board size for aggregation
+    telemetry = [{**ply, "agent": first_agent_type if ply["agent_id"] == 1 else second_agent_type,
+                  "size": size, "game": index} for ply in game.ply_stats]
+    return {
+        "game": index,
+        "seed": seed,
+        "size": size,
+        "agent1": agent1_type,
+        "agent2": agent2_type,
+        "agent1_side": 1 if is_agent1_first else 2,
+        "winner": winner,
+        "agent1_won": winner == (1 if is_agent1_first else 2),
+        "plies": game.plies,
+        "resolved": game.resolved,
+        "wall_time": time.time() - start,
+        "telemetry": telemetry,
+    }
+
+def _init_worker(counter, cpus: Optional[List[int]]):
+    # Pin each worker to one CPU (round-robin) so that games do not migrate between cores
+    if cpus and hasattr(os, "sched_setaffinity"):
+        with counter.get_lock():
+            slot = counter.value
+            counter.value += 1
+        os.sched_setaffinity(0, {cpus[slot % len(cpus)]})
+
+def summarize(records: List[Dict], agent1_type: str, agent2_type: str) -> Dict:
+    games = len(records)
+    agent_1_wins = sum(1 for r in records if r["agent1_won"])
+    return {
+        "games": games,
+        "agent1": agent1_type,
+        "agent2": agent2_type,
+        "agent1_wins": agent_1_wins,
+        "agent2_wins": games - agent_1_wins,
+        "mean_plies": sum(r["plies"] for r in records) / games if games else 0.0,
+        "mean_wall_time": sum(r["wall_time"] for r in records) / games if games else 0.0,
+    }
+
+def run_battle(agent1_type: str, agent2_type: str, games: int = 10, size: int = 10, seed: int = 0,
+               workers: Optional[int] = None, affinity: bool = False, out_path: Optional[str] = None,
+               telemetry_path: Optional[str] = None, resolve_endgame: bool = False, **agent_kwargs) -> Dict:
+    # Parallel counterpart of main.battle: one game per task, records streamed to
+    # `out_path` (JSON lines) as games finish, in completion order. With telemetry_path,
+    # per-move search stats are aggregated per agent and board size into
+    # <telemetry_path>.json and <telemetry_path>.csv. resolve_endgame ends games once the
+    # endgame solver knows the winner.
+    workers = workers or os.cpu_count() or 1
+    tasks = [(i, game_seed(seed, i), agent1_type, agent2_type, size, resolve_endgame, agent_kwargs)
+             for i in range(games)]
+    records = []
+    out = open(out_path, "a") if out_path else None
+    try:
+        if workers == 1:
+            results = map(play_game, tasks)
+            pool = None
+        else:
+            cpus = sorted(os.sched_getaffinity(0)) if affinity and hasattr(os, "sched_getaffinity") else None
+            pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                        initargs=(multiprocessing.Value("i", 0), cpus))
+            results = pool.imap_unordered(play_game, tasks)
+        for record in tqdm(results, total=games, desc="Simulating battles"):
+            if not telemetry_path:
+                # Per-ply stats are only kept for the telemetry export
+                del record["telemetry"]
+            records.append(record)
+            if out:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+        if pool:
+            pool.close()
+            pool.join()
+    finally:
+        if out:
+            out.close()
+
+    if telemetry_path:
+        export(aggregate([ply for record in records for ply in record["telemetry"]]), telemetry_path)
+
+    summary = summarize(records, agent1_type, agent2_type)
+    print(f"\nSummary after {games} games:")
+    print(f"Agent 1 ({agent1_type}) wins: {summary['agent1_wins']}")
+    print(f"Agent 2 ({agent2_type}) wins: {summary['agent2_wins']}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a battle across a process pool.")
+    parser.add_argument("agent1")
+    parser.add_argument("agent2")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--affinity", action="store_true")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--telemetry", default=None, help="path prefix for the aggregated .json / .csv")
+    parser.add_argument("--time-limit", type=float, default=1.0)
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--book", default=None, help="opening book file (see opening_book.py)")
+    parser.add_argument("--endgame", action="store_true", help="agents fill separated territories with the solver")
+    parser.add_argument("--resolve-endgame", action="store_true", help="end games once the winner is known")
+    args = parser.parse_args()
+    run_battle(args.agent1, args.agent2, games=args.games, size=args.size, seed=args.seed,
+               workers=args.workers, affinity=args.affinity, out_path=args.out, telemetry_path=args.telemetry,
+               resolve_endgame=args.resolve_endgame, endgame=args.endgame,
+               time_limit=args.time_limit, max_depth=args.max_depth, book=args.book)
@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from agent import retrieve_agent, parse_value, parse_agent_spec
+from game import Game
+from telemetry import percentile
+
+# Match server: many games at once in one asyncio loop. Each game is a coroutine around
+# a Game; the agents' get_action calls go to a fixed set of worker processes, one move
+# per worker at a time. A move that misses its deadline forfeits the game and its
+# worker is killed and replaced, which is what cancels the search.
+#
+# Line protocol (one command or reply per line):
+#   PLAY <agent1> <agent2> <size> [key=value ...]  ->  STARTED <id>, later RESULT <id> <json>
+#       keys: seed (start position) and agent options such as time_limit, max_depth
+#       result reasons: no_moves, timeout, illegal, error (the agent raised or its worker died)
+#   STATS  ->  STATS <json>
+#   QUIT
+
+def _worker(conn):
+    # Agents are built per move: any worker can serve any game, so no search state is kept
+    while True:
+        message = conn.recv()
+        if message[0] == "close":
+            break
+        _, spec, agent_id, kwargs, board = message
+        agent_type, options = parse_agent_spec(spec)
+        agent = None
+        try:
+            agent = retrieve_agent(agent_type, agent_id, **{**kwargs, **options})
+            conn.send(("action", agent.get_action(board)))
+        except ValueError as error:
+            # Agents raise ValueError when they have no legal move
+            conn.send(("no_moves", str(error)))
+        except Exception as error:
+            conn.send(("error", repr(error)))
+        finally:
+            close = getattr(agent, "close", None)
+            if close:
+                close()
+
+class WorkerPool:
+    # Idle workers are handed to waiting games in arrival order, so a game that just got
+    # its move back cannot take the worker again ahead of games already waiting
+    def __init__(self, size: int):
+        self.size = size
+        self.idle = collections.deque()
+        self.waiters = collections.deque()
+        self.processes = set()
+        self.replaced = 0
+
+    def _spawn(self):
+        conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_worker, args=(child_conn,), daemon=True)
+        process.start()
+        self.processes.add(process)
+        self._release((process, conn))
+
+    def start(self):
+        for _ in range(self.size):
+            self._spawn()
+
+    def _release(self, worker: tuple):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+        self.idle.append(worker)
+
+    async def _acquire(self) -> tuple:
+        if self.idle and not self.waiters:
+            return self.idle.popleft()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            raise
+
+    async def call(self, message: tuple, timeout: float) -> Tuple[tuple, float, float]:
+        # Returns (reply, queue wait, latency); raises asyncio.TimeoutError after `timeout`
+        # seconds of work, or EOFError if the worker dies, once the worker has been replaced
+        queued = time.perf_counter()
+        process, conn = await self._acquire()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+
+        def on_readable():
+            if reply.done():
+                return
+            try:
+                reply.set_result(conn.recv())
+            except EOFError as error:
+                # The worker died: fail the call now rather than at the deadline
+                reply.set_exception(error)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        try:
+            conn.send(message)
+            result = await asyncio.wait_for(reply, timeout)
+        except BaseException:
+            loop.remove_reader(conn.fileno())
+            process.terminate()
+            process.join()
+            self.processes.discard(process)
+            conn.close()
+            self.replaced += 1
+            self._spawn()
+            raise
+        loop.remove_reader(conn.fileno())
+        self._release((process, conn))
+        return result, started - queued, time.perf_counter() - started
+
+    def close(self):
+        while self.idle:
+            process, conn = self.idle.popleft()
+            conn.send(("close",))
+            conn.close()
+        for process in self.processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes.clear()
+
+class MatchServer:
+    # grace: allowance over an agent's time_limit for process and pickling overhead.
+    # move_timeout, when given, replaces time_limit + grace as the per-move deadline.
+    def __init__(self, workers: Optional[int] = None, grace: float = 1.0, move_timeout: Optional[float] = None):
+        self.pool = WorkerPool(workers or os.cpu_count() or 1)
+        self.grace = grace
+        self.move_timeout = move_timeout
+        self.ids = itertools.count(1)
+        self.started = None
+        self.server = None
+        self.clients = set()    # Connection handler tasks
+        self.games: List[Dict] = []
+        self.queue_wait: List[float] = []
+        self.move_latency: List[float] = []
+        self.timeouts = 0
+        self.errors = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        # Returns the port actually bound
+        self.pool.start()
+        self.started = time.perf_counter()
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        # Stops accepting, lets connected clients finish, then stops the workers
+        if self.server:
+            self.server.close()
+            await asyncio.gather(*self.clients, return_exceptions=True)
+            await self.server.wait_closed()
+        self.pool.close()
+
+    async def play_match(self, agent1: str, agent2: str, size: int = 10, seed: Optional[int] = None, **kwargs) -> Dict:
+        # kwargs go to retrieve_agent for both sides, as in runner.play_game
+        game_id = next(self.ids)
+        game = Game(None, None, size, seed=seed)
+        deadline = self.move_timeout or kwargs.get("time_limit", 2.0) + self.grace
+        start = time.perf_counter()
+        reason = "no_moves"
+        detail = None
+        while True:
+            agent_type = agent1 if game.current_turn == 1 else agent2
+            message = ("move", agent_type, game.current_turn, kwargs, game.board)
+            try:
+                (kind, payload), wait, latency = await self.pool.call(message, deadline)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                reason = "timeout"
+                break
+            except EOFError:
+                self.errors += 1
+                reason, detail = "error", "worker died"
+                break
+            self.queue_wait.append(wait)
+            self.move_latency.append(latency)
+            if kind == "no_moves":
+                break
+            if kind == "error":
+                self.errors += 1
+                reason, detail = "error", payload
+                break
+            try:
+                game.apply_move(payload)
+            except ValueError:
+                reason = "illegal"
+                break
+            game.plies += 1
+            game.current_turn = 3 - game.current_turn
+        record = {"game": game_id, "agent1": agent1, "agent2": agent2, "size": size, "seed": seed,
+                  "winner": 3 - game.current_turn, "plies": game.plies, "reason": reason, "detail": detail,
+                  "wall_time": time.perf_counter() - start}
+        self.games.append(record)
+        return record
+
+    def metrics(self) -> Dict:
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        summary = lambda values: ({"count": len(values), "p50": percentile(values, 50), "p90": percentile(values, 90),
+                                   "p99": percentile(values, 99), "max": max(values)} if values else {"count": 0})
+        return {
+            "games": len(self.games),
+            "games_per_hour": len(self.games) / elapsed * 3600 if elapsed else 0.0,
+            "moves": len(self.move_latency),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "workers_replaced": self.pool.replaced,
+            "queue_wait": summary(self.queue_wait),
+            "move_latency": summary(self.move_latency),
+        }
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients.add(asyncio.current_task())
+        tasks = set()
+
+        async def report(game_id_line: str, coro):
+            record = await coro
+            writer.write(f"RESULT {game_id_line} {json.dumps(record)}\n".encode())
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode().split()
+                if not words:
+                    continue
+                command = words[0].upper()
+                if command == "PLAY" and len(words) >= 4 and words[3].isdigit():
+                    options = dict(parse_option(word) for word in words[4:])
+                    tag = str(len(tasks) + 1) if "tag" not in options else str(options.pop("tag"))
+                    writer.write(f"STARTED {tag}\n".encode())
+                    task = asyncio.create_task(report(tag, self.play_match(words[1], words[2], int(words[3]), **options)))
+                    tasks.add(task)
+                elif command == "STATS":
+                    writer.write(f"STATS {json.dumps(self.metrics())}\n".encode())
+                elif command == "QUIT":
+                    break
+                else:
+                    writer.write(f"ERROR unknown command: {line.decode().strip()}\n".encode())
+                await writer.drain()
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+            self.clients.discard(asyncio.current_task())
+
+def parse_option(word: str) -> Tuple[str, object]:
+    key, _, value = word.partition("=")
+    return key, parse_value(value)
+
+
+async def load_test(host: str, port: int, games: int, concurrency: int, agent1: str, agent2: str,
+                    size: int, **options) -> List[Dict]:
+    # Client side: `concurrency` connections, each playing its share of the games one
+    # PLAY line at a time over the line protocol
+    async def client(indices: List[int]) -> List[Dict]:
+        reader, writer = await asyncio.open_connection(host, port)
+        records = []
+        extra = " ".join(f"{key}={json.dumps(value)}" for key, value in options.items())
+        for index in indices:
+            writer.write(f"PLAY {agent1} {agent2} {size} tag={index} seed={index} {extra}\n".encode())
+            await writer.drain()
+            while True:
+                words = (await reader.readline()).decode().split(" ", 2)
+                if words[0] == "RESULT":
+                    records.append(json.loads(words[2]))
+                    break
+        writer.write(b"QUIT\n")
+        await writer.drain()
+        writer.close()
+        return records
+
+    shares = [list(range(i, games, concurrency)) for i in range(min(concurrency, games))]
+    results = await asyncio.gather(*(client(share) for share in shares))
+    return [record for records in results for record in records]
+
+def run_load_test(games: int = 20, concurrency: int = 8, workers: Optional[int] = None, agent1: str = "random",
+                  agent2: str = "random", size: int = 6, grace: float = 1.0, move_timeout: Optional[float] = None,
+                  **options) -> Dict:
+    # Offline load test: server and clients in one event loop on a local port.
+    # Returns the server metrics with the game records under "records".
+    async def main():
+        server = MatchServer(workers, grace=grace, move_timeout=move_timeout)
+        port = await server.start()
+        try:
+            records = await load_test("127.0.0.1", port, games, concurrency, agent1, agent2, size, **options)
+        finally:
+            await server.close()
+        return {**server.metrics(), "records": records}
+    return asyncio.run(main())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asyncio match server and a local load test.")
+    parser.add_argument("mode", choices=["serve", "loadtest"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--grace", type=float, default=1.0, help="seconds allowed over time_limit per move")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--agent1", default="random")
+    parser.add_argument("--agent2", default="random")
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--time-limit", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.mode == "serve":
+        async def serve():
+            server = MatchServer(args.workers, grace=args.grace)
+            port = await server.start(args.host, args.port)
+            print(f"Serving on {args.host}:{port}")
+            try:
+                await server.server.serve_forever()
+            finally:
+                await server.close()
+        asyncio.run(serve())
+    else:
+        metrics = run_load_test(args.games, args.concurrency, args.workers, args.agent1, args.agent2, args.size,
+                                grace=args.grace, time_limit=args.time_limit)
+        metrics.pop("records")
+        print(json.dumps(metrics, indent=2))
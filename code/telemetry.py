@@ -0,0 +1,96 @@
+import csv
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Tuple
+
+# Per-move search statistics. Each agent fills a SearchStats during get_action and
+# exposes it as `search_stats` (a flat dict); Game.run collects one per ply and
+# the battle runner aggregates them per agent and board size.
+
+_END = object()
+
+class SearchStats:
+    def __init__(self):
+        self.counters: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def count(self, name: str, n: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def maximum(self, name: str, value: float):
+        if value > self.counters.get(name, value - 1):
+            self.counters[name] = value
+
+    def add_time(self, phase: str, seconds: float):
+        name = "time_" + phase
+        self.counters[name] = self.counters.get(name, 0.0) + seconds
+
+    def timed(self, phase: str, iterable: Iterable):
+        # Yields from `iterable`, adding the time spent producing each item to `phase`.
+        # Meant for lazy move generators interleaved with the search.
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            item = next(it, _END)
+            self.add_time(phase, time.perf_counter() - start)
+            if item is _END:
+                return
+            yield item
+
+    def as_dict(self) -> Dict[str, float]:
+        stats = dict(self.counters)
+        stats["time_total"] = time.perf_counter() - self._start
+        return stats
+
+class phase_timer:
+    # with phase_timer(stats, "eval"): ... adds the block's time to stats
+    def __init__(self, stats: SearchStats, phase: str):
+        self.stats = stats
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.phase, time.perf_counter() - self.start)
+        return False
+
+def percentile(values: List[float], q: float) -> float:
+    # Nearest-rank percentile of a non-empty list, q in [0, 100]
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100) - 1))
+    return ordered[index]
+
+def aggregate(plies: List[Dict]) -> Dict[Tuple[str, int], Dict[str, Dict[str, float]]]:
+    # plies: per-ply dicts with "agent" and "size" plus numeric metrics.
+    # Returns {(agent, size): {metric: {count, mean, p50, p90, p99, max}}}
+    groups: Dict[Tuple[str, int], Dict[str, List[float]]] = {}
+    for ply in plies:
+        metrics = groups.setdefault((ply["agent"], ply["size"]), {})
+        for name, value in ply.items():
+            if name in ("agent", "size", "ply", "agent_id", "game") or isinstance(value, (bool, str)):
+                continue
+            metrics.setdefault(name, []).append(value)
+    return {
+        key: {
+            name: {"count": len(values), "mean": sum(values) / len(values), "p50": percentile(values, 50),
+                   "p90": percentile(values, 90), "p99": percentile(values, 99), "max": max(values)}
+            for name, values in sorted(metrics.items())
+        }
+        for key, metrics in groups.items()
+    }
+
+def export(aggregates: Dict[Tuple[str, int], Dict[str, Dict[str, float]]], path_prefix: str):
+    # Writes <prefix>.json (nested) and <prefix>.csv (one row per agent, size and metric)
+    nested = {f"{agent}@{size}": metrics for (agent, size), metrics in sorted(aggregates.items())}
+    with open(path_prefix + ".json", "w") as f:
+        json.dump(nested, f, indent=2)
+    columns = ["count", "mean", "p50", "p90", "p99", "max"]
+    with open(path_prefix + ".csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["agent", "size", "metric"] + columns)
+        for (agent, size), metrics in sorted(aggregates.items()):
+            for name, summary in metrics.items():
+                writer.writerow([agent, size, name] + [summary[c] for c in columns])
@@ -51,7 +51,832 @@ def test_temp_block():
         print(f"\nAfter turn {turn + 1}:")
         board.display()
 
+def test_temp_block_schedule():
+    print("=== Test: Temp Block Schedule ===")
+    from board import tile_stat
+    board = Board(size=6)
+    board.amazon_place([(0, 0)], agent_id=1)
+    board.amazon_place([(5, 5)], agent_id=2)
+    board.move((0, 0), (0, 3), 1)
+    board.arrow_place((0, 3), (3, 3), 1)
+    # Made on this ply, the block lives through exactly 5 updates
+    for turns_left in (5, 4, 3, 2, 1):
+        assert board.temp_blocks == {(0, 0): turns_left} and board.grid[0][0] == tile_stat.TEMP_BLOCK
+        assert board.expiring_in(turns_left) == [(0, 0)] and board.lifetime_masks()[turns_left - 1] == 1
+        assert board.zobrist == board.compute_zobrist()
+        board.update_temp_blocks()
+    assert board.temp_blocks == {} and board.grid[0][0] == tile_stat.EMPTY and board.ply == 5
+    assert board.lifetime_masks() == (0, 0, 0, 0, 0) and board.temp_hash == 0
+    # Searching rewinds the ply and brings expired blocks back
+    board.apply_action((5, 5), (5, 4), (4, 4), 2)
+    board.apply_action((0, 3), (1, 3), (1, 0), 1)
+    assert board.ply == 7 and board.temp_blocks == {(5, 5): 3, (0, 3): 4}
+    board.undo()
+    board.undo()
+    assert board.ply == 5 and board.temp_blocks == {} and board.zobrist == board.compute_zobrist()
+
+def test_bitboard_matches_board():
+    print("=== Test: BitBoard Move Generation ===")
+    import random
+    from bitboard import BitBoard
+    rng = random.Random(7)
+    for size in (6, 10, 15):
+        board = Board(size)
+        bit_board = BitBoard(size)
+        for b in (board, bit_board):
+            b.amazon_place([(0, 1), (1, size - 1)], agent_id=1)
+            b.amazon_place([(size - 1, size - 2), (size - 2, 0)], agent_id=2)
+        for ply in range(30):
+            agent_id = 1 if ply % 2 == 0 else 2
+            pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+            actions = []
+            for from_pos in pos_list:
+                moves = get_valid_moves(board, from_pos)
+                assert sorted(moves) == sorted(get_valid_moves(bit_board, from_pos))
+                for to_pos in moves:
+                    arrows = get_valid_arrows(board, to_pos)
+                    assert sorted(arrows) == sorted(get_valid_arrows(bit_board, to_pos))
+                    actions += [(from_pos, to_pos, arrow_pos) for arrow_pos in arrows]
+            if not actions:
+                break
+            from_pos, to_pos, arrow_pos = rng.choice(actions)
+            for b in (board, bit_board):
+                b.move(from_pos, to_pos, agent_id)
+                b.arrow_place(to_pos, arrow_pos, agent_id)
+                b.update_temp_blocks()
+            assert board.grid == bit_board.grid
+
+def test_apply_action_undo():
+    print("=== Test: Apply Action / Undo ===")
+    import random
+    rng = random.Random(3)
+    board = Board(size=6)
+    board.amazon_place([(0, 1), (1, 5)], agent_id=1)
+    board.amazon_place([(5, 4), (4, 0)], agent_id=2)
+    snapshots = []
+    for ply in range(20):
+        agent_id = 1 if ply % 2 == 0 else 2
+        pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+        actions = [(f, t, a) for f in pos_list for t in get_valid_moves(board, f) for a in get_valid_arrows(board, t)]
+        if not actions:
+            break
+        snapshots.append(board.clone())
+        board.apply_action(*rng.choice(actions), agent_id)
+        assert board.zobrist == board.compute_zobrist()
+    # Temp blocks expire along the way, so this also covers restoring expired squares
+    while snapshots:
+        board.undo()
+        before = snapshots.pop()
+        assert board.grid == before.grid
+        assert board.temp_blocks == before.temp_blocks
+        assert board.agent_1_pos == before.agent_1_pos
+        assert board.agent_2_pos == before.agent_2_pos
+        assert board.zobrist == before.zobrist
+
+def test_runner_worker_independence():
+    print("=== Test: Runner Seeds ===")
+    import json, os, tempfile
+    from runner import run_battle
+    folder = tempfile.mkdtemp()
+    runs = []
+    for workers in (1, 2):
+        path = os.path.join(folder, f"games_{workers}.jsonl")
+        run_battle("random", "random", games=6, size=5, seed=4, workers=workers, out_path=path)
+        with open(path) as f:
+            records = sorted((json.loads(line) for line in f), key=lambda r: r["game"])
+        assert all("telemetry" not in r for r in records)
+        runs.append([{k: v for k, v in r.items() if k != "wall_time"} for r in records])
+    # Each game's seed depends only on its index, so the pool size changes nothing
+    assert len(runs[0]) == 6 and runs[0] == runs[1]
+
+def test_zobrist_transpositions():
+    print("=== Test: Zobrist Hash ===")
+    first = Board(size=6)
+    second = Board(size=6)
+    for board in (first, second):
+        board.amazon_place([(0, 0), (0, 5)], agent_id=1)
+        board.amazon_place([(5, 0), (5, 5)], agent_id=2)
+    # Same arrows and amazons reached in a different order, with the checked API on one side
+    first.apply_action((0, 0), (1, 1), (2, 2), 1)
+    first.apply_action((5, 0), (4, 1), (3, 1), 2)
+    first.apply_action((0, 5), (1, 4), (2, 4), 1)
+    second.move((0, 5), (1, 4), 1)
+    second.arrow_place((1, 4), (2, 4), 1)
+    second.update_temp_blocks()
+    second.apply_action((5, 0), (4, 1), (3, 1), 2)
+    second.apply_action((0, 0), (1, 1), (2, 2), 1)
+    assert first.zobrist == first.compute_zobrist()
+    assert second.zobrist == second.compute_zobrist()
+    # The temp blocks left on (0, 0) and (0, 5) have different countdowns
+    assert first.zobrist != second.zobrist
+    for _ in range(4):
+        first.update_temp_blocks()
+        second.update_temp_blocks()
+    assert first.grid == second.grid and first.zobrist == second.zobrist
+
+def test_hash_move_legality():
+    print("=== Test: Hash Move Legality ===")
+    from transposition import is_legal
+    board = Board(size=6)
+    board.amazon_place([(0, 0)], agent_id=1)
+    board.amazon_place([(5, 5)], agent_id=2)
+    assert is_legal(board, ((0, 0), (0, 2), (0, 3)), 1)
+    # The arrow cannot land on the square the amazon has just moved to
+    assert not is_legal(board, ((0, 0), (0, 2), (0, 2)), 1)
+    # Nor can the amazon stay where it is
+    assert not is_legal(board, ((0, 0), (0, 0), (0, 3)), 1)
+    assert not is_legal(board, ((5, 5), (5, 3), (5, 1)), 1)
+
+def test_iterative_timeout():
+    print("=== Test: Iterative Deepening Timeout ===")
+    import time
+    from iterative_agent import IterativeAgent
+    from transposition import position_key
+    board = Board(size=6)
+    board.amazon_place([(0, 0), (0, 5)], agent_id=1)
+    board.amazon_place([(5, 0), (5, 5)], agent_id=2)
+    agent = IterativeAgent(1, time_limit=0.0)
+    agent.start_time = time.time() - 1
+    # An interrupted subtree raises instead of returning a static score
+    try:
+        agent.minimax(board, 2, True)
+        assert False, "expected TimeoutError"
+    except TimeoutError:
+        pass
+    assert agent.minimax(board, 0, True) == agent.board_eval(board)
+    assert agent.tt.probe(position_key(board, 1)) is None
+    # A lower bound from the table raises alpha, but the result is still flagged against
+    # the caller's window: a score equal to that bound is exact, not an upper bound
+    from heuristic_agent import HeuristicAgent
+    from transposition import EXACT, LOWER
+    key = position_key(board, 1)
+    for agent in (IterativeAgent(1, time_limit=30.0), HeuristicAgent(1, max_depth=2, time_limit=30.0)):
+        search = agent.minimax if isinstance(agent, IterativeAgent) else \
+            lambda b, depth, maximizing: agent.alpha_beta(b, depth, float('-inf'), float('inf'), maximizing)
+        agent.start_time = time.time()
+        value = search(board, 2, True)
+        _, depth, score, flag, move = agent.tt.probe(key)
+        assert (depth, score, flag) == (2, value, EXACT)
+        agent.tt.slots[key % agent.tt.size] = (key, 2, value, LOWER, move)
+        assert search(board, 2, True) == value and agent.tt.probe(key)[3] == EXACT
+
+def test_has_any_legal_move():
+    print("=== Test: Legal Move Short-circuit ===")
+    import random
+    from rules import iter_actions, has_any_legal_move
+    rng = random.Random(11)
+    for game in range(20):
+        board = Board(size=5)
+        board.amazon_place([(0, 1), (1, 4)], agent_id=1)
+        board.amazon_place([(4, 3), (3, 0)], agent_id=2)
+        # Play random games to the end so that cramped and terminal positions are covered
+        agent_id = 1
+        while True:
+            actions = list(iter_actions(board, agent_id))
+            assert has_any_legal_move(board, agent_id) == bool(actions)
+            assert has_any_legal_move(board, 3 - agent_id) == bool(list(iter_actions(board, 3 - agent_id)))
+            if not actions:
+                break
+            board.apply_action(*rng.choice(actions), agent_id)
+            agent_id = 3 - agent_id
+
+def test_vectorized_evaluation():
+    print("=== Test: Vectorized Evaluation ===")
+    from evaluation import evaluate
+    from benchmark import random_position
+
+    def distances(board, starts, step):
+        dist, frontier, d = {}, list(starts), 1
+        while frontier:
+            layer = []
+            for pos in frontier:
+                for nxt in step(board, pos):
+                    if nxt not in dist and nxt not in starts:
+                        dist[nxt] = d
+                        layer.append(nxt)
+            frontier, d = layer, d + 1
+        return dist
+
+    def king_moves(board, pos):
+        return [(pos[0] + dx, pos[1] + dy) for dx, dy in board.DIRECTIONS
+                if not board.block_stat_check(pos[0] + dx, pos[1] + dy)]
+
+    for size, plies in ((6, 12), (10, 25), (15, 40)):
+        board = random_position(size, plies, seed=size)
+        features = evaluate(board, 2)
+        mobility = sum(len(get_valid_moves(board, pos)) for pos in board.agent_2_pos) - \
+                   sum(len(get_valid_moves(board, pos)) for pos in board.agent_1_pos)
+        assert features["mobility"] == mobility
+        q2, q1 = distances(board, board.agent_2_pos, get_valid_moves), distances(board, board.agent_1_pos, get_valid_moves)
+        k2, k1 = distances(board, board.agent_2_pos, king_moves), distances(board, board.agent_1_pos, king_moves)
+        territory = 0
+        for x in range(size):
+            for y in range(size):
+                mine = (q2.get((x, y), 255), k2.get((x, y), 255))
+                theirs = (q1.get((x, y), 255), k1.get((x, y), 255))
+                territory += (mine < theirs) - (theirs < mine)
+        assert features["territory"] == territory
+
+def test_batched_root_evaluation():
+    print("=== Test: Batched Root Evaluation ===")
+    from benchmark import random_position
+    from heuristic_agent import HeuristicAgent
+    from rules import iter_actions
+    # Enough plies for temp blocks to be on their last turn
+    board = random_position(8, 9, seed=5)
+    agent = HeuristicAgent(2)
+    actions = list(iter_actions(board, 2))
+    scores = agent.batch_eval(board, actions)
+    for action, score in zip(actions, scores):
+        board.apply_action(*action, 2)
+        assert abs(agent.board_eval(board) - score) < 1e-9
+        board.undo()
+
+def test_move_ordering():
+    print("=== Test: Alpha-beta Move Ordering ===")
+    import time
+    from benchmark import random_position
+    from heuristic_agent import HeuristicAgent
+    from rules import iter_actions
+    for seed in (1, 2, 3):
+        board = random_position(6, 12, seed=seed)
+        results = []
+        for ordered in (True, False):
+            agent = HeuristicAgent(1, max_depth=3, time_limit=1e9)
+            if not ordered:
+                agent.ordered_actions = lambda board, agent_id, hash_move, ply: iter_actions(board, agent_id)
+            agent.start_time = time.time()
+            score = agent.alpha_beta(board.clone(), 3, float("-inf"), float("inf"), True)
+            results.append((score, agent.stats["nodes"], agent.stats["first_move_cutoffs"]))
+        (score, nodes, first_cutoffs), (plain_score, plain_nodes, plain_first_cutoffs) = results
+        # Ordering changes how much is searched, never the result
+        assert score == plain_score
+        assert nodes <= plain_nodes and first_cutoffs >= plain_first_cutoffs
+    # Killers and the hash move come first, and every action is generated exactly once
+    actions = list(iter_actions(board, 1))
+    agent = HeuristicAgent(1)
+    agent.killers = {0: [actions[-1], actions[5]]}
+    ordered = list(agent.ordered_actions(board, 1, actions[3], 0))
+    assert ordered[:3] == [actions[3], actions[-1], actions[5]] and sorted(ordered) == sorted(actions)
+
+def test_root_parallel_mcts():
+    print("=== Test: Root-parallel MCTS ===")
+    import gc
+    from MCTS_agent import MCTSAgent
+    from game import Game
+    from transposition import is_legal
+    board = Board(size=5)
+    board.amazon_place([(0, 1), (1, 4)], agent_id=1)
+    board.amazon_place([(4, 3), (3, 0)], agent_id=2)
+    agent = MCTSAgent(1, time_limit=0.3, workers=2, seed=3)
+    action = agent.get_action(board)
+    assert is_legal(board, action, 1) and agent.iterations > 0
+    processes = list(agent._pool._pool)
+    assert len(processes) == 2 and all(p.is_alive() for p in processes)
+    # Game.close releases the pool of a root-parallel agent
+    game = Game(agent, MCTSAgent(2, time_limit=0.1), 5)
+    game.close()
+    assert agent._pool is None
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+    # An agent that is never closed frees its pool when it is collected
+    agent = MCTSAgent(1, time_limit=0.1, workers=2, seed=3)
+    agent.get_action(board)
+    processes = list(agent._pool._pool)
+    del agent
+    gc.collect()
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+
+def test_mcts_tree_reuse():
+    print("=== Test: MCTS Tree Reuse ===")
+    from benchmark import random_position
+    from MCTS_agent import MCTSAgent
+    board = random_position(6, 4, seed=2)
+    agent = MCTSAgent(1, time_limit=0.3, seed=0)
+    action = agent.get_action(board)
+    board.apply_action(*action, 1)
+    # The kept root is the position after our move, waiting for the opponent
+    assert agent._root.hash == board.zobrist and agent._root.parent is None
+    reply, _ = max(agent._root.children, key=lambda c: c[0].visits)
+    board.apply_action(*reply.action, 2)
+    carried = reply.visits
+    agent.get_action(board)
+    assert agent.reuse_stats["hits"] == 1
+    assert agent.reuse_stats["last_carried_visits"] == carried > 0
+    # The search went on from the opponent's reply instead of a fresh root
+    assert reply.parent is None and reply.visits > carried
+    # The shared search board follows the game: it is now past our second move
+    board.apply_action(*agent._root.action, 1)
+    assert agent._board.zobrist == board.zobrist and agent._board.grid == board.grid
+
+def test_two_stage_mcts():
+    print("=== Test: Two-Stage MCTS ===")
+    from benchmark import random_position
+    from MCTS_agent import MCTSAgent
+    board = random_position(6, 4, seed=3)
+    agent = MCTSAgent(2, time_limit=0.3, two_stage=True, reuse_tree=False)
+    root = agent.search(board)
+    # Progressive widening: children grow with sqrt(visits), not with the move count
+    for node in [root] + [child for child, _ in root.children]:
+        assert 0 < len(node.children) <= (node.visits + 1) ** 0.5 + 1
+    # Every whole action in the tree is legal, and the search board was restored
+    pos_list = list(board.agent_2_pos)
+    for child, (from_pos, to_pos, arrow_pos) in root.full_children():
+        assert from_pos in pos_list and to_pos in get_valid_moves(board, from_pos)
+        assert arrow_pos in get_valid_arrows(board, to_pos)
+        board.apply_action(from_pos, to_pos, arrow_pos, 2)
+        assert child.hash == board.zobrist
+        board.undo()
+    assert agent._board.zobrist == board.zobrist and not agent._board.history
+    assert root.choose() in [child for child, _ in root.full_children()]
+
+def test_node_pool_mcts():
+    print("=== Test: Node Pool MCTS ===")
+    from benchmark import random_position, all_actions
+    from bitboard import BitBoard
+    from mcts_pool import PooledMCTSAgent, action_counts, nth_action
+    board = random_position(6, 6, seed=4)
+    # Action numbers cover every legal action once
+    bits = BitBoard.from_board(board)
+    counts = action_counts(bits, 1)
+    legal = set(all_actions(board, 1))
+    actions = [nth_action(bits, 1, i, counts) for i in range(sum(counts))]
+    assert len(actions) == len(legal) and set(actions) == legal
+    agent = PooledMCTSAgent(1, time_limit=0.3, capacity=16)
+    pool = agent.search(board)
+    # Every iteration passes through the root and exactly one of its children
+    children = pool.children(0)
+    assert pool.child_count[0] == len(legal) and len(children) == pool.tried[0]
+    assert pool.visits[0] == agent.iterations == pool.visits[children].sum()
+    # Slots are only allocated for tried children, so every node has been visited
+    assert pool.count <= agent.iterations + 1 and (pool.visits[:pool.count] > 0).all()
+    # Children point back at their parent and decode to distinct legal actions
+    assert all(pool.parent[i] < i for i in range(1, pool.count)) and (pool.parent[children] == 0).all()
+    assert len({pool.decode(child) for child in children}) == len(children)
+    assert {pool.decode(child) for child in children} <= legal
+    # A fully tried node's children are laid out in one block of edges
+    full = next(i for i in range(pool.count) if 0 < pool.tried[i] == pool.child_count[i])
+    assert pool.edge_start[full] >= 0 and len(pool.children(full)) == pool.child_count[full]
+    assert agent.get_action(board) in legal
+
+def test_mcts_node_budget():
+    print("=== Test: MCTS Node Budget ===")
+    from benchmark import random_position
+    from MCTS_agent import MCTSAgent, subtree_size
+    from agent import retrieve_agent
+    board = random_position(6, 10, seed=2)
+    for two_stage in (False, True):
+        agent = retrieve_agent("mcts", 1, time_limit=0.5, max_nodes=60, two_stage=two_stage, reuse_tree=False)
+        root = agent.search(board)
+        # Subtrees were collapsed and the tree never outgrew the budget
+        assert agent.memory_stats["collapsed"] > 0
+        assert agent.memory_stats["peak_nodes"] <= 60
+        assert subtree_size(root) == agent.node_count <= 60
+        assert agent._board.zobrist == board.zobrist and not agent._board.history
+    # max_bytes becomes a node budget
+    assert MCTSAgent(1, max_bytes=100 * 3 * 1024).max_nodes == 100
+
+def test_rave_statistics():
+    print("=== Test: RAVE Statistics ===")
+    from benchmark import random_position
+    from MCTS_agent import MCTSAgent
+    board = random_position(6, 4, seed=3)
+    agent = MCTSAgent(1, time_limit=5.0, max_iterations=200, rave=True, playout_depth=2,
+                      seed=0, reuse_tree=False)
+    root = agent.search(board)
+    assert agent.two_stage and agent.iterations == 200
+    # Every iteration credits the root's first (from, to) and arrow exactly once
+    assert sum(n for n, _ in root.amaf.values()) >= 200
+    assert max(n for n, _ in root.amaf.values()) <= 200
+    for key, (n, wins) in list(root.amaf.items()) + list(root.amaf_arrow.items()):
+        assert 0 <= wins <= n
+    # ArrowNodes read the arrow statistics of their QueenNode
+    for arrow_node, _ in root.children:
+        assert arrow_node.amaf is root.amaf_arrow
+    # Playouts are undone with the rest of the path
+    assert agent._board.zobrist == board.zobrist and not agent._board.history
+
+def test_pondering():
+    print("=== Test: Pondering ===")
+    from benchmark import random_position
+    from MCTS_agent import MCTSAgent
+    from iterative_agent import IterativeAgent
+    from ponder import PonderingAgent
+    board = random_position(6, 4, seed=2)
+    # MCTS ponders on its kept tree; observe() then moves the root onto the actual reply
+    agent = MCTSAgent(1, time_limit=0.2, seed=0)
+    action = agent.get_action(board)
+    board.apply_action(*action, 1)
+    assert agent.ponder_step(0.2) and agent.reuse_stats["ponder_iterations"] > 0
+    reply, _ = max(agent._root.children, key=lambda c: c[0].visits)
+    board.apply_action(*reply.action, 2)
+    agent.observe(reply.action, 2)
+    assert agent._root is reply and agent.reuse_stats["last_carried_visits"] > 0
+    agent.get_action(board)
+    assert agent.reuse_stats["hits"] == 1 and reply.parent is None
+    # The iterative agent ponders on its predicted reply and leaves its board intact
+    board = random_position(6, 4, seed=2)
+    agent = IterativeAgent(1, time_limit=0.2, max_depth=2)
+    action = agent.get_action(board)
+    board.apply_action(*action, 1)
+    while agent.ponder_step(0.01):
+        assert agent._ponder_board.zobrist == board.zobrist
+    assert agent._predicted is not None and agent.ponder_stats["depth"] == 2
+    # The process wrapper answers like the agent itself
+    agent = PonderingAgent("mcts", 2, time_limit=0.1)
+    try:
+        action = agent.get_action(board)
+        agent.observe(action, 2)
+        assert action[0] in board.agent_2_pos
+        assert agent.stats()["reuse_stats"]["turns"] == 1
+    finally:
+        agent.close()
+    # An agent error other than ValueError is raised in the parent, and the process lives on
+    agent = PonderingAgent("iterative", 2, time_limit=0.1, max_depth="abc")
+    try:
+        agent.get_action(board)
+        assert False, "expected RuntimeError"
+    except RuntimeError as error:
+        assert "TypeError" in str(error) and agent._process.is_alive()
+    finally:
+        agent.close()
+    # Selected through retrieve_agent ("iterative:ponder=true" in the runner); the
+    # process stops with the game
+    from agent import retrieve_agent, parse_agent_spec
+    from game import Game
+    from random_agent import RandomAgent
+    agent_type, options = parse_agent_spec("iterative:ponder=true,slice_time=0.02")
+    agent = retrieve_agent(agent_type, 1, time_limit=0.05, max_depth=2, **options)
+    assert isinstance(agent, PonderingAgent) and agent._process.is_alive()
+    process = agent._process
+    game = Game(agent, RandomAgent(2), 5)
+    try:
+        game.run(verbose=False)
+    finally:
+        game.close()
+    process.join(timeout=5)
+    assert not process.is_alive() and agent._process is None
+
+def test_perft_and_baseline():
+    print("=== Test: Perft and Baseline ===")
+    from benchmark import random_position, perft, all_actions, compare_to_baseline
+    from bitboard import BitBoard
+    board = random_position(6, 6, seed=1)
+    bits = random_position(6, 6, seed=1, board_cls=BitBoard)
+    assert board.temp_blocks and perft(board, 1, 1) == len(all_actions(board, 1))
+    # Depth 2 is the sum of the opponent's replies; both backends agree and boards are restored
+    expected = 0
+    for action in all_actions(board, 1):
+        board.apply_action(*action, 1)
+        expected += len(all_actions(board, 2))
+        board.undo()
+    assert perft(board, 1, 2) == perft(bits, 1, 2) == expected
+    assert not board.history and not bits.history
+    baseline = {"perft": {"p": {"digest": "a", "counts": [10, 90]}}, "throughput": {"t": 100.0, "u": 100.0}}
+    results = {"perft": {"p": {"digest": "a", "counts": [10, 91]}}, "throughput": {"t": 71.0, "u": 69.0}}
+    problems = compare_to_baseline(results, baseline, tolerance=0.3)
+    assert len(problems) == 2 and problems[0].startswith("perft p") and "throughput u" in problems[1]
+
+def test_search_telemetry():
+    print("=== Test: Search Telemetry ===")
+    import random
+    from game import Game
+    from agent import retrieve_agent
+    from telemetry import aggregate, percentile
+    random.seed(0)
+    game = Game(retrieve_agent("iterative", 1, time_limit=0.1, max_depth=2),
+                retrieve_agent("mcts", 2, time_limit=0.1), size=6)
+    game.run(verbose=False)
+    assert len(game.ply_stats) == game.plies
+    first, second = game.ply_stats[0], game.ply_stats[1]
+    assert first["agent"] == "IterativeAgent" and first["nodes"] > 0 and first["depth"] >= 1
+    assert second["agent"] == "MCTSAgent" and second["evals"] == second["iterations"] > 0
+    for ply in game.ply_stats:
+        phases = sum(value for name, value in ply.items() if name.startswith("time_") and name not in ("time_total", "time_move"))
+        assert phases <= ply["time_total"] <= ply["time_move"]
+    assert percentile([5, 1, 4, 2, 3], 50) == 3 and percentile([5, 1, 4, 2, 3], 100) == 5
+    # Even counts: the rank q * n / 100 is exact, not rounded up
+    assert percentile([2, 1], 50) == 1 and percentile([1, 2, 3, 4, 5, 6], 50) == 3
+    assert percentile(list(range(1, 11)), 70) == 7 and percentile([1, 2], 0) == 1 and percentile([1, 2], 51) == 2
+    summary = aggregate([{**ply, "agent": str(ply["agent_id"]), "size": 6} for ply in game.ply_stats])
+    assert summary[("2", 6)]["iterations"]["count"] == sum(1 for ply in game.ply_stats if ply["agent_id"] == 2)
+
+def test_opening_book():
+    print("=== Test: Opening Book ===")
+    import os
+    import tempfile
+    from opening_book import canonical_key, transform_action, build_book, open_book, start_positions, BookAgent
+    from random_agent import RandomAgent
+    from benchmark import all_actions
+    # Playing the same game in each of the 8 symmetric frames gives one canonical key
+    base = [(0, 1), (2, 0), (5, 3), (4, 5)]
+    line = [((0, 1), (3, 1), (3, 3)), ((5, 3), (2, 3), (2, 5)), ((3, 1), (1, 1), (1, 4))]
+    keys = set()
+    for t in range(8):
+        board = Board(size=6)
+        board.amazon_place(list(transform_action(base[:2], t, 6)), agent_id=1)
+        board.amazon_place(list(transform_action(base[2:], t, 6)), agent_id=2)
+        for ply, action in enumerate(line):
+            board.apply_action(*transform_action(action, t, 6), 1 + ply % 2)
+        keys.add(canonical_key(board, 2)[0])
+    assert len(keys) == 1 and canonical_key(board, 1)[0] not in keys
+    # Build a tiny book and read it back through the memory-mapped file
+    path = os.path.join(tempfile.mkdtemp(), "book.bin")
+    count = build_book(path, size=6, starts=2, plies=2, time_limit=0.2, max_depth=1)
+    book = open_book(path)
+    assert len(book) == count > 0
+    starts = start_positions(6, 2)
+    for board in starts:
+        action = book.lookup(board, 1)
+        assert action in all_actions(board, 1)
+        # The same start seen in a rotated frame gets the rotated move
+        rotated = Board(size=6)
+        rotated.amazon_place(list(transform_action(board.agent_1_pos, 1, 6)), agent_id=1)
+        rotated.amazon_place(list(transform_action(board.agent_2_pos, 1, 6)), agent_id=2)
+        assert book.lookup(rotated, 1) == transform_action(action, 1, 6)
+    agent = BookAgent(RandomAgent(1), book)
+    assert agent.get_action(starts[0]) == book.lookup(starts[0], 1) and agent.search_stats["book"] == 1
+    assert Board(size=8).size != book.size and book.lookup(Board(size=8), 1) is None
+    # Books keyed with older Zobrist tables are refused rather than silently missed
+    import numpy as np
+    from opening_book import HEADER, OpeningBook
+    old = os.path.join(tempfile.mkdtemp(), "old.bin")
+    np.array([(b"AMZBOOK1", 6, 0)], dtype=HEADER).tofile(old)
+    try:
+        OpeningBook(old)
+        assert False, "expected ValueError"
+    except ValueError as error:
+        assert "rebuild" in str(error)
+
+def test_endgame_solver():
+    print("=== Test: Endgame Solver ===")
+    from game import Game
+    from random_agent import RandomAgent
+    from endgame import partition, solve_endgame, EndgameAgent
+    from transposition import is_legal
+    board = Board(size=5)
+    board.amazon_place([(0, 0)], agent_id=1)
+    board.amazon_place([(4, 4)], agent_id=2)
+    assert partition(board) is None and solve_endgame(board, 1) is None
+    # A wall of arrows on row 1 leaves player 1 the top row and player 2 the rest
+    for y in range(5):
+        board.arrow_place((0, y), (1, y), 1)
+    regions = partition(board)
+    assert sorted((owner, len(squares)) for owner, squares in regions) == [(1, 5), (2, 15)]
+    result = solve_endgame(board, 1)
+    low, high = result["bounds"][1]
+    assert result["exact"] and low == high and result["winner"] == 2
+    # Player 1 alone in its region makes exactly the solved number of moves
+    moves = 0
+    while True:
+        result = solve_endgame(board, 1)
+        if result["move"] is None:
+            break
+        assert is_legal(board, result["move"], 1) and result["bounds"][1] == (low - moves, low - moves)
+        board.move(result["move"][0], result["move"][1], 1)
+        board.arrow_place(result["move"][1], result["move"][2], 1)
+        board.update_temp_blocks()
+        board.update_temp_blocks()    # The opponent's turn
+        moves += 1
+    assert moves == low > 0
+    game = Game(EndgameAgent(RandomAgent(1)), EndgameAgent(RandomAgent(2)), size=5)
+    game.board = board
+    assert game.run(verbose=False, return_winner=True, resolve_endgame=True) == 2 and game.resolved and game.plies == 0
+
+def test_incremental_mobility():
+    print("=== Test: Incremental Mobility ===")
+    import random
+    from game import Game
+    from benchmark import all_actions
+    def check(board):
+        for pos in board.agent_1_pos + board.agent_2_pos:
+            assert board.amazon_mobility(pos) == len(get_valid_moves(board, pos))
+        assert sorted(board.mobility_at) == sorted(board.agent_1_pos + board.agent_2_pos)
+    rng = random.Random(3)
+    for seed in range(6):
+        random.seed(seed)
+        board = Game(None, None, 6 + seed % 3).board
+        check(board)
+        agent_id = 1
+        while True:
+            actions = all_actions(board, agent_id)
+            if not actions:
+                break
+            action = rng.choice(actions)
+            # Counters follow apply_action / undo as well as the step-by-step game API
+            board.apply_action(*action, agent_id)
+            check(board)
+            board.undo()
+            check(board)
+            board.move(action[0], action[1], agent_id)
+            board.arrow_place(action[1], action[2], agent_id)
+            board.update_temp_blocks()
+            check(board)
+            check(board.clone())
+            agent_id = 3 - agent_id
+        pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+        assert board.total_mobility(agent_id) == sum(len(get_valid_moves(board, pos)) for pos in pos_list)
+
+def test_match_server():
+    print("=== Test: Match Server ===")
+    import random
+    from server import run_load_test, parse_option
+    state = random.getstate()
+    metrics = run_load_test(games=6, concurrency=3, workers=2, size=5)
+    assert random.getstate() == state     # Seeded start positions leave the global generator alone
+    records = metrics["records"]
+    assert metrics["games"] == len(records) == 6 and sorted(r["seed"] for r in records) == list(range(6))
+    assert all(r["reason"] == "no_moves" for r in records) and metrics["timeouts"] == 0
+    assert metrics["moves"] == metrics["move_latency"]["count"] == sum(r["plies"] + 1 for r in records)
+    # A search that overruns its deadline forfeits, and its worker is replaced
+    metrics = run_load_test(games=2, concurrency=2, workers=1, agent1="heuristic", size=5,
+                            time_limit=1.0, move_timeout=0.05)
+    assert [r["reason"] for r in metrics["records"]] == ["timeout"] * 2 and metrics["workers_replaced"] == 2
+    assert all(r["winner"] == 2 and r["plies"] == 0 for r in metrics["records"])
+    assert parse_option("time_limit=0.5") == ("time_limit", 0.5) and parse_option("x=abc") == ("x", "abc")
+    # An agent that raises something other than ValueError loses with an error, not a timeout
+    metrics = run_load_test(games=1, concurrency=1, workers=1, agent1="heuristic:max_depth=abc", size=5)
+    record = metrics["records"][0]
+    assert record["reason"] == "error" and "TypeError" in record["detail"] and metrics["timeouts"] == 0
+    # A worker that dies fails its call at once and is replaced
+    import asyncio, time
+    from server import WorkerPool
+
+    async def crash():
+        pool = WorkerPool(1)
+        pool.start()
+        start = time.perf_counter()
+        try:
+            await pool.call(("move",), 30.0)
+            assert False, "expected EOFError"
+        except EOFError:
+            pass
+        elapsed = time.perf_counter() - start
+        replaced = pool.replaced
+        pool.close()
+        return elapsed, replaced
+
+    elapsed, replaced = asyncio.run(crash())
+    assert elapsed < 5.0 and replaced == 1
+
+def test_tournament():
+    print("=== Test: SPRT Tournament ===")
+    from tournament import sprt_bounds, sprt_llr, elo_interval, fit_ratings, run_tournament
+    from agent import parse_agent_spec
+    import math
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert abs(lower + upper) < 1e-12 and abs(upper - math.log(19)) < 1e-12
+    assert sprt_llr(0, 0, -50, 50) == 0 and sprt_llr(10, 0, -50, 50) > 0 > sprt_llr(0, 10, -50, 50)
+    elo, low, high = elo_interval(30, 10)
+    assert low < elo < high and elo > 0
+    ratings = fit_ratings(["a", "b", "c"], {("a", "b"): [8, 2], ("b", "c"): [8, 2], ("a", "c"): [9, 1]})
+    assert ratings["a"][0] > ratings["b"][0] > ratings["c"][0] and abs(sum(r[0] for r in ratings.values())) < 1e-6
+    assert parse_agent_spec("mcts:rave=true,time_limit=0.5") == ("mcts", {"rave": True, "time_limit": 0.5})
+    # A lopsided pairing is decided well before the game cap
+    result = run_tournament(["heuristic", "random"], size=5, games_per_pairing=40, elo0=0, elo1=200,
+                            alpha=0.1, beta=0.1, verbose=False, max_depth=1)
+    pairing = result["pairings"][0]
+    assert pairing["status"] == "first" and result["games"] == pairing["wins"] + pairing["losses"] < 40
+    assert pairing["llr"] == sprt_llr(pairing["wins"], pairing["losses"], 0, 200) >= math.log(9)
+    assert result["ratings"]["heuristic"][0] > 0 > result["ratings"]["random"][0]
+    # Games can also be played out to the last move
+    result = run_tournament(["random", "random:seed=1"], size=5, games_per_pairing=4, resolve_endgame=False, verbose=False)
+    assert result["games"] == 4
+
+def test_game_records():
+    print("=== Test: Game Records ===")
+    import os, tempfile
+    from game import Game
+    from random_agent import RandomAgent
+    from records import RecordWriter, load_records, validate, validate_game
+    path = os.path.join(tempfile.mkdtemp(), "games.bin")
+    played = []
+    for seed in range(4):
+        writer = RecordWriter(path)     # Reopened each time: games are appended
+        game = Game(RandomAgent(1), RandomAgent(2), 6, seed=seed)
+        start = (list(game.board.agent_1_pos), list(game.board.agent_2_pos))
+        winner = game.run(verbose=False, return_winner=True, recorder=writer)
+        writer.close()
+        played.append((start, winner, game.plies))
+    # A game cut off mid-write is left open and skipped by the loader
+    writer = RecordWriter(path)
+    writer.begin(Game(None, None, 6, seed=9).board, 9)
+    writer.move(((0, 0), (0, 1), (0, 2)))
+    writer.close()
+    archive = load_records(path)
+    assert len(archive) == 4 and list(archive.seeds) == [0, 1, 2, 3] and validate(archive) == []
+    assert list(archive.plies) == [plies for _, _, plies in played] == list(archive.ply_index()[archive.offsets[1:] - 1] + 1)
+    for i, (start, winner, plies) in enumerate(played):
+        size, positions, actions = archive.game(i)
+        assert size == 6 and positions == [start[0], start[1]] and len(actions) == plies
+        assert archive.winners[i] == winner
+    # Reopening cuts the open game off, so games appended after it still load
+    for seed in range(4, 7):
+        writer = RecordWriter(path)
+        Game(RandomAgent(1), RandomAgent(2), 6, seed=seed).run(verbose=False, recorder=writer)
+        writer.close()
+    appended = load_records(path)
+    assert len(appended) == 7 and list(appended.seeds) == list(range(7)) and validate(appended) == []
+    # Same seed, same start position
+    assert Game(None, None, 6, seed=2).board.agent_1_pos == played[2][0][0]
+    # A corrupted move is caught on replay
+    archive.moves[archive.offsets[1] + 1] = archive.moves[archive.offsets[1]]
+    assert validate_game(archive, 1)[0] == 1 and validate_game(archive, 0) is None
+    # A record written with an arrow shot onto the destination square is reported
+    bad_path = os.path.join(os.path.dirname(path), "bad.bin")
+    writer = RecordWriter(bad_path)
+    game = Game(None, None, 6, seed=0)
+    from_pos = game.board.agent_1_pos[0]
+    to_pos = next(pos for pos in get_valid_moves(game.board, from_pos))
+    writer.begin(game.board, 0)
+    writer.move((from_pos, to_pos, to_pos))
+    writer.end(1)
+    writer.close()
+    assert validate(load_records(bad_path)) == [(0, 0, f"illegal move {(from_pos, to_pos, to_pos)} by player 1")]
+
+def test_weight_tuning():
+    print("=== Test: Weight Tuning ===")
+    import os, tempfile
+    import numpy as np
+    from agent import retrieve_agent
+    from evaluation import evaluate
+    from records import load_records, replay
+    from tuning import generate_games, extract_positions, fit_weights, log_loss, tune
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "selfplay.bin")
+    # Leftovers from another run next to the archive are not merged in
+    with open(path + ".123", "wb") as f:
+        f.write(b"stale")
+    plies = generate_games(path, 20, agent="random", size=6, seed=1)
+    archive = load_records(path)
+    assert len(archive) == 20 and len(archive.moves) == plies
+    assert sorted(os.listdir(folder)) == ["selfplay.bin", "selfplay.bin.123"]
+    # Games are stored in task order, so the pool size does not change the archive
+    pooled = os.path.join(folder, "pooled.bin")
+    generate_games(pooled, 20, agent="random", size=6, seed=1, workers=2)
+    with open(path, "rb") as f, open(pooled, "rb") as g:
+        assert f.read() == g.read()
+    x, y, games = extract_positions(path, skip=2)
+    assert x.shape == (plies - 2 * 20, 3) and set(np.unique(y)) <= {0.0, 1.0}
+    assert list(np.bincount(games, minlength=20)) == [max(n - 2, 0) for n in archive.plies]
+    # Row 0 is game 0 after ply 2, seen by player 1, scored as the agent scores it
+    _, start, actions = archive.game(0)
+    board = replay(6, start)
+    for ply, action in enumerate(actions[:3]):
+        board.apply_action(*action, 1 if ply % 2 == 0 else 2)
+    features = evaluate(board, 1)
+    agent = retrieve_agent("heuristic", 1, weight_mobility=1.0, weight_territory=2.0, weight_centrality=3.0)
+    assert abs(agent.board_eval(board) - x[0] @ [1.0, 2.0, 3.0]) < 1e-9
+    assert (x[0, 0], x[0, 1]) == (features["mobility"], features["territory"])
+    # Newton steps recover the weights of a synthetic logistic model
+    rng = np.random.default_rng(0)
+    synthetic = rng.normal(size=(20000, 3))
+    truth = np.array([0.5, -1.0, 2.0])
+    labels = (rng.random(20000) < 1 / (1 + np.exp(-synthetic @ truth))).astype(float)
+    fitted = fit_weights(synthetic, labels, np.zeros(3), 1.0, l2=0)
+    assert np.abs(fitted - truth).max() < 0.1
+    assert log_loss(synthetic, labels, fitted, 1.0) < log_loss(synthetic, labels, np.zeros(3), 1.0)
+    # The fitted weights reach the agent through a params file
+    params = os.path.join(folder, "params.json")
+    report = tune(path, params, skip=2, verbose=False)
+    assert report["loss_after"] <= report["loss_before"]
+    agent = retrieve_agent("heuristic", 1, params=params, weight_centrality=0.5)
+    assert agent.weight_mobility == report["params"]["weight_mobility"] and agent.weight_centrality == 0.5
+    # Whole games are held out
+    report = tune(path, skip=2, holdout=0.5, verbose=False)
+    assert 0 < report["holdout_games"] < 20 and report["holdout_after"] is not None
+
 if __name__ == "__main__":
     test_board_display()
     test_basic_move_and_arrow()
     test_temp_block()
+    test_temp_block_schedule()
+    test_bitboard_matches_board()
+    test_apply_action_undo()
+    test_runner_worker_independence()
+    test_zobrist_transpositions()
+    test_hash_move_legality()
+    test_iterative_timeout()
+    test_has_any_legal_move()
+    test_vectorized_evaluation()
+    test_batched_root_evaluation()
+    test_move_ordering()
+    test_root_parallel_mcts()
+    test_mcts_tree_reuse()
+    test_two_stage_mcts()
+    test_node_pool_mcts()
+    test_mcts_node_budget()
+    test_rave_statistics()
+    test_pondering()
+    test_perft_and_baseline()
+    test_search_telemetry()
+    test_opening_book()
+    test_endgame_solver()
+    test_incremental_mobility()
+    test_match_server()
+    test_tournament()
+    test_game_records()
+    test_weight_tuning()
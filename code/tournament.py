@@ -0,0 +1,179 @@
+import argparse
+import concurrent.futures
+import itertools
+import math
+from typing import Dict, List, Optional, Tuple
+from agent import AGENT_TYPES
+from runner import game_seed, play_game
+
+# Round-robin tournament with early stopping. Every pairing of entrants (agent types or
+# "type:key=value,..." variants) is a sequential probability ratio test between
+# H0: the first entrant is elo0 stronger and H1: it is elo1 stronger (Amazons has no
+# draws, so each game is a win or a loss). A pairing stops once its log-likelihood ratio
+# leaves (lower, upper), or after games_per_pairing games. New games always go to the undecided
+# pairing with the fewest games so far, so the workers stay on open questions. The
+# log-likelihood ratios and the ratings of all entrants are brought up to date after
+# every finished game.
+
+ELO_SCALE = 400 / math.log(10)
+
+def win_probability(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    # alpha: chance of accepting H1 when H0 holds, beta: the reverse
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def sprt_llr(wins: int, losses: int, elo0: float, elo1: float) -> float:
+    p0, p1 = win_probability(elo0), win_probability(elo1)
+    return wins * math.log(p1 / p0) + losses * math.log((1 - p1) / (1 - p0))
+
+def elo_interval(wins: int, losses: int, z: float = 1.96) -> Tuple[float, float, float]:
+    # Elo difference from the score, with a normal-approximation interval on the score.
+    # Scores of 0 or 1 are pulled half a game in so that the estimate stays finite.
+    games = wins + losses
+    clamp = lambda p: min(max(p, 0.5 / games), 1 - 0.5 / games)
+    elo = lambda p: -400 * math.log10(1 / clamp(p) - 1)
+    score = wins / games
+    margin = z * math.sqrt(max(score * (1 - score), 0.25 / games) / games)
+    return elo(score), elo(score - margin), elo(score + margin)
+
+def fit_ratings(names: List[str], results: Dict[Tuple[str, str], List[int]],
+                iterations: int = 200) -> Dict[str, Tuple[float, float]]:
+    # Bradley-Terry ratings by minorization-maximization, centred on 0, with standard
+    # errors from the Fisher information. results[(a, b)] = [wins of a, wins of b].
+    # Half a virtual win each way keeps unbeaten or winless entrants finite.
+    wins = {name: 0.5 * (len(names) - 1) for name in names}
+    games = {name: {} for name in names}
+    for (a, b), (a_wins, b_wins) in results.items():
+        wins[a] += a_wins
+        wins[b] += b_wins
+        games[a][b] = games[b][a] = a_wins + b_wins + 1
+    for name in names:
+        for other in names:
+            if other != name:
+                games[name].setdefault(other, 1)
+    strength = {name: 1.0 for name in names}
+    for _ in range(iterations):
+        strength = {name: wins[name] / sum(n / (strength[name] + strength[other]) for other, n in games[name].items())
+                    for name in names}
+        mean = sum(math.log(s) for s in strength.values()) / len(names)
+        strength = {name: s / math.exp(mean) for name, s in strength.items()}
+    ratings = {}
+    for name in names:
+        information = sum(n * strength[name] * strength[other] / (strength[name] + strength[other]) ** 2
+                          for other, n in games[name].items())
+        ratings[name] = (ELO_SCALE * math.log(strength[name]), ELO_SCALE / math.sqrt(information))
+    return ratings
+
+class Pairing:
+    def __init__(self, first: str, second: str):
+        self.first = first
+        self.second = second
+        self.wins = 0       # Of first
+        self.losses = 0
+        self.running = 0
+        self.llr = 0.0
+        self.status = "running"     # Then "first" / "second" (stronger), or "undecided" at the game cap
+
+    def games(self) -> int:
+        return self.wins + self.losses
+
+def run_tournament(entrants: List[str], size: int = 6, games_per_pairing: int = 200, workers: int = 1,
+                   seed: int = 0, alpha: float = 0.05, beta: float = 0.05, elo0: float = -50.0,
+                   elo1: float = 50.0, resolve_endgame: bool = True, verbose: bool = True, **agent_kwargs) -> Dict:
+    # agent_kwargs (time_limit, max_depth, ...) apply to every entrant; an entrant's own
+    # options take precedence. resolve_endgame ends games once the winner is known, as in
+    # runner.run_battle. Returns the pairings, the ratings and the game count.
+    lower, upper = sprt_bounds(alpha, beta)
+    pairings = [Pairing(a, b) for a, b in itertools.combinations(entrants, 2)]
+    index = itertools.count()
+    played = 0
+    ratings = fit_ratings(entrants, {})
+
+    def next_task() -> Optional[Tuple[Pairing, tuple]]:
+        open_pairings = [p for p in pairings if p.status == "running" and p.games() + p.running < games_per_pairing]
+        if not open_pairings:
+            return None
+        pairing = min(open_pairings, key=lambda p: p.games() + p.running)
+        pairing.running += 1
+        i = next(index)
+        return pairing, (i, game_seed(seed, i), pairing.first, pairing.second, size, resolve_endgame, agent_kwargs)
+
+    def record(pairing: Pairing, result: Dict):
+        nonlocal played, ratings
+        played += 1
+        pairing.running -= 1
+        if result["agent1_won"]:
+            pairing.wins += 1
+        else:
+            pairing.losses += 1
+        pairing.llr = sprt_llr(pairing.wins, pairing.losses, elo0, elo1)
+        ratings = fit_ratings(entrants, {(p.first, p.second): [p.wins, p.losses] for p in pairings})
+        if pairing.status != "running":
+            return
+        if pairing.llr >= upper:
+            pairing.status = "first"
+        elif pairing.llr <= lower:
+            pairing.status = "second"
+        elif pairing.games() >= games_per_pairing:
+            pairing.status = "undecided"
+        if verbose and pairing.status != "running":
+            elo, low, high = elo_interval(pairing.wins, pairing.losses)
+            print(f"{pairing.first} vs {pairing.second}: {pairing.wins}-{pairing.losses} after {pairing.games()} games, "
+                  f"{pairing.status}, Elo {elo:+.0f} [{low:+.0f}, {high:+.0f}], ratings "
+                  f"{ratings[pairing.first][0]:+.0f} / {ratings[pairing.second][0]:+.0f}")
+
+    if workers == 1:
+        while True:
+            task = next_task()
+            if task is None:
+                break
+            record(task[0], play_game(task[1]))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            running = {}
+            while True:
+                while len(running) < workers:
+                    task = next_task()
+                    if task is None:
+                        break
+                    running[pool.submit(play_game, task[1])] = task[0]
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    record(running.pop(future), future.result())
+
+    if verbose:
+        print(f"\n{played} games ({games_per_pairing * len(pairings)} with fixed-length matches)")
+        for name, (elo, error) in sorted(ratings.items(), key=lambda item: -item[1][0]):
+            print(f"{name:>30} {elo:+7.0f} +/- {1.96 * error:.0f}")
+    return {
+        "games": played,
+        "pairings": [{"first": p.first, "second": p.second, "wins": p.wins, "losses": p.losses, "status": p.status,
+                      "llr": p.llr} for p in pairings],
+        "ratings": ratings,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round-robin tournament with SPRT early stopping.")
+    parser.add_argument("entrants", nargs="*", default=list(AGENT_TYPES),
+                        help='agent types or variants such as "mcts:rave=true" (default: every agent type)')
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--games", type=int, default=200, help="most games per pairing")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--elo0", type=float, default=-50.0)
+    parser.add_argument("--elo1", type=float, default=50.0)
+    parser.add_argument("--time-limit", type=float, default=0.5)
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--no-resolve-endgame", dest="resolve_endgame", action="store_false",
+                        help="play games out instead of ending them once the winner is known")
+    args = parser.parse_args()
+    run_tournament(args.entrants, size=args.size, games_per_pairing=args.games, workers=args.workers, seed=args.seed,
+                   alpha=args.alpha, beta=args.beta, elo0=args.elo0, elo1=args.elo1,
+                   resolve_endgame=args.resolve_endgame,
+                   time_limit=args.time_limit, max_depth=args.max_depth)
@@ -0,0 +1,72 @@
+from typing import Optional, Tuple
+from board import Board
+from rules import iter_actions
+
+# Bound types stored with each score
+EXACT = 0
+LOWER = 1   # Fail-high: the true score is >= the stored score
+UPPER = 2   # Fail-low: the true score is <= the stored score
+
+Action = Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]
+
+def position_key(board: Board, agent_id: int) -> int:
+    # Board.zobrist does not know whose turn it is, so fold the side to move in
+    return board.zobrist ^ board.keys.side[agent_id]
+
+class TranspositionTable:
+    # Fixed number of slots indexed by key; a slot keeps the deeper search when
+    # two positions collide (depth-preferred replacement).
+    def __init__(self, size: int = 1 << 18):
+        self.size = size
+        self.slots = [None] * size
+        self.hits = 0
+        self.probes = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, int, Optional[Action]]]:
+        # Returns (key, depth, score, flag, best_move) or None
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, flag: int, best_move: Optional[Action]):
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is not None and entry[1] > depth:
+            return
+        self.slots[index] = (key, depth, score, flag, best_move)
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.hits = 0
+        self.probes = 0
+
+def bound_flag(score: float, alpha: float, beta: float) -> int:
+    # Classify a search result against the window it was searched with
+    if score <= alpha:
+        return UPPER
+    if score >= beta:
+        return LOWER
+    return EXACT
+
+def is_legal(board: Board, action: Action, agent_id: int) -> bool:
+    # Cheap legality check for a hash move before trusting it (guards against key collisions)
+    from_pos, to_pos, arrow_pos = action
+    pos_list = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+    if from_pos not in pos_list or to_pos == from_pos or arrow_pos == to_pos:
+        return False
+    # The mover still stands on from_pos, so it blocks the arrow exactly like the temp block would
+    return board.valid_path(*from_pos, *to_pos) and board.valid_path(*to_pos, *arrow_pos)
+
+def hash_move_first(board: Board, agent_id: int, hash_move: Optional[Action]):
+    # Yields every action of agent_id, starting with the hash move when it is legal.
+    # Generated lazily, so the board may be changed and restored between yields.
+    if hash_move is not None and is_legal(board, hash_move, agent_id):
+        yield hash_move
+    else:
+        hash_move = None
+    for action in iter_actions(board, agent_id):
+        if action != hash_move:
+            yield action
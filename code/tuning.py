@@ -0,0 +1,206 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+from agent import retrieve_agent, parse_agent_spec
+from evaluation import geometry, player_arrays, features_from_arrays
+from game import Game
+from records import MAGIC, RecordWriter, load_records, replay
+from runner import game_seed
+
+# Texel-style tuning of HeuristicAgent's evaluation weights. Self-play games are
+# recorded (records.py), every position after the opening is labelled with the final
+# result, and the features the agent scores (mobility and territory differentials, own
+# centrality) are computed for the whole dataset in vectorized batches. The weights are
+# then fitted so that sigmoid(scale * eval) predicts the result: the scale is fixed
+# first with the current weights, which keeps the fitted weights on the same scale,
+# then the weights come from Newton steps on the log loss.
+
+FEATURES = ("mobility", "territory", "centrality")
+WEIGHTS = {"weight_mobility": 0.4, "weight_territory": 0.4, "weight_centrality": 0.2}
+
+def _play_recorded(task: tuple) -> int:
+    # One self-play game recorded into its own shard file
+    path, seed, spec, size = task
+    agent_type, kwargs = parse_agent_spec(spec)
+    random.seed(seed)       # For agents that use `random`, as in runner.play_game
+    writer = RecordWriter(path)
+    try:
+        game = Game(retrieve_agent(agent_type, 1, **kwargs), retrieve_agent(agent_type, 2, **kwargs), size, seed=seed)
+        try:
+            game.run(verbose=False, recorder=writer)
+        finally:
+            game.close()
+    finally:
+        writer.close()
+    return game.plies
+
+def generate_games(path: str, games: int, agent: str = "heuristic:max_depth=1,time_limit=0.2", size: int = 10,
+                   seed: int = 0, workers: int = 1) -> int:
+    # Plays `games` self-play games of `agent` (a spec as in runner) from seeded start
+    # positions into a new archive at path, in game order whatever the pool size.
+    # Returns the number of plies recorded.
+    shards = tempfile.mkdtemp(prefix="selfplay_")
+    try:
+        tasks = [(os.path.join(shards, f"{i}.bin"), game_seed(seed, i), agent, size) for i in range(games)]
+        if workers == 1:
+            plies = sum(map(_play_recorded, tasks))
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                plies = sum(pool.imap_unordered(_play_recorded, tasks))
+        # Merge the shards in task order: everything after the magic string is one game
+        with open(path, "wb") as out:
+            out.write(MAGIC)
+            for shard, _, _, _ in tasks:
+                with open(shard, "rb") as f:
+                    f.seek(len(MAGIC))
+                    out.write(f.read())
+    finally:
+        shutil.rmtree(shards, ignore_errors=True)
+    return plies
+
+def extract_positions(path: str, skip: int = 4, chunk: int = 512) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (features (N, 3), results (N,), games (N,)) for the position after every ply past the first
+    # `skip` of every game, seen by the player who just moved (as the agent scores its
+    # own moves); the result is 1 if that player won. Games are replayed on a Board and
+    # the board masks are scored in stacked chunks of positions of one size.
+    archive = load_records(path)
+    features, results, games = [], [], []
+    for size in np.unique(archive.sizes):
+        geo = geometry(int(size))
+        center = int(size) // 2
+        empties, mine, theirs, centrality, labels, indices = [], [], [], [], [], []
+
+        def flush():
+            if not empties:
+                return
+            diff = features_from_arrays(np.stack(empties), np.stack(mine), np.stack(theirs), geo)
+            features.append(np.column_stack([diff["mobility"], diff["territory"], centrality]).astype(np.float64))
+            results.append(np.array(labels, dtype=np.float64))
+            games.append(np.array(indices, dtype=np.int64))
+            for batch in (empties, mine, theirs, centrality, labels, indices):
+                batch.clear()
+
+        for i in np.flatnonzero(archive.sizes == size):
+            _, start, actions = archive.game(int(i))
+            board = replay(int(size), start)
+            winner = int(archive.winners[i])
+            for ply, action in enumerate(actions):
+                agent_id = 1 if ply % 2 == 0 else 2
+                board.apply_action(*action, agent_id)
+                if ply < skip:
+                    continue
+                empty, my_seeds, opp_seeds = player_arrays(board, agent_id, geo)
+                empties.append(empty)
+                mine.append(my_seeds)
+                theirs.append(opp_seeds)
+                my_pos = board.agent_1_pos if agent_id == 1 else board.agent_2_pos
+                centrality.append(-sum(abs(x - center) + abs(y - center) for x, y in my_pos))
+                labels.append(1.0 if winner == agent_id else 0.0)
+                indices.append(int(i))
+                if len(labels) == chunk:
+                    flush()
+            board.history.clear()
+        flush()
+    if not features:
+        return np.zeros((0, len(FEATURES))), np.zeros(0), np.zeros(0, dtype=np.int64)
+    return np.concatenate(features), np.concatenate(results), np.concatenate(games)
+
+def log_loss(x: np.ndarray, y: np.ndarray, weights: np.ndarray, scale: float) -> float:
+    z = scale * (x @ weights)
+    # log(1 + e^z) - y z, computed stably
+    return float(np.mean(np.logaddexp(0, z) - y * z))
+
+def fit_scale(x: np.ndarray, y: np.ndarray, weights: np.ndarray) -> float:
+    # Scale of the sigmoid that best fits the current weights, by a log-spaced grid
+    # search refined around its best point
+    scales = np.logspace(-4, 1, 51)
+    for _ in range(3):
+        losses = [log_loss(x, y, weights, s) for s in scales]
+        best = int(np.argmin(losses))
+        low, high = scales[max(best - 1, 0)], scales[min(best + 1, len(scales) - 1)]
+        scales = np.linspace(low, high, 21)
+    return float(scales[int(np.argmin([log_loss(x, y, weights, s) for s in scales]))])
+
+def fit_weights(x: np.ndarray, y: np.ndarray, weights: np.ndarray, scale: float, l2: float = 1e-4,
+                iterations: int = 50, tol: float = 1e-10) -> np.ndarray:
+    # Newton steps on the mean log loss plus l2 * |w|^2 / 2, which is convex in w
+    w = weights.astype(np.float64).copy()
+    xs = scale * x
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(xs @ w)))
+        gradient = xs.T @ (p - y) / len(y) + l2 * w
+        hessian = (xs * (p * (1 - p))[:, None]).T @ xs / len(y) + l2 * np.eye(len(w))
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if float(step @ step) < tol:
+            break
+    return w
+
+def tune(path: str, out: Optional[str] = None, weights: Optional[Dict[str, float]] = None, skip: int = 4,
+         holdout: float = 0.1, seed: int = 0, verbose: bool = True) -> Dict:
+    # Fits the weights on the positions of a record archive, writing them as JSON to
+    # `out` for retrieve_agent(..., params=out). The positions of a held-out share of the
+    # games, picked at random, are only used to report the loss; whole games are held
+    # out, as positions of one game are strongly correlated.
+    start = time.perf_counter()
+    x, y, games = extract_positions(path, skip)
+    if not len(y):
+        raise ValueError(f"No positions in {path}")
+    extracted = time.perf_counter()
+    initial = np.array([(weights or WEIGHTS)[name] for name in WEIGHTS], dtype=np.float64)
+    held_out = np.random.default_rng(seed).random(int(games.max()) + 1) < holdout
+    test = held_out[games]
+    train = ~test if test.any() and not test.all() else np.ones(len(y), dtype=bool)
+    scale = fit_scale(x[train], y[train], initial)
+    fitted = fit_weights(x[train], y[train], initial, scale)
+    params = {name: float(value) for name, value in zip(WEIGHTS, fitted)}
+    report = {
+        "positions": len(y),
+        "holdout_games": int(held_out[np.unique(games)].sum()),
+        "scale": scale,
+        "loss_before": log_loss(x[train], y[train], initial, scale),
+        "loss_after": log_loss(x[train], y[train], fitted, scale),
+        "holdout_before": log_loss(x[test], y[test], initial, scale) if test.any() else None,
+        "holdout_after": log_loss(x[test], y[test], fitted, scale) if test.any() else None,
+        "time_extract": extracted - start,
+        "time_fit": time.perf_counter() - extracted,
+        "params": params,
+    }
+    if out:
+        with open(out, "w") as f:
+            json.dump(params, f, indent=2)
+    if verbose:
+        print(f"{len(y)} positions, features in {report['time_extract']:.1f}s, fit in {report['time_fit']:.2f}s")
+        print(f"Log loss {report['loss_before']:.4f} -> {report['loss_after']:.4f} (train)", end="")
+        if test.any():
+            print(f", {report['holdout_before']:.4f} -> {report['holdout_after']:.4f} (held out)")
+        else:
+            print()
+        for name, value in params.items():
+            print(f"{name}: {(weights or WEIGHTS)[name]:.4f} -> {value:.4f}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune HeuristicAgent's evaluation weights on self-play records.")
+    parser.add_argument("records", help="record archive; generated first if --games is given")
+    parser.add_argument("--games", type=int, default=0, help="self-play games to record before tuning")
+    parser.add_argument("--agent", default="heuristic:max_depth=1,time_limit=0.2", help="self-play agent spec")
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", type=int, default=4, help="opening plies left out of the dataset")
+    parser.add_argument("--out", default="heuristic_params.json")
+    args = parser.parse_args()
+    if args.games:
+        start = time.perf_counter()
+        plies = generate_games(args.records, args.games, args.agent, args.size, args.seed, args.workers)
+        print(f"Recorded {args.games} games ({plies} plies) in {time.perf_counter() - start:.1f}s")
+    tune(args.records, args.out, skip=args.skip, seed=args.seed)
+    print(f"Wrote {args.out}; load it with retrieve_agent('heuristic', agent_id, params='{args.out}')")